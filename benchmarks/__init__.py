@@ -0,0 +1,9 @@
+"""
+Benchmarks
+
+Scripts that time the data pipeline and dashboard hot paths on synthetic
+Online-Retail-shaped data. Run them from the project root, e.g.:
+
+    python -m benchmarks.bench_customers --rows 1000000
+    python -m benchmarks.bench_pipeline --rows 1000000 --output results.json
+"""
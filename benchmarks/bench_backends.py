@@ -0,0 +1,73 @@
+"""
+Benchmark: pandas vs. DuckDB query backends
+
+Writes synthetic cleaned line items as a year/month partitioned Parquet
+store, times every src.query_backend query on each backend and checks
+that the backends return the same results:
+
+    python -m benchmarks.bench_backends --rows 5000000 --threads 4
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_raw_data
+from src.data_cleaner import clean_line_items, write_partitions
+from src.query_backend import BACKENDS, QUERIES, compare_backends, run_query
+
+
+def time_query(query, store_path, backend, repeat=3, threads=None, **filters):
+    """
+    Median wall time of a query; the first (warm-up) run is not counted.
+    """
+    options = dict(threads=threads) if backend == 'duckdb' else {}
+    run_query(query, store_path, backend, **options, **filters)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_query(query, store_path, backend, **options, **filters)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the pandas and DuckDB query backends.")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Raw lines")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per query")
+    parser.add_argument('--threads', type=int, default=None, help="DuckDB threads")
+    parser.add_argument('--workdir', default=None, help="Directory for the generated store")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmp_dir:
+        store_path = os.path.join(tmp_dir, 'sales')
+        print(f"Generating {args.rows:,} raw lines...")
+        write_partitions(clean_line_items(generate_raw_data(args.rows, seed=args.seed)),
+                         store_path, 'part-0')
+
+        # Unfiltered, and one year of the two largest countries
+        filters = {
+            'all': {},
+            'filtered': dict(start='2010-06-01', end='2011-05-31',
+                             countries=['United Kingdom', 'Germany']),
+        }
+        for label, query_filters in filters.items():
+            mismatches = {query: message
+                          for query, message in compare_backends(store_path, **query_filters).items()
+                          if message}
+            if mismatches:
+                raise AssertionError(f"Backends disagree ({label}): {mismatches}")
+            print(f"✓ Backends agree on all queries ({label})")
+
+            print(f"{'query':<22}" + "".join(f"{backend:>10}" for backend in BACKENDS))
+            for query in QUERIES:
+                seconds = [time_query(query, store_path, backend, args.repeat, args.threads,
+                                      **query_filters) for backend in BACKENDS]
+                print(f"{query:<22}" + "".join(f"{s:>9.3f}s" for s in seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: cross-chunk deduplication cost per chunk
+
+Feeds random fingerprints chunk by chunk through src.dedup.mark_seen and
+through the original implementation, which merged every chunk into the
+sorted seen set with np.union1d, and reports the mean time of the first
+and last chunks. The baseline's cost per chunk grows linearly with the
+seen set; mark_seen's only with its binary-search lookups:
+
+    python -m benchmarks.bench_dedup --chunks 100 --chunk-rows 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.dedup import close_seen_set, create_seen_set, first_occurrences, mark_seen
+
+
+def mark_seen_union(seen, fingerprints):
+    """
+    The original mark_seen, kept as the benchmark baseline.
+    """
+    keep = first_occurrences(fingerprints)
+    candidates = np.flatnonzero(keep)
+    positions = np.searchsorted(seen, fingerprints[candidates]).clip(max=max(len(seen) - 1, 0))
+    if len(seen):
+        keep[candidates[seen[positions] == fingerprints[candidates]]] = False
+    return keep, np.union1d(seen, fingerprints[keep])
+
+
+def chunk_times(chunks, step):
+    """
+    Wall time of step(chunk) for every chunk.
+    """
+    times = []
+    for chunk in chunks:
+        start = time.perf_counter()
+        step(chunk)
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time cross-chunk deduplication per chunk.")
+    parser.add_argument('--chunks', type=int, default=100)
+    parser.add_argument('--chunk-rows', type=int, default=100_000)
+    parser.add_argument('--memory-budget-mb', type=float, default=256)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-baseline', action='store_true',
+                        help="Skip the np.union1d baseline, which grows quadratically")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # About 3% of each chunk repeats a line of an earlier chunk
+    chunks = [rng.integers(0, 2 ** 63, args.chunk_rows, dtype=np.uint64)
+              for _ in range(args.chunks)]
+    for i in range(1, args.chunks):
+        repeats = rng.integers(0, args.chunk_rows, args.chunk_rows // 33)
+        chunks[i][repeats] = chunks[rng.integers(0, i)][repeats]
+
+    seen = create_seen_set(args.memory_budget_mb)
+    try:
+        buffered = chunk_times(chunks, lambda chunk: mark_seen(seen, chunk))
+    finally:
+        close_seen_set(seen)
+
+    results = [('buffered', buffered)]
+    if not args.no_baseline:
+        state = {'seen': np.empty(0, dtype=np.uint64)}
+
+        def union_step(chunk):
+            _, state['seen'] = mark_seen_union(state['seen'], chunk)
+
+        results.append(('union1d', chunk_times(chunks, union_step)))
+
+    tenth = max(1, args.chunks // 10)
+    print(f"chunks:   {args.chunks} x {args.chunk_rows:,} fingerprints")
+    print(f"{'':10}{'first 10%':>12}{'last 10%':>12}{'total':>10}")
+    for name, times in results:
+        print(f"{name:10}{times[:tenth].mean() * 1000:>10.1f}ms"
+              f"{times[-tenth:].mean() * 1000:>10.1f}ms{times.sum():>9.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+"""
+Benchmark: load, clean, aggregate and render hot paths
+
+Times every stage of the pipeline on a synthetic raw CSV of the requested
+size, from load_csv through cleaning, the src.visualizations plot
+functions and the dashboard panel computations, and records the peak
+memory of each stage. Results are written as JSON so runs on different
+commits can be compared:
+
+    python -m benchmarks.bench_pipeline --rows 1000000 --output before.json
+    python -m benchmarks.bench_pipeline --rows 1000000 --compare before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_raw_csv
+from src import visualizations
+from src.aggregates import bin_cube, build_daily_cube, rollup_cube
+from src.binning import grid_frame
+from src.customers import classify_customers, repeat_customer_sales
+from src.data_cleaner import clean_data, clean_line_items, remove_duplicates, remove_outliers
+from src.data_loader import load_csv
+from src.metrics import build_metrics_base, rollup_metrics
+from src.query_backend import run_query
+from src.returns import build_returns_index, return_rates
+
+
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+
+
+def _rendered(fig_ax):
+    """
+    Draw a (fig, ax) pair to its canvas, as saving or displaying would, then close it.
+    """
+    fig, _ = fig_ax
+    fig.canvas.draw()
+    plt.close(fig)
+    return fig_ax
+
+
+# Plot functions of src.visualizations with the arguments the notebooks use
+VISUALIZATION_STAGES = {
+    'plot_sales_over_time': lambda df: _rendered(visualizations.plot_sales_over_time(
+        df, 'InvoiceDate', 'TotalPrice')),
+    'plot_top_products': lambda df: _rendered(visualizations.plot_top_products(
+        df, 'Description', 'TotalPrice', top_n=10)),
+    'plot_category_distribution': lambda df: _rendered(visualizations.plot_category_distribution(
+        df[df['TotalPrice'] > 0], 'Description', 'TotalPrice')),
+    'plot_monthly_trends': lambda df: _rendered(visualizations.plot_monthly_trends(
+        df, 'InvoiceDate', 'TotalPrice')),
+    'plot_heatmap': lambda df: _rendered(visualizations.plot_heatmap(
+        df, ['Month', 'DayOfWeek'], 'TotalPrice')),
+}
+
+
+# The data computations behind each dashboard_app panel, without the drawing
+PANEL_STAGES = {
+    'kpis': lambda df, cube: (df['TotalPrice'].sum(), df['Invoice'].nunique(),
+                              df['Customer ID'].nunique()),
+    'monthly_sales': lambda df, cube: rollup_cube(cube, ['YearMonth']),
+    'top_products': lambda df, cube: rollup_cube(cube, ['Description'])
+        .set_index('Description')['Revenue'].nlargest(10),
+    'sales_heatmap': lambda df, cube: grid_frame(bin_cube(cube, 'Month', 'DayOfWeek', 'Revenue')),
+    'country_revenue': lambda df, cube: rollup_cube(cube, ['Country'])
+        .set_index('Country')['Revenue'].nlargest(15),
+    'top_customers': lambda df, cube: df.groupby('Customer ID')['TotalPrice'].sum().nlargest(15),
+    'return_rate': lambda df, cube: return_rates(rollup_cube(cube, ['Description']))
+        .set_index('Description')['ReturnRate'].nlargest(10),
+    'hourly_sales': lambda df, cube: rollup_cube(cube, ['Hour']),
+    'yoy_growth': lambda df, cube: rollup_metrics(build_metrics_base(df), 'year'),
+    'wow_growth': lambda df, cube: rollup_metrics(build_metrics_base(df), 'week'),
+    'aov_by_month': lambda df, cube: run_query('aov_by_month', frame=df),
+    'order_sizes': lambda df, cube: np.histogram(df.groupby('Invoice')['Quantity'].sum(), bins=30),
+    'repeat_sales': lambda df, cube: repeat_customer_sales(classify_customers(df)),
+}
+
+
+def _row_count(result):
+    """
+    Number of rows of a stage result, when it has any.
+    """
+    if isinstance(result, tuple) and result and isinstance(result[0], pd.DataFrame):
+        result = result[0]
+    if isinstance(result, dict) and result and all(isinstance(v, pd.DataFrame) for v in result.values()):
+        return sum(len(table) for table in result.values())
+    if isinstance(result, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(result)
+    return None
+
+
+def run_stage(name, func, rows_in, repeat=1, measure_memory=True):
+    """
+    Time a stage and measure its peak memory.
+
+    The timed runs are untraced; peak memory comes from one extra run under
+    tracemalloc, which tracks numpy and pandas buffers as well as Python
+    objects. Output printed by the stage is suppressed.
+
+    Parameters:
+    -----------
+    name : str
+        Stage name
+    func : callable
+        Stage function taking no arguments
+    rows_in : int
+        Number of input rows
+    repeat : int
+        Number of timed runs
+    measure_memory : bool
+        Run the stage once more under tracemalloc
+
+    Returns:
+    --------
+    tuple
+        (result dict, return value of the last run)
+    """
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            value = func()
+            timings.append(time.perf_counter() - start)
+
+    peak_mb = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                func()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        finally:
+            tracemalloc.stop()
+
+    result = {
+        'stage': name,
+        'seconds': min(timings),
+        'median_seconds': statistics.median(timings),
+        'runs': repeat,
+        'peak_memory_mb': None if peak_mb is None else round(peak_mb, 1),
+        'rows_in': rows_in,
+        'rows_out': _row_count(value),
+    }
+    memory = '' if peak_mb is None else f"  peak {peak_mb:9.1f} MB"
+    print(f"  {name:<40} {result['seconds']:9.3f}s{memory}")
+    return result, value
+
+
+def _git_commit():
+    """
+    Current commit hash, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(n_rows, seed=0, repeat=1, stages=None, measure_memory=True, workdir=None):
+    """
+    Run the benchmark stages on a synthetic raw CSV of `n_rows` lines.
+
+    Parameters:
+    -----------
+    n_rows : int
+        Number of raw lines to generate
+    seed : int
+        Random seed of the generator
+    repeat : int
+        Number of timed runs per stage
+    stages : list of str, optional
+        Run only stages whose name contains one of these substrings
+    measure_memory : bool
+        Measure the peak memory of every stage
+    workdir : str, optional
+        Directory for the generated CSV (default: a temporary directory)
+
+    Returns:
+    --------
+    dict
+        Run metadata and one result per stage
+    """
+    def selected(name):
+        return not stages or any(s in name for s in stages)
+
+    results = []
+
+    def stage(name, func, rows_in):
+        result, value = run_stage(name, func, rows_in, repeat, measure_memory)
+        results.append(result)
+        return value
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'raw.csv')
+        print(f"Generating {n_rows:,} raw lines...")
+        start = time.perf_counter()
+        write_raw_csv(csv_path, n_rows, seed=seed)
+        generate_seconds = time.perf_counter() - start
+        csv_mb = os.path.getsize(csv_path) / 1024 ** 2
+
+        print("Stages:")
+        # Later stages need the loaded and cleaned frames, so these always run
+        raw = stage('load_csv', lambda: load_csv(csv_path, encoding='ISO-8859-1'), n_rows)
+
+    if selected('clean_data'):
+        stage('clean_data', lambda: clean_data(raw), len(raw))
+    if selected('remove_duplicates'):
+        stage('remove_duplicates', lambda: remove_duplicates(raw), len(raw))
+    df = stage('clean_line_items', lambda: clean_line_items(raw), len(raw))
+    del raw
+    if selected('remove_outliers'):
+        stage('remove_outliers', lambda: remove_outliers(df, 'TotalPrice'), len(df))
+
+    for name, func in VISUALIZATION_STAGES.items():
+        if selected(f"viz:{name}"):
+            stage(f"viz:{name}", lambda func=func: func(df), len(df))
+
+    cube = stage('build_daily_cube', lambda: build_daily_cube(df), len(df))
+    if selected('build_returns_index'):
+        stage('build_returns_index', lambda: build_returns_index(df), len(df))
+    for name, func in PANEL_STAGES.items():
+        if selected(f"panel:{name}"):
+            stage(f"panel:{name}", lambda func=func: func(df, cube), len(df))
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'rows': n_rows,
+            'seed': seed,
+            'repeat': repeat,
+            'csv_mb': round(csv_mb, 1),
+            'generate_seconds': round(generate_seconds, 3),
+            # ru_maxrss is in KiB on Linux and bytes on macOS
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                                / (1024 ** 2 if sys.platform == 'darwin' else 1024), 1),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+
+def compare_results(current, baseline):
+    """
+    Print the per-stage time ratio of two benchmark runs.
+
+    Parameters:
+    -----------
+    current : dict
+        Result of run_benchmarks
+    baseline : dict
+        Earlier result of run_benchmarks, e.g. from another commit
+    """
+    previous = {r['stage']: r for r in baseline['results']}
+    print(f"Compared with {baseline['meta'].get('commit')} ({baseline['meta']['rows']:,} rows):")
+    for result in current['results']:
+        before = previous.get(result['stage'])
+        if before is None or not before['seconds']:
+            continue
+        ratio = result['seconds'] / before['seconds']
+        print(f"  {result['stage']:<40} {before['seconds']:9.3f}s -> {result['seconds']:9.3f}s"
+              f"  ({ratio:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the pipeline stages on synthetic data.")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Raw lines (100K to 50M)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help="Timed runs per stage")
+    parser.add_argument('--stages', nargs='*', help="Only run stages matching these names")
+    parser.add_argument('--no-memory', action='store_true', help="Skip peak memory runs")
+    parser.add_argument('--workdir', default=None, help="Directory for the generated CSV")
+    parser.add_argument('--output', default=None, help="JSON results path")
+    parser.add_argument('--compare', default=None, help="Earlier JSON results to compare with")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.rows, seed=args.seed, repeat=args.repeat, stages=args.stages,
+                            measure_memory=not args.no_memory, workdir=args.workdir)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"pipeline_{report['meta']['commit'] or 'local'}"
+                                           f"_{args.rows}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Saved results to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
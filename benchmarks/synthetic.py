@@ -0,0 +1,171 @@
+"""
+Synthetic Data Generator
+
+Generate Online-Retail-shaped line items for benchmarking.
+
+The defaults follow the cardinalities of the Online Retail II dataset:
+about 20 lines per invoice, ~6,000 customers, ~4,000 stock codes, ~20% of
+invoices without a customer, ~2% cancelled ("C") invoices and ~3% exact
+duplicate lines in the raw files.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+RAW_COLUMNS = ['Invoice', 'StockCode', 'Description', 'Quantity', 'InvoiceDate', 'Price',
+               'Customer ID', 'Country']
+
+
+def generate_sales_data(n_rows, seed=0, n_products=4000, n_customers=6000, lines_per_invoice=20,
+                        first_invoice=489000, start='2009-12-01', days=730):
+    """
+    Generate a processed-style sales DataFrame with `n_rows` line items.
+
+    Parameters:
+    -----------
+    n_rows : int
+        Number of line items to generate
+    seed : int
+        Random seed
+    n_products : int
+        Number of distinct stock codes
+    n_customers : int
+        Number of distinct customer ids
+    lines_per_invoice : int
+        Average number of lines per invoice
+    first_invoice : int
+        Number of the first invoice
+    start : str or pd.Timestamp
+        Timestamp of the earliest possible invoice
+    days : float
+        Length of the period the invoices are spread over
+
+    Returns:
+    --------
+    pd.DataFrame
+        Line items with Invoice, StockCode, Description, Quantity,
+        InvoiceDate, Price, Customer ID, Country and TotalPrice
+    """
+    rng = np.random.default_rng(seed)
+    n_invoices = max(n_rows // lines_per_invoice, 1)
+
+    invoice_of_line = np.sort(rng.integers(0, n_invoices, n_rows))
+    minutes = np.sort(rng.integers(0, int(days * 24 * 60), n_invoices))
+    invoice_dates = pd.Timestamp(start) + pd.to_timedelta(minutes, unit='m')
+
+    customers = rng.integers(12000, 12000 + n_customers, n_invoices).astype('float64')
+    customers[rng.random(n_invoices) < 0.2] = np.nan
+    countries = np.array(['United Kingdom', 'Germany', 'France', 'EIRE', 'Netherlands', 'Spain'])
+    invoice_country = countries[rng.choice(len(countries), n_invoices, p=[0.9, 0.03, 0.03, 0.02, 0.01, 0.01])]
+
+    products = rng.integers(0, n_products, n_rows)
+    quantity = rng.integers(1, 25, n_rows)
+    price = np.round(rng.gamma(2.0, 2.0, n_rows), 2)
+
+    df = pd.DataFrame({
+        'Invoice': (first_invoice + invoice_of_line).astype(str),
+        'StockCode': (85000 + products).astype(str),
+        'Description': np.char.add('PRODUCT ', products.astype(str)),
+        'Quantity': quantity,
+        'InvoiceDate': invoice_dates[invoice_of_line],
+        'Price': price,
+        'Customer ID': customers[invoice_of_line],
+        'Country': invoice_country[invoice_of_line],
+    })
+    df['TotalPrice'] = df['Quantity'] * df['Price']
+    return df
+
+
+def generate_raw_data(n_rows, seed=0, return_ratio=0.02, duplicate_ratio=0.03,
+                      missing_description_ratio=0.004, **options):
+    """
+    Generate a raw-style DataFrame as found in data/raw, `n_rows` lines long.
+
+    On top of generate_sales_data, a share of invoices is turned into
+    cancellations (invoice prefixed with "C", negative quantity), some
+    descriptions are blanked and some lines are repeated verbatim.
+
+    Parameters:
+    -----------
+    n_rows : int
+        Number of line items to generate, duplicates included
+    seed : int
+        Random seed
+    return_ratio : float
+        Share of invoices that are cancellations
+    duplicate_ratio : float
+        Share of lines that are exact duplicates of another line
+    missing_description_ratio : float
+        Share of lines without a Description
+    **options
+        Cardinality options passed to generate_sales_data
+
+    Returns:
+    --------
+    pd.DataFrame
+        Line items with the raw columns (RAW_COLUMNS)
+    """
+    rng = np.random.default_rng(seed + 1)
+    n_duplicates = int(n_rows * duplicate_ratio)
+    df = generate_sales_data(n_rows - n_duplicates, seed, **options)[RAW_COLUMNS]
+
+    invoices = df['Invoice'].unique()
+    cancelled = invoices[rng.random(len(invoices)) < return_ratio]
+    is_return = df['Invoice'].isin(cancelled).to_numpy()
+    df.loc[is_return, 'Invoice'] = 'C' + df.loc[is_return, 'Invoice']
+    df.loc[is_return, 'Quantity'] = -df.loc[is_return, 'Quantity']
+
+    df.loc[rng.random(len(df)) < missing_description_ratio, 'Description'] = np.nan
+
+    # Repeat lines right after their originals, as double-scanned lines appear
+    repeated = np.sort(rng.choice(len(df), n_duplicates, replace=True))
+    order = np.sort(np.concatenate([np.arange(len(df)), repeated]), kind='stable')
+    return df.iloc[order].reset_index(drop=True)
+
+
+def write_raw_csv(file_path, n_rows, seed=0, chunk_rows=1_000_000, days=730, **options):
+    """
+    Write a raw-style CSV of `n_rows` lines, generated chunk by chunk.
+
+    Each chunk covers the next slice of the period with its own invoice
+    numbers, so files far larger than memory can be produced.
+
+    Parameters:
+    -----------
+    file_path : str
+        Output CSV path
+    n_rows : int
+        Number of lines to write
+    seed : int
+        Random seed
+    chunk_rows : int
+        Lines generated per chunk
+    days : float
+        Length of the whole period
+    **options
+        Options passed to generate_raw_data
+
+    Returns:
+    --------
+    int
+        Number of lines written
+    """
+    n_chunks = max(-(-n_rows // chunk_rows), 1)
+    start = pd.Timestamp(options.pop('start', '2009-12-01'))
+    first_invoice = options.pop('first_invoice', 489000)
+    lines_per_invoice = options.get('lines_per_invoice', 20)
+
+    written = 0
+    for i in range(n_chunks):
+        rows = min(chunk_rows, n_rows - written)
+        chunk = generate_raw_data(
+            rows, seed=seed + i,
+            start=start + pd.Timedelta(days=days * i / n_chunks),
+            days=days / n_chunks,
+            first_invoice=first_invoice + i * (chunk_rows // lines_per_invoice + 1),
+            **options,
+        )
+        chunk.to_csv(file_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        written += len(chunk)
+    return written
@@ -1,6 +1,30 @@
+import importlib.util
+import logging
+import os
+import time
 import streamlit as st
 import pandas as pd
-import os
+from src.data_loader import get_processed_data_path, load_processed_data
+from src.aggregates import bin_cube, load_daily_cube, rollup_cube
+from src.binning import grid_frame
+from src.customers import classify_customers, repeat_customer_sales
+from src.filter_index import index_values, load_filter_index, select_rows
+from src.instrumentation import get_records, summarize_records
+from src.sketches import approximate_kpis, approximate_top_k, load_daily_sketches
+from src.metrics import build_metrics_base, period_labels, rollup_metrics
+from src.result_cache import cache_stats, cached_result, set_cache_dir
+from src.panel_scheduler import run_panels, start_warm_up
+from src.query_backend import order_size_histogram, run_query
+from src.returns import return_rates
+from src.panel_renderer import (
+    draw_bar,
+    draw_growth,
+    draw_heatmap,
+    draw_histogram,
+    draw_line,
+    draw_pie,
+    render_panel,
+)
 from src.visualizations import (
     plot_sales_over_time,
     plot_top_products,
@@ -9,11 +33,314 @@ from src.visualizations import (
     plot_heatmap,
     save_figure
 )
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+# Pipeline stage messages go to the server console
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+
+def show_panel(rendered):
+    """
+    Place a rendered panel (PNG bytes or a plotly figure) on the page.
+    """
+    if isinstance(rendered, bytes):
+        st.image(rendered)
+    else:
+        st.plotly_chart(rendered)
+
+
+def dataset_source():
+    """
+    Prefer the year/month partitioned store; fall back to the processed CSV (cached columnar copy).
+    """
+    store_path = get_processed_data_path("sales")
+    return store_path if os.path.isdir(store_path) else get_processed_data_path("ecommerce_cleaned.csv")
+
+
+def panel_tasks(source_path, cube, df, filter_state, engine, renderer, sketches=None):
+    """
+    Compute callables of every panel, in page order.
+
+    Each callable computes the panel's result and renders its chart (see
+    chart_task). They only read their arguments and never call Streamlit,
+    so they can run concurrently in the panel scheduler's threads. Exact
+    results go through the result cache; panels sharing a result (top
+    products, the metrics base table) compute it once.
+    """
+    start, end = filter_state["start"], filter_state["end"]
+    products, countries = filter_state["products"], filter_state["countries"]
+    # Panels that only need additive measures are rolled up from the daily cube
+    cube_filters = dict(start=start, end=end, descriptions=products, countries=countries)
+    # The pandas engine queries the already filtered frame
+    query_frame = df if engine == "pandas" else None
+    query_filters = dict(start=start, end=end, countries=countries, products=products)
+
+    def cube_panel(panel_id, by):
+        return lambda: cached_result(panel_id, source_path, lambda: rollup_cube(cube, by, **cube_filters),
+                                     **filter_state)
+
+    def query_panel(panel_id, query, finish=None):
+        def compute():
+            result = run_query(query, source_path, engine, frame=query_frame, **query_filters)
+            return finish(result) if finish else result
+        return lambda: cached_result(panel_id, source_path, compute, engine=engine, **filter_state)
+
+    def metrics_base():
+        # Hourly revenue/orders table the growth panels roll up to their grain
+        return cached_result("metrics_base", source_path, lambda: build_metrics_base(df), **filter_state)
+
+    if sketches is not None:
+        def kpis():
+            estimates = approximate_kpis(sketches, start, end, countries)
+            total_revenue = rollup_cube(cube, ["Country"], **cube_filters)["Revenue"].sum()
+            return total_revenue, estimates["orders"], estimates["customers"], estimates["relative_error"]
+
+        def top_customers():
+            return approximate_top_k(sketches, "top_customers", 15, start, end, countries)
+
+        def top_products():
+            return approximate_top_k(sketches, "top_products", 10, start, end, countries)
+    else:
+        def kpis():
+            return cached_result(
+                "kpis", source_path,
+                lambda: (df["TotalPrice"].sum(), df["Invoice"].nunique(), df["Customer ID"].nunique()),
+                **filter_state) + (None,)
+
+        top_customers = query_panel("top_customers", "revenue_by_customer")
+        top_products = cube_panel("top_products", ["Description"])
+
+    computes = {
+        "kpis": kpis,
+        "monthly_sales": cube_panel("monthly_sales", ["YearMonth"]),
+        "top_products": top_products,
+        "product_distribution": top_products,
+        "sales_heatmap": lambda: cached_result(
+            "sales_heatmap", source_path,
+            lambda: grid_frame(bin_cube(cube, "Month", "DayOfWeek", "Revenue", **cube_filters)),
+            **filter_state),
+        "country_revenue": cube_panel("country_revenue", ["Country"]),
+        "top_customers": top_customers,
+        # Cancellations are flagged once per dataset version and rolled up in the cube
+        "return_rate": lambda: cached_result(
+            "product_return_rates", source_path,
+            lambda: return_rates(rollup_cube(cube, ["Description"], **cube_filters)),
+            **filter_state),
+        # The cube keeps hours per country only, so a product filter needs the line items
+        "hourly_sales": (query_panel("hourly_sales", "revenue_by_hour") if products
+                         else cube_panel("hourly_sales", ["Hour"])),
+        "yoy_growth": lambda: rollup_metrics(metrics_base(), "year"),
+        # Weeks without sales are kept as zero so growth compares consecutive ISO weeks
+        "wow_growth": lambda: rollup_metrics(metrics_base(), "week"),
+        "aov_by_month": query_panel("aov_by_month", "aov_by_month"),
+        "order_sizes": query_panel("order_sizes", "order_sizes", order_size_histogram),
+        "repeat_sales": lambda: cached_result("repeat_sales", source_path,
+                                              lambda: repeat_customer_sales(classify_customers(df)),
+                                              **filter_state),
+    }
+    return {panel_id: chart_task(panel_id, compute, renderer) for panel_id, compute in computes.items()}
+
+
+def default_panel_tasks(source_path):
+    """
+    Panel compute callables for the dashboard's default filter state.
+
+    Mirrors the sidebar defaults (full date range, first 10 products, every
+    country, pandas engine, matplotlib charts), so warming these fills the
+    result and render cache entries a new session asks for first.
+    """
+    cube = load_daily_cube(source_path)
+    all_rows = load_processed_data(source_path)
+    filter_index = load_filter_index(source_path)
+    start, end = cube["hourly"]["Date"].min(), cube["hourly"]["Date"].max()
+    rows = select_rows(filter_index, start=start, end=end)
+    products = index_values(filter_index, "Description", rows)[:10]
+    rows = select_rows(filter_index, {"Description": products}, start, end)
+    countries = index_values(filter_index, "Country", rows)
+    rows = select_rows(filter_index, {"Description": products, "Country": countries}, start, end)
+    filter_state = dict(start=start, end=end, products=products, countries=countries)
+    return panel_tasks(source_path, cube, all_rows.take(rows), filter_state, "pandas",
+                       "matplotlib")
+
+
+def _top_products(product_revenue):
+    # Approximate results are already the top 10, with each product's error bound
+    if "MaxError" in product_revenue:
+        return product_revenue["Value"]
+    return product_revenue.set_index("Description")["Revenue"].sort_values(ascending=False).head(10)
+
+
+def _top_customers(top_customers):
+    # Approximate results are already the top 15, with each customer's error bound
+    if "MaxError" in top_customers:
+        return top_customers["Value"]
+    return top_customers.set_index("Customer ID")["Revenue"].sort_values(ascending=False).head(15)
+
+
+def _non_empty(data):
+    return data if not data.empty else None
+
+
+# Panel id -> (prepare, draw, options): prepare(result) returns the chart input, or None
+# when there is nothing to draw; the chart is rendered in the panel's worker thread
+PANEL_CHARTS = {
+    "monthly_sales": (
+        lambda monthly: _non_empty(monthly.set_index(monthly["YearMonth"].astype(str))["Revenue"]),
+        draw_line, dict(title="Monthly Sales Trend", xlabel="Month", ylabel="Revenue")),
+    "top_products": (
+        lambda revenue: _non_empty(_top_products(revenue)),
+        draw_bar, dict(title="Top 10 Products by Revenue", ylabel="Revenue", color="skyblue",
+                       figsize=(8, 4))),
+    "product_distribution": (
+        lambda revenue: _non_empty(_top_products(revenue)),
+        draw_pie, dict(title="Revenue Distribution by Product")),
+    "sales_heatmap": (
+        _non_empty,
+        draw_heatmap, dict(title="Sales Heatmap: Month vs. Day of Week")),
+    "country_revenue": (
+        lambda revenue: revenue.set_index("Country")["Revenue"].sort_values(ascending=False).head(15),
+        draw_bar, dict(title="Top 15 Countries by Revenue", ylabel="Revenue", color="coral")),
+    "top_customers": (
+        _top_customers,
+        draw_bar, dict(title="Top 15 Customers by Revenue", ylabel="Revenue", color="orange")),
+    "return_rate": (
+        lambda rates: rates.set_index("Description")["ReturnRate"].sort_values(ascending=False).head(10),
+        draw_bar, dict(title="Top 10 Products by Return/Cancellation Rate",
+                       ylabel="Return/Cancellation Rate", color="red", figsize=(8, 4))),
+    "hourly_sales": (
+        lambda hourly: hourly.set_index("Hour")["Revenue"].sort_index(),
+        draw_bar, dict(title="Hourly Sales Trend", xlabel="Hour of Day", ylabel="Total Revenue",
+                       color="teal", rotation=0)),
+    "yoy_growth": (
+        lambda yearly: yearly.set_index(period_labels(yearly["Period"], "year"))["Revenue"],
+        draw_growth, dict(title="Year-over-Year Revenue and Growth", value_label="Revenue",
+                          growth_label="YoY Growth (%)", value_color="navy", growth_color="crimson")),
+    "wow_growth": (
+        # Drawn on a time axis by week start rather than one category per ISO week label
+        lambda weekly: weekly.set_index("Period")["Revenue"],
+        draw_growth, dict(title="Week-over-Week Revenue and Growth", value_label="Weekly Revenue",
+                          growth_label="WoW Growth (%)", value_color="green", growth_color="purple",
+                          kind="line", rotation=45, figsize=(14, 4))),
+    "aov_by_month": (
+        lambda aov: aov.set_index("YearMonth")["AOV"],
+        draw_line, dict(title="Average Order Value by Month", xlabel="Month",
+                        ylabel="Average Order Value", color="darkblue")),
+    "order_sizes": (
+        lambda bins: bins,
+        draw_histogram, dict(title="Distribution of Order Sizes", xlabel="Number of Items per Order",
+                             ylabel="Frequency", color="orchid")),
+    "repeat_sales": (
+        lambda repeat_sales: repeat_sales,
+        draw_pie, dict(title="Sales: Repeat vs. New Customers",
+                       labels=["New Customer", "Repeat Customer"], colors=["#66b3ff", "#99ff99"])),
+}
+
+
+def chart_task(panel_id, compute, renderer):
+    """
+    Wrap a panel's compute callable so it also renders the panel's chart.
+
+    The wrapped callable returns (result, rendered), rendered being None for
+    panels without a chart or with nothing to draw.
+    """
+    def task():
+        result = compute()
+        if panel_id not in PANEL_CHARTS:
+            return result, None
+        prepare, draw, options = PANEL_CHARTS[panel_id]
+        chart = prepare(result)
+        return result, None if chart is None else render_panel(panel_id, chart, draw, renderer, **options)
+    return task
+
+
+def render_kpis(data, rendered):
+    total_revenue, total_orders, total_customers, relative_error = data
+    st.subheader("Key Performance Indicators (KPIs)")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Revenue", f"£{total_revenue:,.0f}")
+    col2.metric("Total Orders", total_orders)
+    col3.metric("Unique Customers", total_customers)
+    if relative_error is not None:
+        st.caption(f"Orders and customers are estimates (±{relative_error:.1%} standard error).")
+
+    st.markdown("---")
+
+
+def chart_renderer(title, info, empty_warning=None, caption=None):
+    """
+    Page renderer of a chart panel: its subheader, chart (or warning), an
+    optional caption(result) text and its info text.
+    """
+    def render(data, rendered):
+        st.subheader(title)
+        if rendered is not None:
+            show_panel(rendered)
+        elif empty_warning:
+            st.warning(empty_warning)
+        text = caption(data) if caption else None
+        if text:
+            st.caption(text)
+        st.info(info)
+    return render
+
+
+# Panel id -> render(data, rendered) placing the panel on the page; every panel_tasks
+# id needs one
+PANEL_RENDERERS = {
+    "kpis": render_kpis,
+    "monthly_sales": chart_renderer(
+        "Monthly Sales Trend",
+        "The monthly sales trend highlights periods of peak and low sales activity, helping identify the best times for marketing campaigns and inventory planning.",
+        "No data available for the selected date range."),
+    "top_products": chart_renderer(
+        "Top 10 Products by Revenue",
+        "The bar chart of top 10 products by revenue shows which items are the biggest contributors to sales. Focusing on these products can maximize revenue and inform inventory and marketing priorities.",
+        "No product data available for the selected date range.",
+        caption=lambda top_products: (
+            f"Approximate: gross sales before cancellations; each product's may be up to £{top_products['MaxError'].max():,.0f} higher than shown."
+            if "MaxError" in top_products else None)),
+    "product_distribution": chart_renderer(
+        "Revenue Distribution by Product",
+        "The revenue distribution pie chart highlights which products dominate total sales. A small number of products may account for a large share of revenue, suggesting opportunities for cross-selling or expanding similar product lines.",
+        "No product revenue data available for the selected date range."),
+    "sales_heatmap": chart_renderer(
+        "Sales Heatmap: Month vs. Day of Week",
+        "The sales heatmap reveals which days of the week and months generate the most revenue. This can uncover patterns such as higher sales on weekends or during specific months, guiding staffing and promotional strategies."),
+    "country_revenue": chart_renderer(
+        "Top 15 Countries by Revenue",
+        "The bar chart shows which countries generate the most revenue. This can help prioritize marketing and logistics efforts in high-value regions."),
+    "top_customers": chart_renderer(
+        "Top 15 Customers by Revenue",
+        "A small number of customers often contribute a large share of total revenue. Identifying and nurturing these top customers can drive business growth and loyalty.",
+        caption=lambda top_customers: (
+            f"Approximate: gross sales before cancellations; each customer's may be up to £{top_customers['MaxError'].max():,.0f} higher than shown."
+            if "MaxError" in top_customers else None)),
+    "return_rate": chart_renderer(
+        "Top 10 Products by Return/Cancellation Rate",
+        "Products with high return or cancellation rates may have quality issues, mismatched customer expectations, or other problems. Investigating these products can help reduce returns and improve customer satisfaction."),
+    "hourly_sales": chart_renderer(
+        "Hourly Sales Trend",
+        "The hourly sales trend reveals peak shopping hours. This can inform staffing, marketing campaigns, and website maintenance schedules to maximize sales during high-traffic periods."),
+    "yoy_growth": chart_renderer(
+        "Year-over-Year Revenue and Growth",
+        "Year-over-year growth visualizations help track business momentum, spot seasonal patterns, and quickly identify periods of acceleration or slowdown. This is crucial for forecasting and strategic planning."),
+    "wow_growth": chart_renderer(
+        "Week-over-Week Revenue and Growth",
+        "Week-over-week growth visualizations help track short-term business momentum and spot rapid changes in performance."),
+    "aov_by_month": chart_renderer(
+        "Average Order Value by Month",
+        "Tracking average order value by month helps identify trends in customer spending and the impact of promotions or seasonality. Increasing AOV is a key lever for revenue growth."),
+    "order_sizes": chart_renderer(
+        "Distribution of Order Sizes",
+        "The order size distribution shows how many items customers typically buy per order. This can inform bundling strategies, minimum order incentives, and inventory planning."),
+    "repeat_sales": chart_renderer(
+        "Sales: Repeat vs. New Customers",
+        "Understanding the share of revenue from repeat versus new customers helps guide retention and acquisition strategies. A high proportion of repeat sales indicates strong customer loyalty, while a low proportion may signal a need for improved retention efforts."),
+}
+
 
 # Set Streamlit page config
 def main():
+    run_started = time.time()
     st.set_page_config(page_title="E-commerce Dashboard", layout="wide")
     st.title("E-commerce Dashboard: Unveiling Retail Insights")
     st.markdown("""
@@ -22,230 +349,76 @@ def main():
 Welcome to the Online Retail Dashboard! Dive into the journey of a UK-based online giftware retailer from 2009 to 2011. Explore how sales trends, customer behaviors, and product performance shaped the business. Use the interactive filters to uncover insights and drive data-informed decisions.
 """)
 
-    # Load processed data
-    data_path = os.path.join("data", "processed", "ecommerce_cleaned.csv")
-    df = pd.read_csv(data_path, parse_dates=["InvoiceDate"])
+    source_path = dataset_source()
+    cube = load_daily_cube(source_path)
+    # Panel results are cached per dataset version and filter state, in memory for every
+    # session of this process and on disk for other processes and restarts
+    set_cache_dir(os.environ.get("RESULT_CACHE_DIR", get_processed_data_path("result_cache")))
+    # The full dataset and its filter index are cached in-process; the filters below
+    # are resolved to row positions from the index without scanning string columns
+    all_rows = load_processed_data(source_path)
+    filter_index = load_filter_index(source_path)
+    # Once per server process: compute the default view in the background, and again
+    # whenever ingest publishes a new version of the dataset
+    start_warm_up(source_path, lambda: default_panel_tasks(source_path))
 
     # Sidebar filters
     st.sidebar.header("Filters")
-    min_date, max_date = df["InvoiceDate"].min(), df["InvoiceDate"].max()
+    min_date, max_date = cube["hourly"]["Date"].min(), cube["hourly"]["Date"].max()
     date_range = st.sidebar.date_input("Date Range", [min_date, max_date], min_value=min_date, max_value=max_date)
+    start_date, end_date = None, None
     if len(date_range) == 2:
-        df = df[(df["InvoiceDate"] >= pd.to_datetime(date_range[0])) & (df["InvoiceDate"] <= pd.to_datetime(date_range[1]))]
+        # The end date is inclusive of the whole day
+        start_date, end_date = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
 
-    products = df["Description"].unique().tolist()
+    rows = select_rows(filter_index, start=start_date, end=end_date)
+    products = index_values(filter_index, "Description", rows)
     selected_products = st.sidebar.multiselect("Select Products", options=products, default=products[:10])
-    if selected_products:
-        df = df[df["Description"].isin(selected_products)]
 
-    countries = df["Country"].unique().tolist()
+    rows = select_rows(filter_index, {"Description": selected_products}, start_date, end_date)
+    countries = index_values(filter_index, "Country", rows)
     selected_countries = st.sidebar.multiselect("Select Countries", options=countries, default=countries)
-    if selected_countries:
-        df = df[df["Country"].isin(selected_countries)]
 
-    # KPIs
-    st.subheader("Key Performance Indicators (KPIs)")
-    col1, col2, col3 = st.columns(3)
-    total_revenue = df["TotalPrice"].sum()
-    total_orders = df["Invoice"].nunique()
-    total_customers = df["Customer ID"].nunique()
-    col1.metric("Total Revenue", f"£{total_revenue:,.0f}")
-    col2.metric("Total Orders", total_orders)
-    col3.metric("Unique Customers", total_customers)
+    rows = select_rows(filter_index, {"Description": selected_products, "Country": selected_countries},
+                       start_date, end_date)
+    df = all_rows.take(rows)
+    filter_state = dict(start=start_date, end=end_date, products=selected_products,
+                        countries=selected_countries)
 
-    st.markdown("---")
+    renderer = st.sidebar.radio("Chart Renderer", ["matplotlib", "plotly"],
+                                help="Plotly charts are drawn interactively in the browser")
+    show_timings = st.sidebar.checkbox("Show Stage Timings", value=False,
+                                       help="Wall time, thread CPU time, rows and process memory change of each stage in this run")
+    # DuckDB is optional; when installed it runs the line-item panel queries over the Parquet files
+    engines = ["pandas"] + (["duckdb"] if importlib.util.find_spec("duckdb") else [])
+    engine = st.sidebar.radio("Query Engine", engines,
+                              help="DuckDB runs the line-item queries multi-threaded over the Parquet files")
+    approximate = st.sidebar.checkbox(
+        "Approximate Mode", value=False,
+        help="Estimate orders, customers, top products and top customers from per-day sketches "
+             "(~1.6% error on counts). Applies when no product filter is selected.")
+    # The sketches are kept per day and country, so they cannot honour a product filter
+    if approximate and selected_products:
+        st.sidebar.info("Approximate Mode is off while products are selected; "
+                        "showing exact results.")
+        approximate = False
+    sketches = load_daily_sketches(source_path) if approximate else None
 
-    # Monthly Sales Trend
-    st.subheader("Monthly Sales Trend")
-    if not df.empty:
-        monthly_sales = df.groupby([df["InvoiceDate"].dt.to_period("M")])["TotalPrice"].sum().reset_index()
-        if not monthly_sales.empty:
-            monthly_sales["InvoiceDate"] = monthly_sales["InvoiceDate"].astype(str)
-            fig, ax = plt.subplots(figsize=(10,4))
-            sns.lineplot(data=monthly_sales, x="InvoiceDate", y="TotalPrice", marker="o", ax=ax)
-            ax.set_title("Monthly Sales Trend")
-            ax.set_xlabel("Month")
-            ax.set_ylabel("Revenue")
-            plt.xticks(rotation=45)
-            st.pyplot(fig)
-        else:
-            st.warning("No data available for the selected date range.")
-    else:
-        st.warning("No data available for the selected date range.")
-    st.info("The monthly sales trend highlights periods of peak and low sales activity, helping identify the best times for marketing campaigns and inventory planning.")
-
-    # Top Products by Revenue
-    st.subheader("Top 10 Products by Revenue")
-    if not df.empty:
-        top_products = df.groupby("Description")["TotalPrice"].sum().sort_values(ascending=False).head(10)
-        if not top_products.empty:
-            fig2, ax2 = plt.subplots(figsize=(8,4))
-            top_products.plot(kind="bar", ax=ax2, color="skyblue")
-            ax2.set_title("Top 10 Products by Revenue")
-            ax2.set_ylabel("Revenue")
-            plt.xticks(rotation=45)
-            st.pyplot(fig2)
-        else:
-            st.warning("No product data available for the selected date range.")
-    else:
-        st.warning("No product data available for the selected date range.")
-    st.info("The bar chart of top 10 products by revenue shows which items are the biggest contributors to sales. Focusing on these products can maximize revenue and inform inventory and marketing priorities.")
-
-    # Revenue Distribution by Product
-    st.subheader("Revenue Distribution by Product")
-    if not df.empty:
-        revenue_by_desc = df.groupby("Description")["TotalPrice"].sum().sort_values(ascending=False).head(10)
-        if not revenue_by_desc.empty:
-            fig3, ax3 = plt.subplots(figsize=(6,6))
-            revenue_by_desc.plot(kind="pie", ax=ax3, autopct="%1.1f%%")
-            ax3.set_ylabel("")
-            ax3.set_title("Revenue Distribution by Product")
-            st.pyplot(fig3)
-        else:
-            st.warning("No product revenue data available for the selected date range.")
-    else:
-        st.warning("No product revenue data available for the selected date range.")
-    st.info("The revenue distribution pie chart highlights which products dominate total sales. A small number of products may account for a large share of revenue, suggesting opportunities for cross-selling or expanding similar product lines.")
-
-    # Sales Heatmap (Month vs. Day of Week)
-    st.subheader("Sales Heatmap: Month vs. Day of Week")
-    df["Month"] = df["InvoiceDate"].dt.month
-    df["DayOfWeek"] = df["InvoiceDate"].dt.day_name()
-    heatmap_data = df.pivot_table(index="Month", columns="DayOfWeek", values="TotalPrice", aggfunc="sum", fill_value=0)
-    fig4, ax4 = plt.subplots(figsize=(10,5))
-    sns.heatmap(heatmap_data, cmap="YlGnBu", ax=ax4)
-    ax4.set_title("Sales Heatmap: Month vs. Day of Week")
-    st.pyplot(fig4)
-    st.info("The sales heatmap reveals which days of the week and months generate the most revenue. This can uncover patterns such as higher sales on weekends or during specific months, guiding staffing and promotional strategies.")
-
-    # Revenue by Country
-    st.subheader("Top 15 Countries by Revenue")
-    country_revenue = df.groupby("Country")["TotalPrice"].sum().sort_values(ascending=False).head(15)
-    fig5, ax5 = plt.subplots(figsize=(10,4))
-    country_revenue.plot(kind="bar", ax=ax5, color="coral")
-    ax5.set_title("Top 15 Countries by Revenue")
-    ax5.set_ylabel("Revenue")
-    plt.xticks(rotation=45)
-    st.pyplot(fig5)
-    st.info("The bar chart shows which countries generate the most revenue. This can help prioritize marketing and logistics efforts in high-value regions.")
-
-    # Top Customers by Revenue
-    st.subheader("Top 15 Customers by Revenue")
-    top_customers = df.groupby("Customer ID")["TotalPrice"].sum().sort_values(ascending=False).head(15)
-    fig6, ax6 = plt.subplots(figsize=(10,4))
-    top_customers.plot(kind="bar", ax=ax6, color="orange")
-    ax6.set_title("Top 15 Customers by Revenue")
-    ax6.set_ylabel("Revenue")
-    plt.xticks(rotation=45)
-    st.pyplot(fig6)
-    st.info("A small number of customers often contribute a large share of total revenue. Identifying and nurturing these top customers can drive business growth and loyalty.")
-
-    # Product Return/Cancellation Rates
-    st.subheader("Top 10 Products by Return/Cancellation Rate")
-    df["IsReturn"] = df["Invoice"].astype(str).str.startswith("C")
-    return_rate = df.groupby("Description")["IsReturn"].mean().sort_values(ascending=False).head(10)
-    fig7, ax7 = plt.subplots(figsize=(8,4))
-    return_rate.plot(kind="bar", ax=ax7, color="red")
-    ax7.set_title("Top 10 Products by Return/Cancellation Rate")
-    ax7.set_ylabel("Return/Cancellation Rate")
-    plt.xticks(rotation=45)
-    st.pyplot(fig7)
-    st.info("Products with high return or cancellation rates may have quality issues, mismatched customer expectations, or other problems. Investigating these products can help reduce returns and improve customer satisfaction.")
-
-    # Hourly Sales Trends
-    st.subheader("Hourly Sales Trend")
-    df["Hour"] = df["InvoiceDate"].dt.hour
-    hourly_sales = df.groupby("Hour")["TotalPrice"].sum()
-    fig8, ax8 = plt.subplots(figsize=(10,4))
-    hourly_sales.plot(kind="bar", ax=ax8, color="teal")
-    ax8.set_title("Hourly Sales Trend")
-    ax8.set_xlabel("Hour of Day")
-    ax8.set_ylabel("Total Revenue")
-    plt.xticks(rotation=0)
-    st.pyplot(fig8)
-    st.info("The hourly sales trend reveals peak shopping hours. This can inform staffing, marketing campaigns, and website maintenance schedules to maximize sales during high-traffic periods.")
-
-    # Year-over-Year Revenue and Growth
-    st.subheader("Year-over-Year Revenue and Growth")
-    df["Year"] = df["InvoiceDate"].dt.year
-    sales_by_year = df.groupby("Year")["TotalPrice"].sum()
-    yoy_growth = sales_by_year.pct_change() * 100
-    fig9, ax9 = plt.subplots(figsize=(8,4))
-    sales_by_year.plot(kind="bar", ax=ax9, color="navy", alpha=0.7, label="Revenue")
-    ax9.set_ylabel("Revenue")
-    ax9.set_title("Year-over-Year Revenue and Growth")
-    ax9.legend(loc="upper left")
-    ax9_2 = ax9.twinx()
-    yoy_growth.plot(ax=ax9_2, color="crimson", marker="o", label="YoY Growth (%)")
-    ax9_2.set_ylabel("YoY Growth (%)")
-    ax9_2.legend(loc="upper right")
-    st.pyplot(fig9)
-    st.info("Year-over-year growth visualizations help track business momentum, spot seasonal patterns, and quickly identify periods of acceleration or slowdown. This is crucial for forecasting and strategic planning.")
-
-    # Week-over-Week Revenue and Growth
-    st.subheader("Week-over-Week Revenue and Growth")
-    df["Week"] = df["InvoiceDate"].dt.isocalendar().week
-    weekly_sales = df.groupby(["Year", "Week"])["TotalPrice"].sum().reset_index()
-    weekly_sales["YearWeek"] = weekly_sales["Year"].astype(str) + "-W" + weekly_sales["Week"].astype(str)
-    weekly_sales["WoW_Growth"] = weekly_sales["TotalPrice"].pct_change() * 100
-    fig10, ax10 = plt.subplots(figsize=(14,4))
-    ax10.plot(weekly_sales["YearWeek"], weekly_sales["TotalPrice"], label="Weekly Revenue", color="green")
-    ax10.set_ylabel("Revenue")
-    ax10.set_title("Week-over-Week Revenue and Growth")
-    ax10.legend(loc="upper left")
-    ax10_2 = ax10.twinx()
-    ax10_2.plot(weekly_sales["YearWeek"], weekly_sales["WoW_Growth"], label="WoW Growth (%)", color="purple", alpha=0.5)
-    ax10_2.set_ylabel("WoW Growth (%)")
-    ax10_2.legend(loc="upper right")
-    plt.xticks(rotation=45)
-    st.pyplot(fig10)
-    st.info("Week-over-week growth visualizations help track short-term business momentum and spot rapid changes in performance.")
-
-    # Average Order Value by Month
-    st.subheader("Average Order Value by Month")
-    df["YearMonth"] = df["InvoiceDate"].dt.to_period("M")
-    aov_by_month = df.groupby("YearMonth").apply(lambda x: x["TotalPrice"].sum() / x["Invoice"].nunique())
-    fig11, ax11 = plt.subplots(figsize=(10,4))
-    aov_by_month.plot(ax=ax11, marker="o", color="darkblue")
-    ax11.set_title("Average Order Value by Month")
-    ax11.set_xlabel("Month")
-    ax11.set_ylabel("Average Order Value")
-    plt.xticks(rotation=45)
-    st.pyplot(fig11)
-    st.info("Tracking average order value by month helps identify trends in customer spending and the impact of promotions or seasonality. Increasing AOV is a key lever for revenue growth.")
-
-    # Distribution of Order Sizes
-    st.subheader("Distribution of Order Sizes")
-    order_sizes = df.groupby("Invoice")["Quantity"].sum()
-    fig12, ax12 = plt.subplots(figsize=(10,4))
-    order_sizes.plot(kind="hist", bins=30, ax=ax12, color="orchid", edgecolor="black")
-    ax12.set_title("Distribution of Order Sizes")
-    ax12.set_xlabel("Number of Items per Order")
-    ax12.set_ylabel("Frequency")
-    st.pyplot(fig12)
-    st.info("The order size distribution shows how many items customers typically buy per order. This can inform bundling strategies, minimum order incentives, and inventory planning.")
-
-    # Repeat vs. New Customer Sales
-    st.subheader("Sales: Repeat vs. New Customers")
-    # Fix: Remove NaN Customer IDs before repeat customer logic
-    df_valid_cust = df.dropna(subset=["Customer ID"])
-    first_purchase = df_valid_cust.groupby("Customer ID")["InvoiceDate"].min()
-    def is_repeat(row):
-        cust_id = row["Customer ID"]
-        if pd.isna(cust_id):
-            return False
-        return row["InvoiceDate"] > first_purchase.get(cust_id, row["InvoiceDate"])
-    df["IsRepeatCustomer"] = df.apply(is_repeat, axis=1)
-    repeat_sales = df.groupby("IsRepeatCustomer")["TotalPrice"].sum()
-    labels = ["New Customer", "Repeat Customer"]
-    # Ensure both labels are present
-    repeat_sales = repeat_sales.reindex([False, True], fill_value=0)
-    fig13, ax13 = plt.subplots(figsize=(6,6))
-    repeat_sales.plot(kind="pie", labels=labels, autopct="%1.1f%%", ax=ax13, colors=["#66b3ff","#99ff99"])
-    ax13.set_ylabel("")
-    ax13.set_title("Sales: Repeat vs. New Customers")
-    st.pyplot(fig13)
-    st.info("Understanding the share of revenue from repeat versus new customers helps guide retention and acquisition strategies. A high proportion of repeat sales indicates strong customer loyalty, while a low proportion may signal a need for improved retention efforts.")
+    # Every panel gets its slot in page order, then is filled as soon as its result is ready
+    tasks = panel_tasks(source_path, cube, df, filter_state, engine, renderer, sketches)
+    slots = {panel_id: st.container() for panel_id in tasks}
+    for panel_id, (data, rendered) in run_panels(tasks, rows_in=len(df)):
+        with slots[panel_id]:
+            PANEL_RENDERERS[panel_id](data, rendered)
+
+    # Debug panel: the stages recorded while rendering this run
+    if show_timings:
+        with st.expander("Stage Timings", expanded=True):
+            records = get_records(since=run_started)
+            st.dataframe(summarize_records(records))
+            st.dataframe(records.drop(columns=["started_at"]))
+            st.caption("Result cache")
+            st.json(cache_stats())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,502 @@
+"""
+Aggregate Cube Utilities
+
+Functions to build, persist and roll up a compact daily sales cube so
+dashboard panels do not have to group raw line items on every rerun.
+
+The cube is a dict of two tables of the same measures: summed (net)
+revenue and quantity, a line count, and the line count and value of
+cancellations, so return rates and gross revenue roll up like any other
+measure.
+
+  - 'hourly': one row per (Date, Hour, Country)
+  - 'products': one row per (Date, Country, StockCode, Description)
+
+Keeping the product dimensions out of the hourly table lets it compress
+line items by orders of magnitude, while the product table still
+compresses repeated sales of an item on the same day. A rollup reads the
+smallest table holding the dimensions it groups and filters by; hours of
+individual products are not kept. Distinct invoices are tracked in a
+separate sparse HyperLogLog table at the hourly grain ('sketch'), so order
+counts can be merged across any subset of its cells.
+
+A 'days' table keeps one content fingerprint per day (the wrapping sum of
+the dedup.line_fingerprints of its lines), so an incremental update finds
+every changed day, even when an edit keeps its line count and revenue.
+"""
+
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from .data_loader import (
+    _encode_signature,
+    _file_signature,
+    _read_parquet_signature,
+    _write_parquet_with_signature,
+    get_processed_data_path,
+    load_processed_data,
+    return_flags,
+)
+from .binning import bin_2d
+from .date_features import calendar_features
+from .dedup import line_fingerprints
+
+logger = logging.getLogger(__name__)
+
+
+CUBE_KEYS = ['Date', 'Hour', 'Country']
+PRODUCT_KEYS = ['Date', 'Country', 'StockCode', 'Description']
+CUBE_MEASURES = ['Revenue', 'Quantity', 'Lines', 'ReturnLines', 'ReturnRevenue']
+
+# Cube table -> its key columns, smallest table first
+CUBE_TABLES = {'hourly': CUBE_KEYS, 'products': PRODUCT_KEYS}
+
+# HyperLogLog precision: 2**12 registers, ~1.6% standard error
+HLL_PRECISION = 12
+
+# Line-item columns the cube is built from; a day is rebuilt when any of them changes
+FINGERPRINT_COLUMNS = ['Invoice', 'InvoiceDate', 'StockCode', 'Description', 'Country',
+                       'Quantity', 'TotalPrice']
+
+# Dimensions that can be derived from the Date key through the calendar table
+DERIVED_KEYS = ['Year', 'Month', 'YearMonth', 'Week', 'DayOfWeek']
+
+
+def _bit_length(values):
+    """
+    Vectorized bit length of non-negative uint64 values.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.zeros(len(values), dtype=np.int64)
+    nonzero = values > 0
+    # float log2 can be off by one near powers of two, so correct it
+    approx = np.floor(np.log2(values[nonzero].astype(np.float64))).astype(np.int64) + 1
+    shifted = values[nonzero] >> (approx - 1).astype(np.uint64)
+    approx[shifted == 0] -= 1
+    shifted = values[nonzero] >> approx.astype(np.uint64)
+    approx[shifted != 0] += 1
+    lengths[nonzero] = approx
+    return lengths
+
+
+def hll_registers(values, precision=HLL_PRECISION):
+    """
+    Map values to HyperLogLog (register, rank) pairs.
+
+    Parameters:
+    -----------
+    values : pd.Series
+        Values to count distinctly
+    precision : int
+        Number of index bits (2**precision registers)
+
+    Returns:
+    --------
+    tuple of np.ndarray
+        (register index as uint16, rank as uint8) for every value
+    """
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    width = 64 - precision
+    registers = (hashes >> np.uint64(width)).astype(np.uint16)
+    rest = hashes & np.uint64((1 << width) - 1)
+    ranks = (width - _bit_length(rest) + 1).astype(np.uint8)
+    return registers, ranks
+
+
+def hll_estimate(rank_sum, registers_set, precision=HLL_PRECISION):
+    """
+    Turn HyperLogLog register statistics into a cardinality estimate.
+
+    Parameters:
+    -----------
+    rank_sum : array-like
+        Sum of 2**-rank over the registers that are set
+    registers_set : array-like
+        Number of registers that are set
+    precision : int
+        Number of index bits used to build the registers
+
+    Returns:
+    --------
+    np.ndarray
+        Estimated distinct counts
+    """
+    m = 1 << precision
+    rank_sum = np.asarray(rank_sum, dtype=np.float64)
+    registers_set = np.asarray(registers_set, dtype=np.float64)
+    empty = m - registers_set
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / (rank_sum + empty)
+    # Linear counting is more accurate while many registers are still empty
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / np.where(empty > 0, empty, 1))
+    use_linear = (raw <= 2.5 * m) & (empty > 0)
+    return np.where(use_linear, linear, raw)
+
+
+def _cube_frame(df):
+    """
+    Add the cube key columns derived from InvoiceDate to a line-item frame.
+    """
+    is_return = return_flags(df)
+    return pd.DataFrame({
+        'Date': df['InvoiceDate'].dt.normalize(),
+        'Hour': df['InvoiceDate'].dt.hour.astype('int8'),
+        'Country': df['Country'],
+        'StockCode': df['StockCode'],
+        'Description': df['Description'],
+        'Revenue': df['TotalPrice'],
+        'Quantity': df['Quantity'],
+        'Return': is_return,
+        # Cancellations carry negative totals; the cube keeps their value positive
+        'ReturnValue': np.where(is_return, -df['TotalPrice'].to_numpy(dtype=np.float64), 0.0),
+        'Invoice': df['Invoice'],
+    })
+
+
+def _aggregate_cells(items, keys):
+    """
+    Sum the cube measures of line items per combination of `keys`.
+    """
+    cells = items.groupby(keys, observed=True, sort=False).agg(
+        Revenue=('Revenue', 'sum'),
+        Quantity=('Quantity', 'sum'),
+        Lines=('Revenue', 'size'),
+        ReturnLines=('Return', 'sum'),
+        ReturnRevenue=('ReturnValue', 'sum'),
+    ).reset_index()
+    cells[['Lines', 'ReturnLines']] = cells[['Lines', 'ReturnLines']].astype('int32')
+    return cells
+
+
+def _day_fingerprints(df):
+    """
+    One content fingerprint per day: the sum (modulo 2**64) of its line fingerprints.
+    """
+    codes, days = pd.factorize(df['InvoiceDate'].dt.normalize(), sort=True)
+    lines = line_fingerprints(df, FINGERPRINT_COLUMNS)
+    valid = codes >= 0
+    codes, lines = codes[valid], lines[valid]
+    order = np.argsort(codes, kind='stable')
+    starts = np.flatnonzero(np.diff(codes[order], prepend=-1) != 0)
+    # Addition is order-independent and, unlike XOR, does not cancel duplicate lines
+    sums = (np.add.reduceat(lines[order], starts) if len(starts)
+            else np.empty(0, dtype=np.uint64))
+    return pd.DataFrame({'Date': days, 'Fingerprint': sums})
+
+
+def build_daily_cube(df, precision=HLL_PRECISION):
+    """
+    Aggregate line items into the cube tables and the invoice sketch table.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Processed line items (InvoiceDate, Country, StockCode, Description,
+        TotalPrice, Quantity, Invoice; IsReturn when present)
+    precision : int
+        HyperLogLog precision for the distinct-invoice sketches
+
+    Returns:
+    --------
+    dict of pd.DataFrame
+        The CUBE_TABLES, 'sketch' (the max rank per hourly cell and register)
+        and 'days' (the content fingerprint of every day)
+    """
+    items = _cube_frame(df)
+    cube = {name: _aggregate_cells(items, keys) for name, keys in CUBE_TABLES.items()}
+
+    registers, ranks = hll_registers(items['Invoice'], precision)
+    sketch = items[CUBE_KEYS].assign(Register=registers, Rank=ranks)
+    cube['sketch'] = (
+        sketch.groupby(CUBE_KEYS + ['Register'], observed=True, sort=False)['Rank']
+        .max()
+        .reset_index()
+    )
+    cube['days'] = _day_fingerprints(df)
+
+    sizes = ", ".join(f"{len(cube[name])} {name}" for name in CUBE_TABLES)
+    logger.info(f"✓ Built daily cube: {len(df)} line items -> {sizes} cells")
+    return cube
+
+
+def update_daily_cube(cube, df, precision=HLL_PRECISION):
+    """
+    Incrementally bring a cube up to date with a line-item frame.
+
+    Only days whose content fingerprint differs from the cube's 'days'
+    table (including days missing from it) are re-aggregated; all other
+    cells are kept.
+
+    Parameters:
+    -----------
+    cube : dict of pd.DataFrame
+        Existing cube from build_daily_cube
+    df : pd.DataFrame
+        Current processed line items
+    precision : int
+        HyperLogLog precision for the distinct-invoice sketches
+
+    Returns:
+    --------
+    dict of pd.DataFrame
+        Updated cube
+    """
+    current = _day_fingerprints(df).set_index('Date')['Fingerprint']
+    existing = cube['days'].set_index('Date')['Fingerprint']
+    # Compared as uint64; reindexing in missing days would cast them to float
+    changed = ~current.index.isin(existing.index)
+    known = current.index[~changed]
+    changed[~changed] = existing.loc[known].to_numpy() != current.loc[known].to_numpy()
+    stale_dates = current.index[changed].union(existing.index.difference(current.index))
+
+    if len(stale_dates) == 0:
+        logger.info("✓ Daily cube is up to date")
+        return cube
+
+    rebuild = df[df['InvoiceDate'].dt.normalize().isin(stale_dates)]
+    fresh = build_daily_cube(rebuild, precision)
+    cube = {
+        name: pd.concat([table[~table['Date'].isin(stale_dates)], fresh[name]], ignore_index=True)
+        for name, table in cube.items()
+    }
+    logger.info(f"✓ Refreshed {len(stale_dates)} day(s) of the daily cube")
+    return cube
+
+
+def _cube_paths(file_path):
+    """
+    Return the persisted path of every cube table next to a processed dataset.
+    """
+    base = os.path.splitext(file_path)[0]
+    return {
+        'hourly': base + "_cube.parquet",
+        'products': base + "_cube_products.parquet",
+        'sketch': base + "_cube_sketch.parquet",
+        'days': base + "_cube_days.parquet",
+    }
+
+
+def _table_columns(name):
+    """
+    Columns of a persisted cube table.
+    """
+    if name == 'sketch':
+        return CUBE_KEYS + ['Register', 'Rank']
+    if name == 'days':
+        return ['Date', 'Fingerprint']
+    return CUBE_TABLES[name] + CUBE_MEASURES
+
+
+def _has_columns(path, columns):
+    """
+    Whether a Parquet file holds exactly the given columns.
+    """
+    import pyarrow.parquet as pq
+
+    return set(pq.read_schema(path).names) == set(columns)
+
+
+# Resolved file path -> (source signature, cube), so reruns skip the Parquet reads
+_CUBE_CACHE = {}
+
+
+def load_daily_cube(file_path=None):
+    """
+    Load the persisted daily cube, building or refreshing it when needed.
+
+    The cube tables are stored next to the processed CSV or partitioned
+    dataset directory and kept in memory until the source's mtime or size
+    changes. When the source has changed since the cube was written, only
+    the affected days are rebuilt.
+
+    Parameters:
+    -----------
+    file_path : str, optional
+        Path to the processed CSV or partitioned dataset directory
+        (default: data/processed/ecommerce_cleaned.csv)
+
+    Returns:
+    --------
+    dict of pd.DataFrame
+        The cube (see build_daily_cube); shared by every caller, so treat
+        it as read-only
+    """
+    if file_path is None:
+        file_path = get_processed_data_path("ecommerce_cleaned.csv")
+    file_path = os.path.abspath(file_path)
+
+    signature = _file_signature(file_path)
+    cached = _CUBE_CACHE.get(file_path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    encoded = _encode_signature(signature)
+    paths = _cube_paths(file_path)
+    signatures = {name: _read_parquet_signature(path) for name, path in paths.items()}
+    # Tables written at another grain or before a measure was added are rebuilt
+    usable = all(found is not None and _has_columns(paths[name], _table_columns(name))
+                 for name, found in signatures.items())
+
+    if usable and all(found == encoded for found in signatures.values()):
+        cube = {name: pd.read_parquet(path) for name, path in paths.items()}
+    else:
+        df = load_processed_data(file_path)
+        if usable:
+            cube = update_daily_cube({name: pd.read_parquet(path) for name, path in paths.items()}, df)
+        else:
+            cube = build_daily_cube(df)
+        for name, path in paths.items():
+            _write_parquet_with_signature(cube[name], path, signature)
+        logger.info(f"✓ Saved daily cube to {paths['hourly']}")
+
+    _CUBE_CACHE[file_path] = (signature, cube)
+    return cube
+
+
+def _filter_cells(frame, start=None, end=None, countries=None, descriptions=None,
+                  stock_codes=None):
+    """
+    Select the cube (or sketch) cells matching the dashboard filters.
+    """
+    mask = np.ones(len(frame), dtype=bool)
+    if start is not None:
+        mask &= (frame['Date'] >= pd.Timestamp(start).normalize()).to_numpy()
+    if end is not None:
+        mask &= (frame['Date'] <= pd.Timestamp(end).normalize()).to_numpy()
+    if countries:
+        mask &= frame['Country'].isin(countries).to_numpy()
+    if descriptions:
+        mask &= frame['Description'].isin(descriptions).to_numpy()
+    if stock_codes:
+        mask &= frame['StockCode'].isin(stock_codes).to_numpy()
+    return frame[mask]
+
+
+def _with_derived_keys(frame, by):
+    """
+    Add any Date-derived grouping columns requested in `by`.
+    """
+    derived = [key for key in by if key in DERIVED_KEYS]
+    if not derived:
+        return frame
+    return frame.assign(**calendar_features(frame['Date'], derived))
+
+
+def cube_table(cube, dimensions):
+    """
+    Pick the smallest cube table holding the given dimensions.
+
+    Parameters:
+    -----------
+    cube : dict of pd.DataFrame
+        Cube from build_daily_cube / load_daily_cube
+    dimensions : iterable of str
+        Grouping and filter dimensions; Date-derived ones (DERIVED_KEYS) are
+        available in every table
+
+    Returns:
+    --------
+    str
+        Name of the table (a key of CUBE_TABLES)
+    """
+    needed = set(dimensions) - set(DERIVED_KEYS)
+    for name, keys in CUBE_TABLES.items():
+        if needed <= set(keys):
+            return name
+    raise ValueError(f"No cube table holds all of {sorted(needed)}; "
+                     "hours of individual products are not kept")
+
+
+def _filter_dimensions(countries=None, descriptions=None, stock_codes=None, **_):
+    """
+    Cube dimensions the given filters select on.
+    """
+    return [key for key, values in (('Country', countries), ('Description', descriptions),
+                                    ('StockCode', stock_codes)) if values]
+
+
+def rollup_cube(cube, by, orders=False, start=None, end=None, countries=None,
+                descriptions=None, stock_codes=None, precision=HLL_PRECISION):
+    """
+    Roll the cube up to the requested dimensions for a filter state.
+
+    Parameters:
+    -----------
+    cube : dict of pd.DataFrame
+        Cube from build_daily_cube / load_daily_cube
+    by : list of str
+        Grouping dimensions: any cube key or Year, Month, YearMonth, Week,
+        DayOfWeek (derived from Date). Hour cannot be combined with a
+        product dimension or filter
+    orders : bool
+        Add an Orders column estimated from the invoice sketch; only for
+        dimensions and filters of the hourly table
+    start, end : date-like, optional
+        Inclusive date bounds
+    countries, descriptions, stock_codes : list, optional
+        Values to keep for the respective dimension
+    precision : int
+        HyperLogLog precision the sketch was built with
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per group with CUBE_MEASURES (and Orders)
+    """
+    filters = dict(start=start, end=end, countries=countries,
+                   descriptions=descriptions, stock_codes=stock_codes)
+    table = cube_table(cube, list(by) + _filter_dimensions(**filters))
+    cells = _with_derived_keys(_filter_cells(cube[table], **filters), by)
+    result = cells.groupby(by, observed=True)[CUBE_MEASURES].sum()
+
+    if orders:
+        if table != 'hourly':
+            raise ValueError("Orders are only estimated for the hourly table's dimensions")
+        marks = _with_derived_keys(_filter_cells(cube['sketch'], **filters), by)
+        ranks = marks.groupby(by + ['Register'], observed=True)['Rank'].max()
+        weights = np.exp2(-ranks.astype(np.float64))
+        level = list(range(len(by)))
+        rank_sum = weights.groupby(level=level).sum()
+        registers_set = weights.groupby(level=level).size()
+        estimates = pd.Series(
+            hll_estimate(rank_sum, registers_set, precision),
+            index=rank_sum.index,
+        )
+        result['Orders'] = estimates.reindex(result.index).fillna(0).round().astype('int64')
+
+    return result.reset_index()
+
+
+def bin_cube(cube, rows, columns, measure='Revenue', start=None, end=None, countries=None,
+             descriptions=None, stock_codes=None):
+    """
+    Bin a cube measure over two dimensions for a filter state, for heatmaps.
+
+    Parameters:
+    -----------
+    cube : dict of pd.DataFrame
+        Cube from build_daily_cube / load_daily_cube
+    rows, columns : str
+        Dimensions: any cube key or Year, Month, YearMonth, Week, DayOfWeek
+        (derived from Date)
+    measure : str
+        One of CUBE_MEASURES
+    start, end : date-like, optional
+        Inclusive date bounds
+    countries, descriptions, stock_codes : list, optional
+        Values to keep for the respective dimension
+
+    Returns:
+    --------
+    dict
+        Grid from binning.bin_2d; see binning.grid_frame for the table
+    """
+    filters = dict(start=start, end=end, countries=countries,
+                   descriptions=descriptions, stock_codes=stock_codes)
+    table = cube_table(cube, [rows, columns] + _filter_dimensions(**filters))
+    cells = _filter_cells(cube[table], **filters)
+    return bin_2d(_with_derived_keys(cells, [rows, columns]), rows, columns, measure)
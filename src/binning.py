@@ -0,0 +1,236 @@
+"""
+Binning Utilities
+
+Functions to aggregate a value over any pair of dimensions (hour x weekday,
+month x country, week x category, ...) into a dense 2-D grid, the input of
+heatmaps.
+
+Both axes are mapped to small integer codes and every row is accumulated
+with np.bincount into flat sum and count arrays, so no pivot_table or
+string grouping is involved. A grid is a dict of its row and column labels
+and its 'sum' and 'count' arrays; grids of chunks, files or partitions
+merge by adding the arrays, and sum, count or mean tables are derived at
+the end. The module only depends on pandas and numpy so the notebooks can
+import it as a top-level module.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Also imported as a top-level module by the notebooks (src on sys.path)
+try:
+    from .date_features import CALENDAR_FEATURES, DAY_NAMES, calendar_features
+except ImportError:
+    from date_features import CALENDAR_FEATURES, DAY_NAMES, calendar_features
+
+
+BIN_AGGS = ('sum', 'count', 'mean')
+
+# Integer axes spanning at most this many values get one bin per value in
+# their range (e.g. every hour of the day), even for values without rows
+MAX_DENSE_RANGE = 10_000
+
+
+def axis_codes(values):
+    """
+    Map the values of one axis to integer bin codes.
+
+    Categorical values keep their category order, weekday names are
+    ordered Monday to Sunday, small integer ranges keep every value of the
+    range, and anything else is sorted.
+
+    Parameters:
+    -----------
+    values : pd.Series
+        Axis values
+
+    Returns:
+    --------
+    codes : np.ndarray
+        int64 bin code per value, -1 for missing values
+    labels : pd.Index
+        Label of every bin
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.int64), pd.Index(values.cat.categories)
+
+    if pd.api.types.is_integer_dtype(values):
+        # Nullable integer axes (e.g. Int64) may hold <NA>, which gets no bin
+        missing = values.isna().to_numpy()
+        present = values.to_numpy(dtype=np.int64, na_value=0)[~missing]
+        if len(present):
+            low, high = int(present.min()), int(present.max())
+            if high - low < MAX_DENSE_RANGE:
+                codes = np.full(len(values), -1, dtype=np.int64)
+                codes[~missing] = present - low
+                return codes, pd.RangeIndex(low, high + 1)
+
+    codes, uniques = pd.factorize(values)
+    if not len(uniques):
+        # Empty or all missing: no bins
+        return codes.astype(np.int64), pd.Index(uniques)
+    if pd.Index(uniques).isin(DAY_NAMES).all():
+        order = pd.Index(DAY_NAMES).get_indexer(uniques)
+        present = np.sort(order)
+        return np.where(codes >= 0, np.searchsorted(present, order)[codes], -1), \
+            pd.Index(DAY_NAMES).take(present)
+    # Re-code in sorted label order
+    uniques = pd.Index(uniques)
+    order = uniques.argsort()
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return np.where(codes >= 0, rank[codes], -1), uniques.take(order)
+
+
+def _axis_values(df, column, date_column):
+    """
+    A column of the frame, or a calendar feature (or 'Hour') derived from the date column.
+    """
+    if column in df.columns or date_column is None:
+        return df[column]
+    if column == 'Hour':
+        return df[date_column].dt.hour
+    if column in CALENDAR_FEATURES:
+        return calendar_features(df[date_column], [column])[column]
+    raise KeyError(column)
+
+
+def bin_2d(df, rows, columns, value_column=None, date_column=None):
+    """
+    Accumulate a value into a dense grid over two dimensions.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Input DataFrame (or one chunk or partition of it)
+    rows, columns : str
+        Dimension columns of the grid's rows and columns; calendar features
+        (Month, Weekday, DayOfWeek, Week, YearMonth, ...) and 'Hour' may
+        also be derived from `date_column`
+    value_column : str, optional
+        Value to accumulate; without it only counts are kept
+    date_column : str, optional
+        Datetime column the derived dimensions come from
+
+    Returns:
+    --------
+    dict
+        Grid with 'rows' and 'columns' labels and the 'sum' and 'count'
+        arrays (rows x columns); rows with a missing dimension are skipped
+    """
+    row_codes, row_labels = axis_codes(_axis_values(df, rows, date_column))
+    col_codes, col_labels = axis_codes(_axis_values(df, columns, date_column))
+    size = len(row_labels) * len(col_labels)
+    shape = (len(row_labels), len(col_labels))
+
+    valid = (row_codes >= 0) & (col_codes >= 0)
+    weights = None
+    if value_column is not None:
+        weights = df[value_column].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid &= ~np.isnan(weights)
+    flat = row_codes * len(col_labels) + col_codes
+    # Skip the copies when nothing is missing, the common case
+    if not valid.all():
+        flat = flat[valid]
+        weights = weights[valid] if weights is not None else None
+
+    counts = np.bincount(flat, minlength=size).reshape(shape)
+    sums = (np.bincount(flat, weights=weights, minlength=size).reshape(shape)
+            if weights is not None else counts.astype(np.float64))
+    return {
+        'rows': row_labels.rename(rows),
+        'columns': col_labels.rename(columns),
+        'sum': sums,
+        'count': counts,
+    }
+
+
+def _union_labels(first, second):
+    """
+    Union of two axes' labels, keeping weekday, category or sorted order.
+    """
+    if first.equals(second):
+        return first
+    combined = first.append(second[~second.isin(first)])
+    if combined.isin(DAY_NAMES).all():
+        return pd.Index(DAY_NAMES)[pd.Index(DAY_NAMES).isin(combined)].rename(first.name)
+    if first.is_monotonic_increasing and second.is_monotonic_increasing:
+        return combined.sort_values()
+    return combined
+
+
+def merge_grids(grids):
+    """
+    Merge grids of chunks, files or partitions into one.
+
+    Parameters:
+    -----------
+    grids : list of dict
+        Grids from bin_2d over the same dimensions and value
+
+    Returns:
+    --------
+    dict
+        The merged grid, with the union of the row and column labels
+    """
+    rows, columns = grids[0]['rows'], grids[0]['columns']
+    for grid in grids[1:]:
+        rows, columns = _union_labels(rows, grid['rows']), _union_labels(columns, grid['columns'])
+
+    sums = np.zeros((len(rows), len(columns)))
+    counts = np.zeros((len(rows), len(columns)), dtype=np.int64)
+    for grid in grids:
+        cells = np.ix_(rows.get_indexer(grid['rows']), columns.get_indexer(grid['columns']))
+        sums[cells] += grid['sum']
+        counts[cells] += grid['count']
+    return {'rows': rows, 'columns': columns, 'sum': sums, 'count': counts}
+
+
+def grid_frame(grid, agg='sum'):
+    """
+    Turn a grid into a labelled table.
+
+    Parameters:
+    -----------
+    grid : dict
+        Grid from bin_2d / merge_grids
+    agg : str
+        'sum', 'count' or 'mean' (missing for empty cells)
+
+    Returns:
+    --------
+    pd.DataFrame
+        Rows x columns table of the aggregated value
+    """
+    if agg not in BIN_AGGS:
+        raise ValueError(f"Unknown aggregation '{agg}', expected one of {BIN_AGGS}")
+    if agg == 'mean':
+        values = grid['sum'] / np.where(grid['count'] > 0, grid['count'], np.nan)
+    else:
+        values = grid[agg]
+    return pd.DataFrame(values, index=grid['rows'], columns=grid['columns'])
+
+
+def heatmap_table(df, rows, columns, value_column=None, agg='sum', date_column=None):
+    """
+    Aggregate a value over two dimensions into a table, like a pivot_table.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Input DataFrame
+    rows, columns : str
+        Dimensions (see bin_2d)
+    value_column : str, optional
+        Value to aggregate (not needed for counts)
+    agg : str
+        'sum', 'count' or 'mean'
+    date_column : str, optional
+        Datetime column derived dimensions come from
+
+    Returns:
+    --------
+    pd.DataFrame
+        Rows x columns table
+    """
+    return grid_frame(bin_2d(df, rows, columns, value_column, date_column), agg)
@@ -4,37 +4,94 @@ Data Cleaning Utilities
 Functions to clean and preprocess e-commerce sales data.
 """
 
+import logging
+import os
+import shutil
+
 import pandas as pd
-import numpy as np
 
+# Also imported as a top-level module by the notebooks (src on sys.path)
+try:
+    from .date_features import calendar_features
+    from .dedup import (
+        DEFAULT_MEMORY_BUDGET_MB,
+        create_seen_set,
+        close_seen_set,
+        default_key_columns,
+        first_occurrences,
+        line_fingerprints,
+        mark_seen,
+    )
+    from .instrumentation import instrumented
+    from .outliers import apply_outlier_bounds, build_quantile_sketch, outlier_bounds
+except ImportError:
+    from date_features import calendar_features
+    from dedup import (
+        DEFAULT_MEMORY_BUDGET_MB,
+        create_seen_set,
+        close_seen_set,
+        default_key_columns,
+        first_occurrences,
+        line_fingerprints,
+        mark_seen,
+    )
+    from instrumentation import instrumented
+    from outliers import apply_outlier_bounds, build_quantile_sketch, outlier_bounds
+
+logger = logging.getLogger(__name__)
+
+
+# String-typed raw columns, read as str so values hash identically in every chunk
+RAW_STRING_COLUMNS = {
+    'Invoice': str,
+    'StockCode': str,
+    'Description': str,
+    'Country': str,
+}
+
+# Columns a line item cannot be analysed without
+REQUIRED_COLUMNS = ['Invoice', 'StockCode', 'Quantity', 'InvoiceDate', 'Price']
 
-def remove_duplicates(df):
+@instrumented()
+def remove_duplicates(df, key_columns=None, method='hash'):
     """
     Remove duplicate rows from a DataFrame.
+
+    Rows are compared by a 64-bit fingerprint over normalized key columns
+    (see dedup.line_fingerprints) and the first occurrence is kept. Use
+    dedup.duplicate_clusters to review what would be removed.
     
     Parameters:
     -----------
     df : pd.DataFrame
         Input DataFrame
+    key_columns : list, optional
+        Columns identifying a row (default: LINE_KEY_COLUMNS when present,
+        else every column)
+    method : str
+        'hash' or 'sort', see dedup.first_occurrences
     
     Returns:
     --------
     pd.DataFrame
         DataFrame with duplicates removed
     """
+    if key_columns is None:
+        key_columns = default_key_columns(df)
     initial_count = len(df)
-    df_cleaned = df.drop_duplicates()
+    df_cleaned = df[first_occurrences(line_fingerprints(df, key_columns), method)]
     final_count = len(df_cleaned)
     removed = initial_count - final_count
     
     if removed > 0:
-        print(f"✓ Removed {removed} duplicate rows")
+        logger.info(f"✓ Removed {removed} duplicate rows")
     else:
-        print("✓ No duplicates found")
+        logger.info("✓ No duplicates found")
     
     return df_cleaned
 
 
+@instrumented()
 def handle_missing_values(df, strategy='drop', columns=None):
     """
     Handle missing values in a DataFrame.
@@ -62,7 +119,7 @@ def handle_missing_values(df, strategy='drop', columns=None):
         df_cleaned = df.dropna(subset=columns)
         final_count = len(df_cleaned)
         removed = initial_count - final_count
-        print(f"✓ Dropped {removed} rows with missing values")
+        logger.info(f"✓ Dropped {removed} rows with missing values")
         return df_cleaned
     else:
         df_cleaned = df.copy()
@@ -71,10 +128,11 @@ def handle_missing_values(df, strategy='drop', columns=None):
                 df_cleaned[col].fillna(df_cleaned[col].median(), inplace=True)
             else:
                 df_cleaned[col].fillna(df_cleaned[col].mode()[0], inplace=True)
-        print("✓ Filled missing values")
+        logger.info("✓ Filled missing values")
         return df_cleaned
 
 
+@instrumented()
 def standardize_date_column(df, date_column):
     """
     Convert a column to datetime format.
@@ -92,10 +150,11 @@ def standardize_date_column(df, date_column):
         DataFrame with standardized date column
     """
     df[date_column] = pd.to_datetime(df[date_column], errors='coerce')
-    print(f"✓ Converted '{date_column}' to datetime format")
+    logger.info(f"✓ Converted '{date_column}' to datetime format")
     return df
 
 
+@instrumented()
 def extract_date_features(df, date_column):
     """
     Extract year, month, day, and day_of_week from a date column.
@@ -112,51 +171,65 @@ def extract_date_features(df, date_column):
     pd.DataFrame
         DataFrame with extracted date features
     """
-    df['Year'] = df[date_column].dt.year
-    df['Month'] = df[date_column].dt.month
-    df['Day'] = df[date_column].dt.day
-    df['DayOfWeek'] = df[date_column].dt.day_name()
+    features = calendar_features(df[date_column], ['Year', 'Month', 'Day', 'DayOfWeek'])
+    for col in features.columns:
+        df[col] = features[col]
     
-    print("✓ Extracted date features (Year, Month, Day, DayOfWeek)")
+    logger.info("✓ Extracted date features (Year, Month, Day, DayOfWeek)")
     return df
 
 
-def remove_outliers(df, column, method='iqr'):
+@instrumented()
+def remove_outliers(df, column, method='iqr', by=None, mode='drop', multiplier=1.5):
     """
-    Remove outliers from a DataFrame using IQR method.
+    Remove (or flag) outliers from a DataFrame using IQR or percentile bounds.
+
+    Bounds come from mergeable quantile sketches (see outliers.py), which
+    are within 1% of the exact quantiles. For chunked or partitioned data,
+    build the bounds in one pass with outliers.sketch_chunks and apply them
+    per chunk with outliers.apply_outlier_bounds.
     
     Parameters:
     -----------
     df : pd.DataFrame
         Input DataFrame
-    column : str
-        Name of the column to check for outliers
+    column : str or list
+        Name(s) of the column(s) to check for outliers, e.g.
+        ['Quantity', 'Price', 'TotalPrice']
     method : str
-        'iqr' for Interquartile Range method
+        'iqr' for Interquartile Range method, 'percentile' for the
+        1st/99th percentiles
+    by : list, optional
+        Group columns for per-group bounds, e.g. ['Country']
+    mode : str
+        'drop' removes outlier rows; 'flag' adds an IsOutlier column
+    multiplier : float
+        IQR multiplier
     
     Returns:
     --------
     pd.DataFrame
-        DataFrame with outliers removed
+        DataFrame with outliers removed (or flagged)
     """
-    Q1 = df[column].quantile(0.25)
-    Q3 = df[column].quantile(0.75)
-    IQR = Q3 - Q1
-    lower_bound = Q1 - 1.5 * IQR
-    upper_bound = Q3 + 1.5 * IQR
-    
-    initial_count = len(df)
-    df_cleaned = df[(df[column] >= lower_bound) & (df[column] <= upper_bound)]
-    final_count = len(df_cleaned)
-    removed = initial_count - final_count
-    
-    print(f"✓ Removed {removed} outliers from '{column}'")
+    columns = [column] if isinstance(column, str) else list(column)
+    sketch = build_quantile_sketch(df, columns, by)
+    bounds = outlier_bounds(sketch, method, multiplier)
+    df_cleaned = apply_outlier_bounds(df, bounds, by, mode)
+
+    names = ', '.join(f"'{col}'" for col in columns)
+    if mode == 'flag':
+        logger.info(f"✓ Flagged {int(df_cleaned['IsOutlier'].sum())} outliers in {names}")
+    else:
+        logger.info(f"✓ Removed {len(df) - len(df_cleaned)} outliers from {names}")
     return df_cleaned
 
 
+@instrumented()
 def clean_data(df):
     """
     Perform a complete data cleaning pipeline.
+
+    For raw files too large to load at once, use clean_csv_streaming.
     
     Parameters:
     -----------
@@ -168,16 +241,190 @@ def clean_data(df):
     pd.DataFrame
         Cleaned DataFrame
     """
-    print("Starting data cleaning pipeline...")
-    print("=" * 60)
+    logger.info("Starting data cleaning pipeline...")
     
     df_cleaned = df.copy()
     
     # Remove duplicates
     df_cleaned = remove_duplicates(df_cleaned)
     
-    print("=" * 60)
-    print("Data cleaning complete!")
+    logger.info("Data cleaning complete!")
     
     return df_cleaned
 
+
+
+@instrumented()
+def clean_line_items(df, date_column='InvoiceDate', required_columns=None):
+    """
+    Apply the per-row cleaning steps and derive TotalPrice.
+
+    Runs handle_missing_values on the required columns,
+    standardize_date_column and extract_date_features. Duplicates are not
+    removed here; see remove_duplicates and clean_csv_streaming.
+    
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Input DataFrame
+    date_column : str
+        Name of the date column
+    required_columns : list, optional
+        Rows missing any of these are dropped (default REQUIRED_COLUMNS)
+    
+    Returns:
+    --------
+    pd.DataFrame
+        Cleaned DataFrame with TotalPrice
+    """
+    if required_columns is None:
+        required_columns = REQUIRED_COLUMNS
+
+    df = handle_missing_values(df, strategy='drop',
+                               columns=[c for c in required_columns if c in df.columns])
+    df = standardize_date_column(df, date_column)
+    df = extract_date_features(df, date_column)
+    df['TotalPrice'] = df['Quantity'] * df['Price']
+    return df
+
+
+def partition_dir(store_path, year, month):
+    """
+    Return the Hive-style directory of one year/month partition.
+    
+    Parameters:
+    -----------
+    store_path : str
+        Root directory of the partitioned dataset
+    year, month : int
+        Partition keys
+    
+    Returns:
+    --------
+    str
+        Partition directory path
+    """
+    return os.path.join(store_path, f"year={int(year)}", f"month={int(month)}")
+
+
+@instrumented()
+def write_partitions(df, store_path, part_name, date_column='InvoiceDate',
+                     row_group_size=100_000):
+    """
+    Write cleaned lines into a year/month partitioned Parquet dataset.
+
+    Each partition gets one file named `part_name`. Rows are sorted by date
+    so row-group statistics let readers skip data outside a date range.
+    
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Cleaned line items with Year and Month columns
+    store_path : str
+        Root directory of the partitioned dataset
+    part_name : str
+        File name (without extension) written in each partition
+    date_column : str
+        Name of the date column to sort by
+    row_group_size : int
+        Maximum rows per Parquet row group
+    """
+    for (year, month), part in df.groupby(['Year', 'Month']):
+        part_dir = partition_dir(store_path, year, month)
+        os.makedirs(part_dir, exist_ok=True)
+        part_path = os.path.join(part_dir, f"{part_name}.parquet")
+        tmp_path = part_path + ".tmp"
+        part = part.sort_values(date_column, kind='mergesort')
+        part.to_parquet(tmp_path, index=False, row_group_size=row_group_size)
+        os.replace(tmp_path, part_path)
+
+
+@instrumented()
+def clean_csv_streaming(input_path, output_path, chunksize=500_000, encoding='utf-8',
+                        date_column='InvoiceDate', required_columns=None,
+                        partitioned=False, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Clean a raw CSV in chunks and write the result incrementally.
+
+    Each chunk goes through clean_line_items (handle_missing_values,
+    standardize_date_column, extract_date_features and TotalPrice).
+    Duplicate lines are removed across the whole file by their 64-bit
+    key-column fingerprints (see dedup.mark_seen). Seen fingerprints beyond
+    `memory_budget_mb` are spilled to disk, so peak memory is bounded by
+    the chunk size and the budget rather than by the file size.
+
+    With `partitioned=True` the output is a year=/month= partitioned Parquet
+    dataset directory (one part file per chunk and partition) instead of a
+    single CSV; load it with data_loader.load_sales_data.
+    
+    Parameters:
+    -----------
+    input_path : str
+        Path to the raw CSV file
+    output_path : str
+        Path of the cleaned CSV (or dataset directory) to write
+    chunksize : int
+        Number of rows read per chunk
+    encoding : str, optional
+        File encoding (default 'utf-8')
+    date_column : str
+        Name of the date column
+    required_columns : list, optional
+        Rows missing any of these are dropped (default REQUIRED_COLUMNS)
+    partitioned : bool
+        Write a partitioned Parquet dataset instead of a CSV
+    memory_budget_mb : float
+        Memory for seen fingerprints before they spill to disk
+    
+    Returns:
+    --------
+    dict
+        Row counts: rows_read, duplicates_removed, rows_written
+    """
+    logger.info("Starting streaming data cleaning pipeline...")
+
+    seen = create_seen_set(memory_budget_mb)
+    stats = {'rows_read': 0, 'duplicates_removed': 0, 'rows_written': 0}
+    tmp_path = output_path + ".tmp"
+    write_header = True
+    if partitioned:
+        # Created up front (without parts left by an interrupted run), so an
+        # input without rows still swaps in an empty dataset
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+    reader = pd.read_csv(input_path, encoding=encoding, chunksize=chunksize,
+                         dtype=RAW_STRING_COLUMNS)
+    try:
+        for chunk_number, chunk in enumerate(reader):
+            stats['rows_read'] += len(chunk)
+
+            # Drop rows already seen in this chunk or in an earlier one
+            keep = mark_seen(seen, line_fingerprints(chunk, default_key_columns(chunk)))
+            stats['duplicates_removed'] += int((~keep).sum())
+            chunk = chunk[keep]
+
+            chunk = clean_line_items(chunk, date_column, required_columns)
+
+            if partitioned:
+                write_partitions(chunk, tmp_path, f"part-{chunk_number:05d}", date_column)
+            else:
+                chunk.to_csv(tmp_path, mode='w' if write_header else 'a', header=write_header,
+                             index=False)
+            write_header = False
+            stats['rows_written'] += len(chunk)
+    finally:
+        close_seen_set(seen)
+
+    if partitioned and os.path.isdir(output_path):
+        # Swap the new dataset in, then remove the previous version
+        old_path = output_path + ".old"
+        os.replace(output_path, old_path)
+        os.replace(tmp_path, output_path)
+        shutil.rmtree(old_path)
+    else:
+        os.replace(tmp_path, output_path)
+
+    logger.info(f"✓ Removed {stats['duplicates_removed']} duplicate rows across chunks")
+    logger.info(f"✓ Wrote {stats['rows_written']} of {stats['rows_read']} rows to {output_path}")
+    return stats
@@ -0,0 +1,198 @@
+"""
+Date Feature Utilities
+
+Functions to derive calendar features (year, month, weekday, ISO week,
+month period, ...) from datetime columns through a shared calendar
+dimension table, and to floor datetimes to the start of their period.
+
+Each distinct day is described once in the calendar table, indexed by its
+integer day offset since 1970-01-01. Row features are then gathered from
+the table by that offset, so no per-row datetime parsing or weekday-name
+strings are needed. The module only depends on pandas and numpy so the
+notebooks can import it as a top-level module.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Features available from the calendar table
+CALENDAR_FEATURES = ['Year', 'Quarter', 'Month', 'Day', 'Weekday', 'DayOfWeek', 'ISOYear',
+                     'Week', 'YearMonth', 'MonthIndex']
+
+# Grains datetimes can be floored to, finest first
+PERIOD_GRAINS = ('hour', 'day', 'week', 'month', 'year')
+
+# numpy datetime unit of every grain except week, which starts on Monday (ISO)
+_GRAIN_UNITS = {'hour': 'h', 'day': 'D', 'month': 'M', 'year': 'Y'}
+
+# The calendar table shared by all lookups, extended when a date falls outside it
+_CALENDAR = None
+
+
+def build_calendar(first_day, last_day):
+    """
+    Build the calendar dimension table for a range of days.
+
+    Columns:
+      - Year, Quarter, Month, Day: calendar parts (int32)
+      - Weekday: 0 = Monday ... 6 = Sunday (int8)
+      - DayOfWeek: weekday name as an ordered categorical
+      - ISOYear, Week: ISO-8601 year and week number (int32)
+      - YearMonth: monthly period
+      - MonthIndex: year * 12 + month - 1, a sortable integer month code
+
+    Parameters:
+    -----------
+    first_day, last_day : date-like
+        Inclusive range of days to describe
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per day, indexed by day offset since 1970-01-01
+    """
+    days = pd.date_range(pd.Timestamp(first_day).normalize(), pd.Timestamp(last_day).normalize(),
+                         freq='D')
+    iso = days.isocalendar()
+    weekday = days.weekday.to_numpy().astype('int8')
+    calendar = pd.DataFrame({
+        'Date': days,
+        'Year': days.year.astype('int32'),
+        'Quarter': days.quarter.astype('int32'),
+        'Month': days.month.astype('int32'),
+        'Day': days.day.astype('int32'),
+        'Weekday': weekday,
+        'DayOfWeek': pd.Categorical.from_codes(weekday, categories=DAY_NAMES, ordered=True),
+        'ISOYear': iso['year'].to_numpy().astype('int32'),
+        'Week': iso['week'].to_numpy().astype('int32'),
+        'YearMonth': days.to_period('M'),
+        'MonthIndex': (days.year * 12 + days.month - 1).astype('int32'),
+    })
+    calendar.index = pd.Index(day_offsets(days), name='DayOffset')
+    return calendar
+
+
+def day_offsets(dates):
+    """
+    Integer day offsets since 1970-01-01 of datetime values.
+
+    Parameters:
+    -----------
+    dates : pd.Series, pd.DatetimeIndex or np.ndarray
+        Datetime values; missing values map to the minimum int64
+
+    Returns:
+    --------
+    np.ndarray
+        int64 day offsets
+    """
+    return np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+
+
+def get_calendar(first_offset, last_offset):
+    """
+    Return the shared calendar table, extended to cover the given day offsets.
+    """
+    global _CALENDAR
+    if _CALENDAR is None or first_offset < _CALENDAR.index[0] or last_offset > _CALENDAR.index[-1]:
+        if _CALENDAR is not None:
+            first_offset = min(first_offset, _CALENDAR.index[0])
+            last_offset = max(last_offset, _CALENDAR.index[-1])
+        epoch = pd.Timestamp('1970-01-01')
+        _CALENDAR = build_calendar(epoch + pd.Timedelta(days=int(first_offset)),
+                                   epoch + pd.Timedelta(days=int(last_offset)))
+    return _CALENDAR
+
+
+def calendar_features(dates, features=None):
+    """
+    Look up calendar features for every value of a datetime column.
+
+    Parameters:
+    -----------
+    dates : pd.Series
+        Datetime values (strings are parsed first)
+    features : list, optional
+        Features to return (default: every CALENDAR_FEATURES entry)
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per value, aligned with `dates`; rows of missing dates
+        hold missing values
+    """
+    if features is None:
+        features = CALENDAR_FEATURES
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates)
+
+    offsets = day_offsets(dates)
+    # NaT maps to the minimum int64
+    valid = offsets != np.iinfo(np.int64).min
+    if valid.any():
+        calendar = get_calendar(offsets[valid].min(), offsets[valid].max())
+    else:
+        calendar = get_calendar(0, 0)
+
+    positions = np.where(valid, offsets - calendar.index[0], 0)
+    result = calendar[features].take(positions)
+    result.index = dates.index
+    if not valid.all():
+        result = result.where(pd.Series(valid, index=result.index), axis=0)
+    return result
+
+
+def floor_dates(dates, grain):
+    """
+    Start of the hour, day, week, month or year containing each datetime value.
+
+    Flooring uses numpy datetime units, which is much faster than Period
+    conversion. Weeks start on Monday (ISO).
+
+    Parameters:
+    -----------
+    dates : pd.Series, pd.DatetimeIndex or np.ndarray
+        Datetime values
+    grain : str
+        One of PERIOD_GRAINS
+
+    Returns:
+    --------
+    pd.DatetimeIndex
+        Period start of every value (NaT stays NaT)
+    """
+    if grain not in PERIOD_GRAINS:
+        raise ValueError(f"Unknown grain '{grain}', expected one of {PERIOD_GRAINS}")
+    values = np.asarray(dates, dtype='datetime64[ns]')
+    if grain == 'week':
+        days = values.astype('datetime64[D]')
+        # 1970-01-01 was a Thursday, so Monday is day offset 4 (mod 7)
+        weekday = (days.astype(np.int64) + 3) % 7
+        starts = np.where(np.isnat(days), days, days - weekday.astype('timedelta64[D]'))
+    else:
+        starts = values.astype(f'datetime64[{_GRAIN_UNITS[grain]}]')
+    return pd.DatetimeIndex(starts.astype('datetime64[ns]'))
+
+
+def add_date_features(df, date_column, features=None):
+    """
+    Add calendar feature columns for a datetime column to a DataFrame.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Input DataFrame
+    date_column : str
+        Name of the datetime column
+    features : list, optional
+        Features to add (default: every CALENDAR_FEATURES entry)
+
+    Returns:
+    --------
+    pd.DataFrame
+        DataFrame with the added columns
+    """
+    return df.assign(**calendar_features(df[date_column], features))
@@ -0,0 +1,327 @@
+"""
+Deduplication Utilities
+
+Functions to find duplicate invoice lines by a compact 64-bit fingerprint
+over normalized key columns, within a frame or across chunks and files.
+
+Only the fingerprints are hashed and compared, never the full rows. Across
+chunks, a seen set keeps the fingerprints already emitted: a sorted array
+in memory plus a small sorted buffer of the latest chunks' new
+fingerprints, spilled to sorted runs on disk (read back memory-mapped)
+once it outgrows its memory budget. The buffer is only merged into the
+array when it fills up, so the cost per chunk does not grow with the
+number of fingerprints seen. The module only depends on pandas and numpy
+so the notebooks can import it as a top-level module.
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+
+# Columns that identify an invoice line, and the dtype each is normalized to
+# before fingerprinting so values hash the same whichever way they were loaded
+LINE_KEY_COLUMNS = {
+    'Invoice': 'str',
+    'StockCode': 'str',
+    'InvoiceDate': 'datetime64[ns]',
+    'Quantity': 'float64',
+    'Price': 'float64',
+    'Customer ID': 'float64',
+}
+
+# Memory budget of a seen set before it spills to disk
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+# Share of the memory budget held in the buffer of a seen set
+BUFFER_FRACTION = 1 / 16
+
+DEDUP_METHODS = ('hash', 'sort')
+
+
+def default_key_columns(df):
+    """
+    LINE_KEY_COLUMNS when the frame has all of them, else every column.
+    """
+    if all(col in df.columns for col in LINE_KEY_COLUMNS):
+        return list(LINE_KEY_COLUMNS)
+    return list(df.columns)
+
+
+def _column_hashes(values, dtype):
+    """
+    Hash one key column, normalized so equal values hash equally across sources.
+
+    String and date columns are factorized first, so each distinct value is
+    normalized (stripped, or parsed to a timestamp) and hashed only once.
+    """
+    if dtype in ('str', 'datetime64[ns]') or dtype is None and not is_numeric_dtype(values):
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Series(uniques, dtype=object)
+        if dtype == 'datetime64[ns]':
+            uniques = pd.Series(pd.to_datetime(uniques, errors='coerce').astype(dtype))
+        elif dtype == 'str':
+            uniques = uniques.astype(str).str.strip()
+        # Missing values have code -1, which picks the trailing missing entry
+        uniques = pd.concat([uniques, pd.Series([None], dtype=uniques.dtype)], ignore_index=True)
+        return pd.util.hash_pandas_object(uniques, index=False).to_numpy()[codes]
+    if dtype is not None:
+        # Prices read back from float32 storage must match the float64 originals
+        values = pd.to_numeric(values, errors='coerce').astype(dtype).round(4)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+def line_fingerprints(df, key_columns=None):
+    """
+    Compute a 64-bit fingerprint per row over normalized key columns.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Input DataFrame
+    key_columns : list, optional
+        Columns identifying a line (default: LINE_KEY_COLUMNS)
+
+    Returns:
+    --------
+    np.ndarray
+        uint64 fingerprint for every row
+    """
+    if key_columns is None:
+        key_columns = list(LINE_KEY_COLUMNS)
+
+    hashes = pd.DataFrame({col: _column_hashes(df[col], LINE_KEY_COLUMNS.get(col))
+                           for col in key_columns})
+    return pd.util.hash_pandas_object(hashes, index=False).to_numpy()
+
+
+def first_occurrences(fingerprints, method='hash'):
+    """
+    Mark the first occurrence of every fingerprint.
+
+    Parameters:
+    -----------
+    fingerprints : np.ndarray
+        uint64 fingerprints
+    method : str
+        'hash' (hash table, O(n)) or 'sort' (stable argsort, O(n log n)
+        but without a hash table)
+
+    Returns:
+    --------
+    np.ndarray
+        Boolean mask, True for rows whose fingerprint did not occur before
+    """
+    if method not in DEDUP_METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {DEDUP_METHODS}")
+    if method == 'hash':
+        return ~pd.Series(fingerprints).duplicated().to_numpy()
+
+    order = np.argsort(fingerprints, kind='stable')
+    ordered = fingerprints[order]
+    first = np.ones(len(ordered), dtype=bool)
+    first[1:] = ordered[1:] != ordered[:-1]
+    keep = np.empty(len(ordered), dtype=bool)
+    keep[order] = first
+    return keep
+
+
+def create_seen_set(memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, spill_dir=None):
+    """
+    Create an empty set of seen fingerprints for cross-chunk deduplication.
+
+    Parameters:
+    -----------
+    memory_budget_mb : float
+        Fingerprints kept in memory before they are spilled to a sorted
+        run on disk (8 bytes each)
+    spill_dir : str, optional
+        Parent directory of the spill files (default: the system temp dir)
+
+    Returns:
+    --------
+    dict
+        The seen set, for mark_seen; release it with close_seen_set
+    """
+    capacity = max(1, int(memory_budget_mb * 1024 ** 2) // 8)
+    return {
+        'memory': np.empty(0, dtype=np.uint64),
+        'buffer': np.empty(0, dtype=np.uint64),
+        'capacity': capacity,
+        'buffer_capacity': max(1, int(capacity * BUFFER_FRACTION)),
+        'spill_parent': spill_dir,
+        'spill_dir': None,
+        'runs': [],
+        'count': 0,
+    }
+
+
+def _spill(seen):
+    """
+    Write the in-memory fingerprints to a sorted run on disk.
+    """
+    if seen['spill_dir'] is None:
+        seen['spill_dir'] = tempfile.mkdtemp(prefix='dedup-', dir=seen['spill_parent'])
+    run_path = os.path.join(seen['spill_dir'], f"run-{len(seen['runs']):05d}.npy")
+    np.save(run_path, seen['memory'])
+    seen['runs'].append(np.load(run_path, mmap_mode='r'))
+    seen['memory'] = np.empty(0, dtype=np.uint64)
+
+
+def _merge_sorted(left, right):
+    """
+    Merge two sorted fingerprint arrays into one sorted array.
+    """
+    # Both halves are sorted runs, so the stable sort (timsort) only merges them
+    merged = np.concatenate([left, right])
+    merged.sort(kind='stable')
+    return merged
+
+
+def _flush(seen):
+    """
+    Merge the buffer into the in-memory array, spilling it when full.
+    """
+    seen['memory'] = _merge_sorted(seen['memory'], seen['buffer'])
+    seen['buffer'] = np.empty(0, dtype=np.uint64)
+    if len(seen['memory']) >= seen['capacity']:
+        _spill(seen)
+
+
+def _contains(sorted_values, fingerprints):
+    """
+    Membership of fingerprints in a sorted array.
+
+    Sorted fingerprints are much faster to look up in a large array, since
+    consecutive searches then touch neighbouring memory.
+    """
+    if len(sorted_values) == 0:
+        return np.zeros(len(fingerprints), dtype=bool)
+    positions = np.searchsorted(sorted_values, fingerprints).clip(max=len(sorted_values) - 1)
+    return np.asarray(sorted_values[positions]) == fingerprints
+
+
+def mark_seen(seen, fingerprints, method='hash'):
+    """
+    Mark the rows of a chunk whose fingerprint was not seen before, and add them.
+
+    Parameters:
+    -----------
+    seen : dict
+        Seen set from create_seen_set
+    fingerprints : np.ndarray
+        uint64 fingerprints of the chunk
+    method : str
+        Within-chunk method, see first_occurrences
+
+    Returns:
+    --------
+    np.ndarray
+        Boolean mask, True for rows to keep
+    """
+    keep = first_occurrences(fingerprints, method)
+    candidates = np.flatnonzero(keep)
+    candidates = candidates[np.argsort(fingerprints[candidates])]
+    values = fingerprints[candidates]
+    found = np.zeros(len(values), dtype=bool)
+    for sorted_values in [seen['buffer'], seen['memory']] + seen['runs']:
+        found |= _contains(sorted_values, values)
+    keep[candidates[found]] = False
+
+    # The buffer stays small, so merging every chunk into it costs the same
+    # however many fingerprints were seen; the large array only changes when
+    # the buffer is full
+    new = values[~found]
+    seen['buffer'] = _merge_sorted(seen['buffer'], new)
+    seen['count'] += len(new)
+    if (len(seen['buffer']) >= seen['buffer_capacity']
+            or len(seen['memory']) + len(seen['buffer']) >= seen['capacity']):
+        _flush(seen)
+    return keep
+
+
+def close_seen_set(seen):
+    """
+    Release a seen set and delete its spill files.
+    """
+    seen['runs'] = []
+    seen['memory'] = np.empty(0, dtype=np.uint64)
+    seen['buffer'] = np.empty(0, dtype=np.uint64)
+    if seen['spill_dir'] is not None:
+        shutil.rmtree(seen['spill_dir'], ignore_errors=True)
+        seen['spill_dir'] = None
+
+
+def deduplicate_chunks(chunks, key_columns=None, method='hash',
+                       memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, spill_dir=None, audit=None):
+    """
+    Drop lines already seen in an earlier chunk (or file) from a stream of chunks.
+
+    Parameters:
+    -----------
+    chunks : iterable of pd.DataFrame
+        Chunks in order, e.g. pd.read_csv(..., chunksize=...) over
+        several files
+    key_columns : list, optional
+        Columns identifying a line (default: LINE_KEY_COLUMNS)
+    method : str
+        Within-chunk method, see first_occurrences
+    memory_budget_mb : float
+        Seen fingerprints kept in memory before spilling to disk
+    spill_dir : str, optional
+        Parent directory of the spill files
+    audit : list, optional
+        When given, the dropped lines of every chunk are appended to it
+        with their Fingerprint, for duplicate_clusters-style review
+
+    Yields:
+    -------
+    pd.DataFrame
+        Each chunk without its duplicate lines
+    """
+    seen = create_seen_set(memory_budget_mb, spill_dir)
+    try:
+        for chunk in chunks:
+            columns = key_columns or default_key_columns(chunk)
+            fingerprints = line_fingerprints(chunk, columns)
+            keep = mark_seen(seen, fingerprints, method)
+            if audit is not None and not keep.all():
+                audit.append(chunk[~keep].assign(Fingerprint=fingerprints[~keep]))
+            yield chunk[keep]
+    finally:
+        close_seen_set(seen)
+
+
+def duplicate_clusters(df, key_columns=None):
+    """
+    List the lines that share a fingerprint with another line, for audit.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Input DataFrame
+    key_columns : list, optional
+        Columns identifying a line (default: LINE_KEY_COLUMNS when present,
+        else every column)
+
+    Returns:
+    --------
+    pd.DataFrame
+        Every line of a duplicate cluster, grouped by cluster, with its
+        Fingerprint, ClusterSize and whether it IsKept (the first
+        occurrence, which deduplication keeps)
+    """
+    fingerprints = line_fingerprints(df, key_columns or default_key_columns(df))
+    counts = pd.Series(fingerprints).map(pd.Series(fingerprints).value_counts()).to_numpy()
+    in_cluster = counts > 1
+    clusters = df[in_cluster].assign(
+        Fingerprint=fingerprints[in_cluster],
+        ClusterSize=counts[in_cluster],
+        IsKept=first_occurrences(fingerprints)[in_cluster],
+    )
+    return clusters.sort_values(['Fingerprint', 'IsKept'], ascending=[True, False],
+                                kind='mergesort')
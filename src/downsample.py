@@ -0,0 +1,217 @@
+"""
+Downsampling Utilities
+
+Functions to reduce long time series to a bounded number of points before
+they are drawn, so rendering time does not grow with the row count.
+
+Two steps are available:
+  - pre-aggregation to a time grain (hour, day, week, month, year) chosen
+    from the visible range, so at most `max_points` periods remain
+  - shape-preserving point selection for series that are still too long:
+    LTTB (Largest-Triangle-Three-Buckets), which keeps the points that
+    contribute most to the visual shape, or min-max, which keeps the
+    lowest and highest point of every x bucket so no peak is lost
+
+The module only depends on pandas and numpy so the notebooks can import it
+as a top-level module.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Also imported as a top-level module by the notebooks (src on sys.path)
+try:
+    from .date_features import floor_dates
+except ImportError:
+    from date_features import floor_dates
+
+
+# Default maximum number of points drawn for one series
+MAX_POINTS = 2000
+
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+# Approximate length of each grain, finest first
+_GRAIN_LENGTHS = {
+    'hour': pd.Timedelta(hours=1),
+    'day': pd.Timedelta(days=1),
+    'week': pd.Timedelta(weeks=1),
+    'month': pd.Timedelta(days=30.44),
+    'year': pd.Timedelta(days=365.25),
+}
+
+
+def choose_grain(start, end, max_points=MAX_POINTS):
+    """
+    Finest time grain that splits a date range into at most `max_points` periods.
+
+    Parameters:
+    -----------
+    start, end : date-like
+        Visible date range
+    max_points : int
+        Maximum number of periods
+
+    Returns:
+    --------
+    str
+        'hour', 'day', 'week', 'month' or 'year'
+    """
+    span = pd.Timestamp(end) - pd.Timestamp(start)
+    for grain, length in _GRAIN_LENGTHS.items():
+        if span / length + 1 <= max_points:
+            return grain
+    return 'year'
+
+
+def aggregate_series(dates, values, grain, how='sum'):
+    """
+    Aggregate values to one point per period of a time grain.
+
+    Parameters:
+    -----------
+    dates : array-like
+        Datetime values
+    values : array-like
+        Values to aggregate, aligned with `dates`
+    grain : str
+        'hour', 'day', 'week', 'month' or 'year'
+    how : str
+        Aggregation, e.g. 'sum' or 'mean'
+
+    Returns:
+    --------
+    pd.Series
+        Aggregated values indexed by period start, in time order
+    """
+    if grain not in _GRAIN_LENGTHS:
+        raise ValueError(f"Unknown grain '{grain}', expected one of {tuple(_GRAIN_LENGTHS)}")
+    periods = floor_dates(dates, grain)
+    return pd.Series(np.asarray(values), index=periods).groupby(level=0).agg(how)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Select points with Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept; the others are split into
+    n_out - 2 buckets, and from each the point forming the largest
+    triangle with the previously selected point and the next bucket's
+    average is kept.
+
+    Parameters:
+    -----------
+    x, y : np.ndarray
+        Coordinates, sorted by x, without missing values
+    n_out : int
+        Number of points to keep
+
+    Returns:
+    --------
+    np.ndarray
+        Sorted positions of the kept points
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        # Twice the triangle area, up to sign
+        area = np.abs((x[anchor] - next_x) * (y[lo:hi] - y[anchor])
+                      - (x[anchor] - x[lo:hi]) * (next_y - y[anchor]))
+        anchor = lo + int(np.argmax(area))
+        selected[i + 1] = anchor
+    return selected
+
+
+def minmax_indices(x, y, n_buckets):
+    """
+    Keep the lowest and highest point of each of `n_buckets` equal x ranges.
+
+    Parameters:
+    -----------
+    x, y : np.ndarray
+        Coordinates, sorted by x, without missing values
+    n_buckets : int
+        Number of x buckets (about one per horizontal pixel)
+
+    Returns:
+    --------
+    np.ndarray
+        Sorted positions of the kept points (at most 2 * n_buckets + 2)
+    """
+    n = len(x)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    span = x[-1] - x[0]
+    if span > 0:
+        bucket = np.minimum(((x - x[0]) / span * n_buckets).astype(np.int64), n_buckets - 1)
+    else:
+        bucket = np.zeros(n, dtype=np.int64)
+    per_bucket = pd.Series(np.asarray(y, dtype=np.float64)).groupby(bucket, sort=False)
+    return np.unique(np.r_[0, per_bucket.idxmin().to_numpy(), per_bucket.idxmax().to_numpy(), n - 1])
+
+
+def downsample_indices(x, y, max_points=MAX_POINTS, method='lttb'):
+    """
+    Select at most about `max_points` points that preserve a series' shape.
+
+    Parameters:
+    -----------
+    x, y : np.ndarray
+        Coordinates, sorted by x, without missing values
+    max_points : int
+        Maximum number of points to keep
+    method : str
+        'lttb' or 'minmax'
+
+    Returns:
+    --------
+    np.ndarray
+        Sorted positions of the kept points
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {DOWNSAMPLE_METHODS}")
+    if method == 'lttb':
+        return lttb_indices(x, y, max_points)
+    return minmax_indices(x, y, max(1, (max_points - 2) // 2))
+
+
+def downsample_series(series, max_points=MAX_POINTS, method='lttb'):
+    """
+    Downsample a series indexed by time (or numbers) for drawing.
+
+    Parameters:
+    -----------
+    series : pd.Series
+        Values indexed by datetime or numeric x, sorted by index
+    max_points : int
+        Maximum number of points to keep
+    method : str
+        'lttb' or 'minmax'
+
+    Returns:
+    --------
+    pd.Series
+        The kept points; missing and infinite values are dropped first
+    """
+    series = series[np.isfinite(series.to_numpy(dtype=np.float64))]
+    if len(series) <= max_points:
+        return series
+    index = series.index
+    if isinstance(index, pd.DatetimeIndex):
+        x = index.asi8
+    elif pd.api.types.is_numeric_dtype(index):
+        x = index.to_numpy()
+    else:
+        x = np.arange(len(series))
+    return series.iloc[downsample_indices(x, series.to_numpy(dtype=np.float64), max_points, method)]
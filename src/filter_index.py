@@ -0,0 +1,237 @@
+"""
+Filter Index Utilities
+
+Functions to build and query an inverted index over the dashboard filter
+columns, so filter options and selected rows are resolved from small
+integer arrays instead of scanning string columns on every rerun.
+
+For every indexed column the index holds:
+  - values: the distinct values in order of first appearance
+  - codes: the value code of every row (-1 when missing)
+  - positions / offsets: row positions grouped by code, so the rows of
+    code c are positions[offsets[c]:offsets[c + 1]], in ascending order
+InvoiceDate is indexed as a sorted order for date range lookups.
+"""
+
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from .data_loader import _file_signature, get_processed_data_path, load_processed_data
+
+logger = logging.getLogger(__name__)
+
+
+INDEX_COLUMNS = ['Description', 'StockCode', 'Country', 'Customer ID']
+
+# In-process cache of built indexes: path -> (signature, index)
+_INDEX_CACHE = {}
+
+
+def _index_column(series):
+    """
+    Build the inverted lists of one column.
+    """
+    codes, uniques = pd.factorize(series, sort=False)
+    codes = codes.astype(np.int32)
+    # Missing values get code -1 and sort first; they are not part of any list
+    order = np.argsort(codes, kind='stable')
+    positions = order[np.count_nonzero(codes < 0):]
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    return {
+        'values': pd.Index(uniques),
+        'codes': codes,
+        'positions': positions,
+        'offsets': offsets,
+    }
+
+
+def build_filter_index(df, columns=None, date_column='InvoiceDate'):
+    """
+    Build an inverted index over filter columns of a DataFrame.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Line items
+    columns : list, optional
+        Columns to index (default INDEX_COLUMNS)
+    date_column : str
+        Datetime column indexed for date range lookups
+
+    Returns:
+    --------
+    dict
+        The index, for index_values and select_rows
+    """
+    if columns is None:
+        columns = INDEX_COLUMNS
+
+    dates = df[date_column].to_numpy(dtype='datetime64[ns]')
+    date_order = np.argsort(dates, kind='stable')
+    index = {
+        'n_rows': len(df),
+        'columns': {col: _index_column(df[col]) for col in columns},
+        'dates': dates,
+        'date_order': date_order,
+        'sorted_dates': dates[date_order],
+    }
+    logger.info(f"✓ Built filter index over {len(df)} rows ({', '.join(columns)})")
+    return index
+
+
+def load_filter_index(file_path=None):
+    """
+    Return the filter index of the processed dataset, building it once per version.
+
+    The index matches the row order of load_processed_data(file_path).
+
+    Parameters:
+    -----------
+    file_path : str, optional
+        Path to the processed CSV or partitioned dataset directory
+        (default: data/processed/ecommerce_cleaned.csv)
+
+    Returns:
+    --------
+    dict
+        The index (see build_filter_index)
+    """
+    if file_path is None:
+        file_path = get_processed_data_path("ecommerce_cleaned.csv")
+    file_path = os.path.abspath(file_path)
+
+    signature = _file_signature(file_path)
+    cached = _INDEX_CACHE.get(file_path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    index = build_filter_index(load_processed_data(file_path))
+    _INDEX_CACHE[file_path] = (signature, index)
+    return index
+
+
+def _date_bounds(index, start, end):
+    """
+    Date limits [low, high) for `start` and `end` (inclusive of the day) and
+    the slice of the sorted date order they cover.
+    """
+    low = np.datetime64(pd.Timestamp(start).normalize(), 'ns') if start is not None else None
+    high = (np.datetime64(pd.Timestamp(end).normalize() + pd.Timedelta(days=1), 'ns')
+            if end is not None else None)
+    sorted_dates = index['sorted_dates']
+    lo = np.searchsorted(sorted_dates, low, 'left') if low is not None else 0
+    hi = np.searchsorted(sorted_dates, high, 'left') if high is not None else len(sorted_dates)
+    return low, high, lo, max(lo, hi)
+
+
+def _selected_codes(column_index, values):
+    """
+    Codes of the selected values that occur in the column.
+    """
+    codes = column_index['values'].get_indexer(pd.Index(list(values)))
+    return np.unique(codes[codes >= 0])
+
+
+def select_rows(index, filters=None, start=None, end=None):
+    """
+    Resolve combined filters to the matching row positions.
+
+    The most selective filter seeds the candidate rows from its inverted
+    lists; every other filter is applied as a code lookup on those
+    candidates only. As with Series.isin, rows missing a filtered column's
+    value are never kept; a filter selecting every value of a column
+    without missing values is skipped.
+
+    Parameters:
+    -----------
+    index : dict
+        Index from build_filter_index / load_filter_index
+    filters : dict, optional
+        Column -> values to keep; empty or missing means no filter
+    start, end : date-like, optional
+        Inclusive date bounds; `end` covers the whole day
+
+    Returns:
+    --------
+    np.ndarray
+        Ascending row positions, for DataFrame.take
+    """
+    n_rows = index['n_rows']
+    # Each filter: (rows it keeps, column or None for the date range, codes or date bounds)
+    selections = []
+    if start is not None or end is not None:
+        bounds = _date_bounds(index, start, end)
+        lo, hi = bounds[2:]
+        if hi - lo < n_rows:
+            selections.append((hi - lo, None, bounds))
+    for col, values in (filters or {}).items():
+        if not values:
+            continue
+        column_index = index['columns'][col]
+        codes = _selected_codes(column_index, values)
+        # Every value selected keeps every row, unless some rows are missing one
+        if len(codes) == len(column_index['values']) and column_index['offsets'][-1] == n_rows:
+            continue
+        offsets = column_index['offsets']
+        selections.append((int((offsets[codes + 1] - offsets[codes]).sum()), col, codes))
+
+    if not selections:
+        return np.arange(n_rows)
+    selections.sort(key=lambda selection: selection[0])
+
+    _, col, selected = selections[0]
+    if col is None:
+        rows = np.sort(index['date_order'][selected[2]:selected[3]])
+    else:
+        column_index = index['columns'][col]
+        positions, offsets = column_index['positions'], column_index['offsets']
+        rows = np.sort(np.concatenate(
+            [positions[offsets[c]:offsets[c + 1]] for c in selected] or [np.empty(0, np.int64)]
+        ))
+
+    for _, col, selected in selections[1:]:
+        if col is None:
+            low, high = selected[:2]
+            dates = index['dates'][rows]
+            if low is not None:
+                rows, dates = rows[dates >= low], dates[dates >= low]
+            if high is not None:
+                rows = rows[dates < high]
+        else:
+            column_index = index['columns'][col]
+            keep = np.zeros(len(column_index['values']) + 1, dtype=bool)
+            keep[selected] = True
+            # Missing values have code -1, which maps to the last (False) slot
+            rows = rows[keep[column_index['codes'][rows]]]
+    return rows
+
+
+def index_values(index, column, rows=None):
+    """
+    Distinct values of an indexed column, in order of first appearance.
+
+    Parameters:
+    -----------
+    index : dict
+        Index from build_filter_index / load_filter_index
+    column : str
+        Indexed column
+    rows : np.ndarray, optional
+        Only return values occurring in these row positions
+
+    Returns:
+    --------
+    list
+        Distinct values
+    """
+    column_index = index['columns'][column]
+    values = column_index['values']
+    if rows is None or len(rows) == index['n_rows']:
+        return values.tolist()
+    codes = column_index['codes'][rows]
+    present = np.bincount(codes[codes >= 0], minlength=len(values)) > 0
+    return values[present].tolist()
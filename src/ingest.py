@@ -0,0 +1,313 @@
+"""
+Incremental Ingestion
+
+Clean newly arrived raw invoice files and append them to the partitioned
+processed store, skipping files that were already ingested.
+
+A JSON manifest in the processed directory records every ingested raw file
+(content hash, part file name, row count, max InvoiceDate, and the parts
+its duplicate lines were found in), so a nightly refresh only touches the
+delta. When a file changes or disappears from the raw directory, the parts
+written for its previous version are removed; files whose lines were
+deduplicated against those parts are re-ingested as well, so no line is
+lost with the part that used to hold it. Usage from the project root:
+
+    python -m src.ingest
+"""
+
+import fnmatch
+import glob
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .data_cleaner import (
+    RAW_STRING_COLUMNS,
+    clean_line_items,
+    partition_dir,
+    write_partitions,
+)
+from .aggregates import load_daily_cube
+from .data_loader import get_processed_data_path, get_raw_data_path, publish_shared_dataset
+from .dedup import first_occurrences, line_fingerprints
+from .returns import load_returns_index
+
+logger = logging.getLogger(__name__)
+
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+STORE_DIRNAME = "sales"
+
+
+def file_sha256(file_path, block_size=1 << 20):
+    """
+    Compute the SHA-256 hex digest of a file without loading it whole.
+
+    Parameters:
+    -----------
+    file_path : str
+        Path to the file
+    block_size : int
+        Bytes read per block
+
+    Returns:
+    --------
+    str
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path=None):
+    """
+    Load the ingest manifest, or an empty one if nothing was ingested yet.
+
+    Parameters:
+    -----------
+    manifest_path : str, optional
+        Path to the manifest (default: data/processed/ingest_manifest.json)
+
+    Returns:
+    --------
+    dict
+        Mapping of raw filename to its manifest entry
+    """
+    if manifest_path is None:
+        manifest_path = get_processed_data_path(MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, manifest_path=None):
+    """
+    Atomically write the ingest manifest.
+
+    Parameters:
+    -----------
+    manifest : dict
+        Mapping of raw filename to its manifest entry
+    manifest_path : str, optional
+        Path to the manifest (default: data/processed/ingest_manifest.json)
+    """
+    if manifest_path is None:
+        manifest_path = get_processed_data_path(MANIFEST_FILENAME)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _existing_fingerprints(store_path, partitions):
+    """
+    Fingerprint the lines already stored in the given (year, month) partitions.
+
+    Returns a dict of part name -> fingerprints of its lines in these partitions.
+    """
+    fingerprints = {}
+    for year, month in partitions:
+        part_files = glob.glob(os.path.join(partition_dir(store_path, year, month), "*.parquet"))
+        for part_file in part_files:
+            part_name = os.path.splitext(os.path.basename(part_file))[0]
+            fingerprints.setdefault(part_name, []).append(
+                line_fingerprints(pd.read_parquet(part_file)))
+    return {part_name: np.concatenate(parts) for part_name, parts in fingerprints.items()}
+
+
+def remove_parts(store_path, part_name):
+    """
+    Delete the part file named `part_name` from every partition of the store.
+
+    Parameters:
+    -----------
+    store_path : str
+        Root directory of the partitioned store
+    part_name : str
+        File name (without extension) of the parts to delete
+
+    Returns:
+    --------
+    int
+        Number of part files deleted
+    """
+    pattern = os.path.join(store_path, "year=*", "month=*", f"{part_name}.parquet")
+    part_files = glob.glob(pattern)
+    for part_file in part_files:
+        os.remove(part_file)
+    return len(part_files)
+
+
+def append_to_store(df, store_path, part_name):
+    """
+    Append cleaned lines to the store, skipping lines it already holds.
+
+    Only the year/month partitions the new lines fall into are read to
+    check for duplicates, so the cost scales with the size of the delta.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Cleaned line items with Year and Month columns
+    store_path : str
+        Root directory of the partitioned store
+    part_name : str
+        File name (without extension) for the new part in each partition
+
+    Returns:
+    --------
+    tuple
+        (number of lines written, sorted names of the stored parts that
+        held lines which were therefore skipped)
+    """
+    fingerprints = line_fingerprints(df)
+    keep = first_occurrences(fingerprints)
+    partitions = df[['Year', 'Month']].drop_duplicates().itertuples(index=False)
+    matched_parts = []
+    for existing_part, existing in _existing_fingerprints(store_path, list(partitions)).items():
+        stored = np.isin(fingerprints, existing)
+        if stored.any():
+            matched_parts.append(existing_part)
+            keep &= ~stored
+    new_lines = df[keep]
+
+    write_partitions(new_lines, store_path, part_name)
+
+    logger.info(f"✓ Appended {len(new_lines)} new lines "
+                f"({len(df) - len(new_lines)} already stored or duplicated)")
+    return len(new_lines), sorted(matched_parts)
+
+
+def _part_name(entry):
+    """
+    Part file name of a manifest entry; entries written before part names were
+    recorded used the hash prefix too.
+    """
+    return entry.get('part_name', entry['sha256'][:16])
+
+
+def _dependents(manifest, dropped_parts, skip):
+    """
+    Manifest files whose skipped lines were found in a dropped part, transitively.
+    """
+    dropped_parts = set(dropped_parts)
+    dependents = set()
+    changed = True
+    while changed:
+        changed = False
+        for filename, entry in manifest.items():
+            if filename in skip or filename in dependents:
+                continue
+            if dropped_parts.intersection(entry.get('deduplicated_against', [])):
+                dependents.add(filename)
+                dropped_parts.add(_part_name(entry))
+                changed = True
+    return dependents
+
+
+def ingest_new_files(pattern="*.csv", encoding='ISO-8859-1', store_path=None,
+                     manifest_path=None):
+    """
+    Clean and append raw files that have not been ingested yet.
+
+    Files are matched in the raw data directory. A file is skipped when the
+    manifest already holds an entry with the same content hash. A changed
+    file replaces its previous version, and a manifest file matching
+    `pattern` that no longer exists is removed: the parts written for those
+    versions are deleted first, so corrected or removed lines do not stay
+    in the store. Files that skipped lines because a deleted part held them
+    are re-ingested after the changed files, so those lines come back
+    unless the new versions still hold them.
+
+    Parameters:
+    -----------
+    pattern : str
+        Glob pattern of raw CSV files, relative to data/raw
+    encoding : str, optional
+        Raw file encoding (default 'ISO-8859-1')
+    store_path : str, optional
+        Root of the partitioned store (default: data/processed/sales)
+    manifest_path : str, optional
+        Path to the manifest (default: data/processed/ingest_manifest.json)
+
+    Returns:
+    --------
+    list
+        Names of the files ingested in this run
+    """
+    if store_path is None:
+        store_path = get_processed_data_path(STORE_DIRNAME)
+    manifest = load_manifest(manifest_path)
+    ingested = []
+
+    hashes = {os.path.basename(file_path): file_sha256(file_path)
+              for file_path in glob.glob(get_raw_data_path(pattern))}
+    deleted = [filename for filename in manifest
+               if fnmatch.fnmatch(filename, pattern) and filename not in hashes]
+    changed = [filename for filename, content_hash in hashes.items()
+               if filename in manifest and manifest[filename]['sha256'] != content_hash]
+    dropped_parts = [_part_name(manifest[filename]) for filename in deleted + changed]
+    dependents = _dependents(manifest, dropped_parts, skip=set(deleted + changed))
+
+    # Drop every outdated part before appending anything, so nothing is
+    # deduplicated against them; the entries go too, so an interrupted run
+    # ingests these files again as new
+    for filename in deleted + changed + sorted(dependents):
+        removed = remove_parts(store_path, _part_name(manifest.pop(filename)))
+        reason = "no longer in the raw directory" if filename in deleted else "re-ingested"
+        logger.info(f"✓ Removed {removed} part(s) of {filename} ({reason})")
+    if deleted or changed or dependents:
+        save_manifest(manifest, manifest_path)
+
+    # Changed and new files first, then the files that depended on dropped parts
+    order = sorted(hashes, key=lambda filename: (filename in dependents, filename))
+    for filename in order:
+        content_hash = hashes[filename]
+        if filename in manifest:
+            continue
+
+        logger.info(f"Ingesting {filename}...")
+        df = pd.read_csv(get_raw_data_path(filename), encoding=encoding, dtype=RAW_STRING_COLUMNS)
+        rows_read = len(df)
+        df = clean_line_items(df)
+        part_name = content_hash[:16]
+        rows_written, matched_parts = append_to_store(df, store_path, part_name=part_name)
+
+        manifest[filename] = {
+            'sha256': content_hash,
+            'part_name': part_name,
+            'deduplicated_against': matched_parts,
+            'rows': rows_read,
+            'rows_appended': rows_written,
+            'max_invoice_date': str(df['InvoiceDate'].max()),
+            'ingested_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        # Save after every file so an interrupted run resumes where it stopped
+        save_manifest(manifest, manifest_path)
+        ingested.append(filename)
+
+    if ingested or deleted:
+        logger.info(f"✓ Ingested {len(ingested)} new file(s), removed {len(deleted)}")
+        # Swap the new version in for the dashboards sharing the mapped dataset
+        publish_shared_dataset(store_path)
+        # Precompute the cube and the returns index so no request pays for them
+        load_daily_cube(store_path)
+        load_returns_index(store_path)
+    else:
+        logger.info("✓ No new raw files to ingest")
+    return ingested
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    ingest_new_files()
@@ -0,0 +1,242 @@
+"""
+Instrumentation Utilities
+
+Record wall time, CPU time, rows in/out and memory change of pipeline
+stages and dashboard panels.
+
+CPU time is that of the thread running the stage, so panels computed
+concurrently in the panel scheduler's threads are measured separately;
+work a stage hands to other threads (a thread pool, DuckDB) is not
+included. The memory change is the process-wide resident set size
+difference and includes whatever other threads allocated meanwhile.
+
+Every finished stage adds a record to an in-process registry that can be
+queried with get_records(). When a log path is set (set_log_path or the
+PIPELINE_LOG_PATH environment variable), each record is also appended to
+that file as one JSON line.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+# Maximum number of records kept in the in-process registry
+MAX_RECORDS = 10_000
+
+_RECORDS = deque(maxlen=MAX_RECORDS)
+_LOG_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_log_path = os.environ.get('PIPELINE_LOG_PATH')
+
+
+def set_log_path(path):
+    """
+    Append every finished stage record to a JSON-lines file.
+
+    Parameters:
+    -----------
+    path : str or None
+        Log file path, or None to stop logging to a file
+    """
+    global _log_path
+    _log_path = path
+
+
+def _rss_mb():
+    """
+    Resident set size of this process in MB, or None where unavailable.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _row_count(value):
+    """
+    Number of rows of a DataFrame, Series or array; None for anything else.
+    """
+    if hasattr(value, 'shape') and len(getattr(value, 'shape', ())) > 0:
+        return int(value.shape[0])
+    return None
+
+
+def _stack():
+    """
+    Names of the stages currently running in this thread.
+    """
+    if not hasattr(_LOCAL, 'stack'):
+        _LOCAL.stack = []
+    return _LOCAL.stack
+
+
+@contextmanager
+def stage(name, rows_in=None, **labels):
+    """
+    Record a block of code as a named stage.
+
+    The yielded dict is the record being built; set record['rows_out']
+    (or any other key) inside the block to add to it. cpu_seconds is the
+    CPU time of the current thread; process_memory_delta_mb is the change
+    of the whole process's resident set size.
+
+    Parameters:
+    -----------
+    name : str
+        Stage name, e.g. 'clean_data' or 'panel:monthly_sales'
+    rows_in : int, optional
+        Number of input rows
+    **labels
+        Extra JSON-serializable fields stored with the record
+
+    Yields:
+    -------
+    dict
+        The stage record
+    """
+    stack = _stack()
+    record = {
+        'stage': name,
+        'parent': stack[-1] if stack else None,
+        'rows_in': rows_in,
+        'rows_out': None,
+        **labels,
+    }
+    stack.append(name)
+    rss_before = _rss_mb()
+    started_at = time.time()
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield record
+        record['status'] = 'ok'
+    except BaseException as e:
+        record['status'] = f"error: {type(e).__name__}"
+        raise
+    finally:
+        record['wall_seconds'] = time.perf_counter() - wall_start
+        record['cpu_seconds'] = time.thread_time() - cpu_start
+        rss_after = _rss_mb()
+        # Process-wide: includes memory allocated by concurrently running threads
+        record['process_memory_delta_mb'] = (None if rss_before is None or rss_after is None
+                                             else round(rss_after - rss_before, 2))
+        record['started_at'] = started_at
+        stack.pop()
+        _add_record(record)
+
+
+def instrumented(name=None):
+    """
+    Decorator recording every call of a function as a stage.
+
+    rows_in is taken from the first DataFrame (or Series) argument and
+    rows_out from the returned value when it has rows.
+
+    Parameters:
+    -----------
+    name : str, optional
+        Stage name (default: the function name)
+
+    Returns:
+    --------
+    callable
+        The decorator
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rows_in = next((_row_count(a) for a in args
+                            if isinstance(a, (pd.DataFrame, pd.Series))), None)
+            with stage(stage_name, rows_in=rows_in) as record:
+                result = func(*args, **kwargs)
+                record['rows_out'] = _row_count(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def _add_record(record):
+    """
+    Store a finished record and append it to the JSON-lines log.
+    """
+    _RECORDS.append(record)
+    if _log_path:
+        line = json.dumps(record, default=str)
+        with _LOG_LOCK:
+            with open(_log_path, 'a') as f:
+                f.write(line + "\n")
+
+
+def get_records(stage_name=None, since=None):
+    """
+    Query the recorded stages.
+
+    Parameters:
+    -----------
+    stage_name : str, optional
+        Keep only records of this stage; a trailing '*' matches a prefix
+        (e.g. 'panel:*')
+    since : float, optional
+        Keep only stages started at or after this time.time() value
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per record, oldest first
+    """
+    records = list(_RECORDS)
+    if since is not None:
+        records = [r for r in records if r['started_at'] >= since]
+    if stage_name is not None:
+        if stage_name.endswith('*'):
+            records = [r for r in records if r['stage'].startswith(stage_name[:-1])]
+        else:
+            records = [r for r in records if r['stage'] == stage_name]
+    columns = ['stage', 'parent', 'wall_seconds', 'cpu_seconds', 'rows_in', 'rows_out',
+               'process_memory_delta_mb', 'status', 'started_at']
+    df = pd.DataFrame(records)
+    return df.reindex(columns=columns + [c for c in df.columns if c not in columns])
+
+
+def summarize_records(records=None):
+    """
+    Aggregate records per stage, slowest total first.
+
+    Parameters:
+    -----------
+    records : pd.DataFrame, optional
+        Records from get_records (default: all records)
+
+    Returns:
+    --------
+    pd.DataFrame
+        Calls, total/mean/max wall time and total thread CPU time per stage
+    """
+    if records is None:
+        records = get_records()
+    summary = records.groupby('stage').agg(
+        calls=('wall_seconds', 'size'),
+        total_seconds=('wall_seconds', 'sum'),
+        mean_seconds=('wall_seconds', 'mean'),
+        max_seconds=('wall_seconds', 'max'),
+        cpu_seconds=('cpu_seconds', 'sum'),
+    )
+    return summary.sort_values('total_seconds', ascending=False)
+
+
+def clear_records():
+    """
+    Drop every record from the in-process registry.
+    """
+    _RECORDS.clear()
@@ -0,0 +1,295 @@
+"""
+Time-Series Metrics Utilities
+
+Functions to compute revenue, orders, AOV, units and return rate at any
+time grain (hour, day, week, month, year), with rolling windows and
+period-over-period changes.
+
+Line items are aggregated once into an hourly base table of additive
+measures. Every coarser grain is a sum over that table, and the ratio
+metrics (AOV, ReturnRate) are derived from the summed measures, so no
+per-group Python callbacks are needed. Orders are additive across time
+buckets because all lines of an invoice share one InvoiceDate. When new
+days arrive, update_metrics_base replaces just those days of the base
+table instead of recomputing history.
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+
+from .data_loader import return_flags
+from .date_features import calendar_features, floor_dates
+from .instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+
+GRAINS = ('hour', 'day', 'week', 'month', 'year')
+
+# Frequency of consecutive period starts at each grain; weeks start on Monday (ISO)
+_GRAIN_FREQ = {
+    'hour': 'h',
+    'day': 'D',
+    'week': 'W-MON',
+    'month': 'MS',
+    'year': 'YS',
+}
+
+# Additive measures kept in the base table
+BASE_MEASURES = ['Revenue', 'Units', 'Lines', 'ReturnLines', 'Orders']
+
+# Ratio metrics: name -> (numerator, denominator)
+RATIO_METRICS = {
+    'AOV': ('Revenue', 'Orders'),
+    'ReturnRate': ('ReturnLines', 'Lines'),
+}
+
+
+def period_start(dates, grain):
+    """
+    Start of the period containing each datetime value.
+
+    Parameters:
+    -----------
+    dates : pd.Series, pd.DatetimeIndex or np.ndarray
+        Datetime values
+    grain : str
+        One of GRAINS
+
+    Returns:
+    --------
+    pd.DatetimeIndex
+        Period start of every value (NaT stays NaT)
+    """
+    return floor_dates(dates, grain)
+
+
+def period_labels(periods, grain):
+    """
+    Display labels for period starts, e.g. '2011-03' or '2010-W52' (ISO week).
+
+    Parameters:
+    -----------
+    periods : pd.Series or pd.DatetimeIndex
+        Period starts from rollup_metrics
+    grain : str
+        Grain of the periods
+
+    Returns:
+    --------
+    pd.Index
+        One label per period
+    """
+    periods = pd.DatetimeIndex(periods)
+    if grain == 'week':
+        iso = calendar_features(pd.Series(periods), ['ISOYear', 'Week'])
+        return pd.Index(iso['ISOYear'].astype(str) + '-W' + iso['Week'].map('{:02d}'.format))
+    formats = {'hour': '%Y-%m-%d %H:00', 'day': '%Y-%m-%d', 'month': '%Y-%m', 'year': '%Y'}
+    return pd.Index(periods.strftime(formats[grain]))
+
+
+@instrumented()
+def build_metrics_base(df):
+    """
+    Aggregate line items into the hourly base table of additive measures.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Processed line items (InvoiceDate, Invoice, Quantity, TotalPrice)
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per hour with sales: Period and BASE_MEASURES
+    """
+    items = pd.DataFrame({
+        'Period': period_start(df['InvoiceDate'], 'hour'),
+        'Revenue': df['TotalPrice'].to_numpy(),
+        'Units': df['Quantity'].to_numpy(),
+        'Return': return_flags(df),
+        'Invoice': df['Invoice'].to_numpy(),
+    })
+    base = items.groupby('Period').agg(
+        Revenue=('Revenue', 'sum'),
+        Units=('Units', 'sum'),
+        Lines=('Revenue', 'size'),
+        ReturnLines=('Return', 'sum'),
+        Orders=('Invoice', 'nunique'),
+    ).reset_index()
+    return base.astype({'Units': 'int64', 'Lines': 'int64', 'ReturnLines': 'int64',
+                        'Orders': 'int64'})
+
+
+def update_metrics_base(base, new_rows):
+    """
+    Bring the base table up to date with newly loaded days of line items.
+
+    Every day present in `new_rows` is replaced as a whole, so `new_rows`
+    must hold all lines of the days it covers; other days are kept as is.
+
+    Parameters:
+    -----------
+    base : pd.DataFrame
+        Existing table from build_metrics_base
+    new_rows : pd.DataFrame
+        Line items of the new (or changed) days
+
+    Returns:
+    --------
+    pd.DataFrame
+        Updated base table
+    """
+    fresh = build_metrics_base(new_rows)
+    days = period_start(fresh['Period'], 'day').unique()
+    kept = base[~period_start(base['Period'], 'day').isin(days)]
+    updated = pd.concat([kept, fresh], ignore_index=True)
+    updated = updated.sort_values('Period', kind='mergesort').reset_index(drop=True)
+    logger.info(f"✓ Refreshed {len(days)} day(s) of the metrics base table")
+    return updated
+
+
+def _add_ratios(metrics):
+    """
+    Derive the RATIO_METRICS columns from the summed measures.
+    """
+    for name, (numerator, denominator) in RATIO_METRICS.items():
+        metrics[name] = metrics[numerator] / metrics[denominator].where(metrics[denominator] > 0)
+    return metrics
+
+
+def rollup_metrics(base, grain='day', start=None, end=None, fill_gaps=True):
+    """
+    Roll the base table up to a time grain.
+
+    Parameters:
+    -----------
+    base : pd.DataFrame
+        Table from build_metrics_base
+    grain : str
+        One of GRAINS
+    start, end : date-like, optional
+        Inclusive date bounds; `end` covers the whole day
+    fill_gaps : bool
+        Add zero rows for periods without sales, so rolling windows and
+        period-over-period changes count calendar periods
+
+    Returns:
+    --------
+    pd.DataFrame
+        Period (start), BASE_MEASURES and RATIO_METRICS per period
+    """
+    mask = np.ones(len(base), dtype=bool)
+    if start is not None:
+        mask &= (base['Period'] >= pd.Timestamp(start).normalize()).to_numpy()
+    if end is not None:
+        mask &= (base['Period'] < pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).to_numpy()
+    base = base[mask]
+
+    periods = period_start(base['Period'], grain).rename('Period')
+    metrics = base[BASE_MEASURES].groupby(periods).sum()
+    if fill_gaps and len(metrics):
+        full = pd.date_range(metrics.index[0], metrics.index[-1], freq=_GRAIN_FREQ[grain],
+                             name='Period')
+        metrics = metrics.reindex(full, fill_value=0)
+    return _add_ratios(metrics).reset_index()
+
+
+def compute_metrics(df, grain='day', start=None, end=None, fill_gaps=True):
+    """
+    Compute the time-series metrics of line items at a grain.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Processed line items
+    grain : str
+        One of GRAINS
+    start, end : date-like, optional
+        Inclusive date bounds
+    fill_gaps : bool
+        Add zero rows for periods without sales
+
+    Returns:
+    --------
+    pd.DataFrame
+        Metrics per period (see rollup_metrics)
+    """
+    return rollup_metrics(build_metrics_base(df), grain, start, end, fill_gaps)
+
+
+def add_rolling(metrics, window, columns=None, how='mean'):
+    """
+    Add trailing rolling-window columns named '<column>_Rolling<window>'.
+
+    Additive measures are averaged (or summed) over the window; ratio
+    metrics are recomputed from the window sums of their parts, e.g. the
+    rolling AOV is window revenue / window orders.
+
+    Parameters:
+    -----------
+    metrics : pd.DataFrame
+        Output of rollup_metrics, ideally with gaps filled
+    window : int
+        Number of periods in the window
+    columns : list, optional
+        Metrics to roll (default: Revenue, Orders and AOV)
+    how : str
+        'mean' or 'sum' for the additive measures
+
+    Returns:
+    --------
+    pd.DataFrame
+        Copy of `metrics` with the rolling columns added
+    """
+    if columns is None:
+        columns = ['Revenue', 'Orders', 'AOV']
+    metrics = metrics.copy()
+    sums = {}
+
+    def window_sum(column):
+        if column not in sums:
+            sums[column] = metrics[column].rolling(window, min_periods=1).sum()
+        return sums[column]
+
+    for column in columns:
+        if column in RATIO_METRICS:
+            numerator, denominator = RATIO_METRICS[column]
+            total = window_sum(denominator)
+            rolled = window_sum(numerator) / total.where(total > 0)
+        elif how == 'sum':
+            rolled = window_sum(column)
+        else:
+            rolled = metrics[column].rolling(window, min_periods=1).mean()
+        metrics[f"{column}_Rolling{window}"] = rolled
+    return metrics
+
+
+def add_period_deltas(metrics, columns=None, periods=1):
+    """
+    Add period-over-period change columns named '<column>_Change' (percent).
+
+    Parameters:
+    -----------
+    metrics : pd.DataFrame
+        Output of rollup_metrics, ideally with gaps filled
+    columns : list, optional
+        Metrics to compare (default: Revenue, Orders and AOV)
+    periods : int
+        Number of periods back to compare with, e.g. 52 on a weekly
+        table for year-over-year
+
+    Returns:
+    --------
+    pd.DataFrame
+        Copy of `metrics` with the change columns added; changes from a
+        zero or missing value are missing
+    """
+    if columns is None:
+        columns = ['Revenue', 'Orders', 'AOV']
+    metrics = metrics.copy()
+    for column in columns:
+        previous = metrics[column].shift(periods)
+        metrics[f"{column}_Change"] = (metrics[column] / previous.where(previous != 0) - 1) * 100
+    return metrics
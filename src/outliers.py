@@ -0,0 +1,303 @@
+"""
+Outlier Detection Utilities
+
+Functions to compute IQR or percentile outlier bounds from mergeable
+quantile sketches, so bounds over chunked or partitioned data take a
+single pass and never sort a full column.
+
+The sketch is a relative-error log histogram (DDSketch): each value falls
+in a bucket whose bounds grow by a constant factor, so every quantile is
+estimated within `accuracy` (1% by default) of its true value. A sketch is
+a long table of bucket counts per column (and per group), so sketches of
+chunks, files or partitions merge by summing counts. The module only
+depends on pandas and numpy so the notebooks can import it as a
+top-level module.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+OUTLIER_COLUMNS = ['Quantity', 'Price', 'TotalPrice']
+
+OUTLIER_METHODS = ('iqr', 'percentile')
+
+# Relative accuracy of the sketched quantiles
+QUANTILE_ACCURACY = 0.01
+
+# Absolute values below this fall in the zero bucket
+MIN_MAGNITUDE = 1e-9
+
+# Offset keeping the bucket keys of positive values above zero
+_BUCKET_SHIFT = 1 << 20
+
+
+def _gamma(accuracy):
+    return (1 + accuracy) / (1 - accuracy)
+
+
+def sketch_buckets(values, accuracy=QUANTILE_ACCURACY):
+    """
+    Map values to sketch bucket keys, ordered like the values.
+
+    Parameters:
+    -----------
+    values : array-like
+        Numeric values (missing values are not allowed)
+    accuracy : float
+        Relative accuracy of the sketch
+
+    Returns:
+    --------
+    np.ndarray
+        int64 keys: 0 for (near) zero, positive for positive values and
+        negative for negative values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    magnitude = np.abs(values)
+    nonzero = magnitude >= MIN_MAGNITUDE
+    index = np.zeros(len(values), dtype=np.int64)
+    index[nonzero] = np.ceil(np.log(magnitude[nonzero]) / np.log(_gamma(accuracy)))
+    return np.where(nonzero, np.sign(values).astype(np.int64) * (index + _BUCKET_SHIFT), 0)
+
+
+def bucket_values(buckets, accuracy=QUANTILE_ACCURACY):
+    """
+    Representative value of sketch buckets, within `accuracy` of any value in them.
+    """
+    buckets = np.asarray(buckets, dtype=np.int64)
+    gamma = _gamma(accuracy)
+    index = np.abs(buckets) - _BUCKET_SHIFT
+    values = 2 * np.power(gamma, index.astype(np.float64)) / (gamma + 1)
+    return np.where(buckets == 0, 0.0, np.sign(buckets) * values)
+
+
+def build_quantile_sketch(df, columns=None, by=None, accuracy=QUANTILE_ACCURACY):
+    """
+    Build a quantile sketch of numeric columns, optionally per group.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Input DataFrame (or one chunk of it)
+    columns : list, optional
+        Numeric columns to sketch (default OUTLIER_COLUMNS)
+    by : list, optional
+        Group columns, e.g. ['Country']; bounds are then per group
+    accuracy : float
+        Relative accuracy of the quantiles
+
+    Returns:
+    --------
+    pd.DataFrame
+        Count per group, Column and Bucket
+    """
+    if columns is None:
+        columns = OUTLIER_COLUMNS
+    by = list(by or [])
+
+    tables = []
+    for column in columns:
+        values = df[column]
+        present = values.notna().to_numpy()
+        cells = df.loc[present, by].assign(
+            Column=column,
+            Bucket=sketch_buckets(values.to_numpy()[present], accuracy),
+        )
+        tables.append(cells.groupby(by + ['Column', 'Bucket'], observed=True).size()
+                      .rename('Count').reset_index())
+    return pd.concat(tables, ignore_index=True)
+
+
+def merge_quantile_sketches(sketches):
+    """
+    Merge sketches of chunks, files or partitions into one.
+
+    Parameters:
+    -----------
+    sketches : list of pd.DataFrame
+        Sketches from build_quantile_sketch, with the same columns, group
+        columns and accuracy
+
+    Returns:
+    --------
+    pd.DataFrame
+        The merged sketch
+    """
+    combined = pd.concat(sketches, ignore_index=True)
+    keys = [col for col in combined.columns if col != 'Count']
+    return combined.groupby(keys, observed=True)['Count'].sum().reset_index()
+
+
+def sketch_quantiles(sketch, quantiles, accuracy=QUANTILE_ACCURACY):
+    """
+    Estimate quantiles from a sketch.
+
+    Parameters:
+    -----------
+    sketch : pd.DataFrame
+        Sketch from build_quantile_sketch / merge_quantile_sketches
+    quantiles : list of float
+        Quantiles in [0, 1]
+    accuracy : float
+        Relative accuracy the sketch was built with
+
+    Returns:
+    --------
+    pd.DataFrame
+        One column per quantile, indexed by the sketch's group columns and
+        Column
+    """
+    keys = [col for col in sketch.columns if col not in ('Bucket', 'Count')]
+    if sketch.empty:
+        return pd.DataFrame(columns=list(quantiles), index=pd.MultiIndex.from_frame(sketch[keys]))
+    ordered = sketch.sort_values(keys + ['Bucket'], kind='mergesort')
+    group = ordered.groupby(keys, observed=True, sort=False).ngroup().to_numpy()
+    counts = ordered['Count'].to_numpy(dtype=np.int64)
+    cumulative = np.cumsum(counts)
+    # Running count within each group, made globally increasing by group offsets
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    totals = np.add.reduceat(counts, starts)
+    before = np.repeat(cumulative[starts] - counts[starts], np.diff(np.r_[starts, len(group)]))
+    span = float(totals.max() + 1)
+    position = group * span + (cumulative - before)
+
+    index = pd.MultiIndex.from_frame(ordered[keys].iloc[starts]) if len(keys) > 1 \
+        else pd.Index(ordered[keys[0]].iloc[starts])
+    result = {}
+    for q in quantiles:
+        # The bucket holding the value of 0-based rank q * (n - 1)
+        target = np.arange(len(starts)) * span + np.floor(q * (totals - 1))
+        hits = np.searchsorted(position, target, side='right')
+        result[q] = bucket_values(ordered['Bucket'].to_numpy()[hits], accuracy)
+    return pd.DataFrame(result, index=index)
+
+
+def outlier_bounds(sketch, method='iqr', multiplier=1.5, percentiles=(0.01, 0.99),
+                   accuracy=QUANTILE_ACCURACY):
+    """
+    Compute outlier bounds from a sketch.
+
+    Parameters:
+    -----------
+    sketch : pd.DataFrame
+        Sketch from build_quantile_sketch / merge_quantile_sketches
+    method : str
+        'iqr': [Q1 - multiplier * IQR, Q3 + multiplier * IQR];
+        'percentile': the `percentiles` quantiles
+    multiplier : float
+        IQR multiplier
+    percentiles : tuple of float
+        Lower and upper quantile for the 'percentile' method
+    accuracy : float
+        Relative accuracy the sketch was built with
+
+    Returns:
+    --------
+    pd.DataFrame
+        Lower and Upper, indexed by the sketch's group columns and Column
+    """
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {OUTLIER_METHODS}")
+    if method == 'iqr':
+        quartiles = sketch_quantiles(sketch, [0.25, 0.75], accuracy)
+        iqr = quartiles[0.75] - quartiles[0.25]
+        lower, upper = quartiles[0.25] - multiplier * iqr, quartiles[0.75] + multiplier * iqr
+    else:
+        limits = sketch_quantiles(sketch, list(percentiles), accuracy)
+        lower, upper = limits[percentiles[0]], limits[percentiles[1]]
+    return pd.DataFrame({'Lower': lower, 'Upper': upper})
+
+
+def outlier_mask(df, bounds, by=None):
+    """
+    Mark the rows with a value outside its column's (and group's) bounds.
+
+    Rows of groups without bounds and missing values are not outliers.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Input DataFrame (or one chunk of it)
+    bounds : pd.DataFrame
+        Bounds from outlier_bounds
+    by : list, optional
+        Group columns the bounds were computed per
+
+    Returns:
+    --------
+    np.ndarray
+        Boolean mask, True for outlier rows
+    """
+    by = list(by or [])
+    mask = np.zeros(len(df), dtype=bool)
+    for column in bounds.index.get_level_values('Column').unique():
+        if by:
+            column_bounds = bounds.xs(column, level='Column')
+            rows = pd.MultiIndex.from_frame(df[by]) if len(by) > 1 else pd.Index(df[by[0]])
+            positions = column_bounds.index.get_indexer(rows)
+            known = positions >= 0
+            lower = np.where(known, column_bounds['Lower'].to_numpy()[positions], -np.inf)
+            upper = np.where(known, column_bounds['Upper'].to_numpy()[positions], np.inf)
+        else:
+            lower, upper = bounds.loc[column, ['Lower', 'Upper']]
+        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        mask |= (values < lower) | (values > upper)
+    return mask
+
+
+def apply_outlier_bounds(df, bounds, by=None, mode='drop'):
+    """
+    Drop or flag the outlier rows of a frame or chunk.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Input DataFrame (or one chunk of it)
+    bounds : pd.DataFrame
+        Bounds from outlier_bounds
+    by : list, optional
+        Group columns the bounds were computed per
+    mode : str
+        'drop' removes outlier rows; 'flag' keeps every row and adds a
+        boolean IsOutlier column
+
+    Returns:
+    --------
+    pd.DataFrame
+        The frame without (or with flagged) outliers
+    """
+    mask = outlier_mask(df, bounds, by)
+    if mode == 'flag':
+        return df.assign(IsOutlier=mask)
+    if mode != 'drop':
+        raise ValueError(f"Unknown mode '{mode}', expected 'drop' or 'flag'")
+    return df[~mask]
+
+
+def sketch_chunks(chunks, columns=None, by=None, accuracy=QUANTILE_ACCURACY):
+    """
+    Build one merged quantile sketch over a stream of chunks in a single pass.
+
+    Parameters:
+    -----------
+    chunks : iterable of pd.DataFrame
+        Chunks, e.g. pd.read_csv(..., chunksize=...) or the part files of
+        a partitioned dataset
+    columns : list, optional
+        Numeric columns to sketch (default OUTLIER_COLUMNS)
+    by : list, optional
+        Group columns
+    accuracy : float
+        Relative accuracy of the quantiles
+
+    Returns:
+    --------
+    pd.DataFrame
+        The merged sketch
+    """
+    sketch = None
+    for chunk in chunks:
+        part = build_quantile_sketch(chunk, columns, by, accuracy)
+        sketch = part if sketch is None else merge_quantile_sketches([sketch, part])
+    return sketch
@@ -0,0 +1,298 @@
+"""
+Panel Rendering Utilities
+
+Render dashboard panels from small aggregated inputs, with a cache keyed
+on the panel id and a hash of its input so unchanged panels are not
+redrawn on every rerun. Panels may be rendered from several threads; a
+panel being rendered by one thread is waited for, not redrawn, by others.
+
+Two backends are supported:
+  - 'matplotlib': figures are rendered server-side to PNG bytes. They are
+    built with matplotlib.figure.Figure rather than pyplot, so nothing is
+    kept in pyplot's global figure registry and no figure outlives a render.
+  - 'plotly': interactive plotly figures drawn client-side by the browser.
+"""
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+
+from .downsample import MAX_POINTS, downsample_series
+
+
+BACKENDS = ('matplotlib', 'plotly')
+
+# Maximum number of rendered panels kept in the cache
+MAX_CACHED_PANELS = 128
+
+_RENDER_CACHE = OrderedDict()
+_RENDER_LOCK = threading.Lock()
+# Keys being rendered right now -> event set when done
+_PENDING = {}
+
+
+def data_fingerprint(data):
+    """
+    Hash a small aggregated panel input (Series, DataFrame or array).
+
+    Parameters:
+    -----------
+    data : pd.Series, pd.DataFrame or np.ndarray
+        Panel input
+
+    Returns:
+    --------
+    str
+        Hex digest identifying the values, index and labels of `data`
+    """
+    digest = hashlib.sha1()
+    if isinstance(data, (pd.Series, pd.DataFrame)):
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+        labels = data.columns if isinstance(data, pd.DataFrame) else [data.name]
+        digest.update(repr((list(labels), data.index.names, str(data.index.dtype))).encode())
+    elif isinstance(data, tuple):
+        for part in data:
+            digest.update(data_fingerprint(part).encode())
+    else:
+        array = np.ascontiguousarray(data)
+        digest.update(array.tobytes())
+        digest.update(str(array.dtype).encode())
+    return digest.hexdigest()
+
+
+def figure_to_png(fig, dpi=100):
+    """
+    Render a matplotlib figure to PNG bytes and release it.
+
+    Parameters:
+    -----------
+    fig : matplotlib.figure.Figure
+        Figure to render
+    dpi : int
+        Output resolution
+
+    Returns:
+    --------
+    bytes
+        PNG image
+    """
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    fig.clear()
+    return buffer.getvalue()
+
+
+def render_panel(panel_id, data, draw, backend='matplotlib', **options):
+    """
+    Render a panel, reusing the cached result when its input is unchanged.
+
+    Parameters:
+    -----------
+    panel_id : str
+        Stable identifier of the panel
+    data : pd.Series, pd.DataFrame or np.ndarray
+        Small aggregated input of the panel
+    draw : callable
+        draw(data, backend, **options) returning a matplotlib Figure or a
+        plotly figure
+    backend : str
+        'matplotlib' or 'plotly'
+    **options
+        Extra drawing options passed to `draw` (part of the cache key)
+
+    Returns:
+    --------
+    bytes or plotly.graph_objects.Figure
+        PNG bytes for matplotlib, a figure object for plotly
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+    key = (panel_id, backend, data_fingerprint(data), repr(sorted(options.items())))
+    while True:
+        with _RENDER_LOCK:
+            if key in _RENDER_CACHE:
+                _RENDER_CACHE.move_to_end(key)
+                return _RENDER_CACHE[key]
+            pending = _PENDING.get(key)
+            if pending is None:
+                _PENDING[key] = threading.Event()
+                break
+        pending.wait()
+
+    try:
+        rendered = draw(data, backend, **options)
+        if isinstance(rendered, Figure):
+            rendered = figure_to_png(rendered)
+
+        with _RENDER_LOCK:
+            _RENDER_CACHE[key] = rendered
+            while len(_RENDER_CACHE) > MAX_CACHED_PANELS:
+                _RENDER_CACHE.popitem(last=False)
+    finally:
+        with _RENDER_LOCK:
+            _PENDING.pop(key).set()
+    return rendered
+
+
+def clear_render_cache():
+    """
+    Drop every cached panel rendering.
+    """
+    with _RENDER_LOCK:
+        _RENDER_CACHE.clear()
+
+
+def _new_axes(figsize):
+    """
+    Create a figure and axes outside pyplot's global figure registry.
+    """
+    fig = Figure(figsize=figsize)
+    return fig, fig.subplots()
+
+
+def draw_bar(series, backend, title, ylabel, color, xlabel=None, rotation=45, figsize=(10, 4)):
+    """
+    Draw a bar chart of a Series (index on the x axis).
+    """
+    if backend == 'plotly':
+        import plotly.express as px
+        fig = px.bar(x=series.index.astype(str), y=series.values, title=title,
+                     labels={'x': xlabel or series.index.name or '', 'y': ylabel})
+        fig.update_traces(marker_color=color)
+        return fig
+
+    fig, ax = _new_axes(figsize)
+    series.plot(kind="bar", ax=ax, color=color)
+    ax.set_title(title)
+    ax.set_ylabel(ylabel)
+    if xlabel:
+        ax.set_xlabel(xlabel)
+    ax.tick_params(axis='x', labelrotation=rotation)
+    return fig
+
+
+def draw_pie(series, backend, title, labels=None, colors=None, figsize=(6, 6)):
+    """
+    Draw a pie chart of a Series.
+    """
+    names = labels if labels is not None else [str(label) for label in series.index]
+    if backend == 'plotly':
+        import plotly.express as px
+        fig = px.pie(names=names, values=series.values, title=title,
+                     color_discrete_sequence=colors)
+        return fig
+
+    fig, ax = _new_axes(figsize)
+    series.plot(kind="pie", ax=ax, labels=names, autopct="%1.1f%%", colors=colors)
+    ax.set_ylabel("")
+    ax.set_title(title)
+    return fig
+
+
+def draw_line(series, backend, title, xlabel, ylabel, color=None, rotation=45, figsize=(10, 4)):
+    """
+    Draw a line chart with point markers of a Series.
+    """
+    x = series.index.astype(str)
+    if backend == 'plotly':
+        import plotly.express as px
+        fig = px.line(x=x, y=series.values, title=title, markers=True,
+                      labels={'x': xlabel, 'y': ylabel})
+        if color:
+            fig.update_traces(line_color=color)
+        return fig
+
+    fig, ax = _new_axes(figsize)
+    ax.plot(x, series.values, marker="o", color=color)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.tick_params(axis='x', labelrotation=rotation)
+    return fig
+
+
+def draw_heatmap(table, backend, title, cmap="YlGnBu", figsize=(10, 5)):
+    """
+    Draw a heatmap of a 2-D DataFrame.
+    """
+    if backend == 'plotly':
+        import plotly.express as px
+        return px.imshow(table, title=title, aspect="auto", color_continuous_scale=cmap)
+
+    fig, ax = _new_axes(figsize)
+    sns.heatmap(table, cmap=cmap, ax=ax)
+    ax.set_title(title)
+    return fig
+
+
+def draw_histogram(bins, backend, title, xlabel, ylabel, color, figsize=(10, 4)):
+    """
+    Draw a pre-binned histogram given as (counts, edges).
+    """
+    counts, edges = bins
+    if backend == 'plotly':
+        import plotly.graph_objects as go
+        fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts,
+                               width=np.diff(edges), marker_color=color))
+        fig.update_layout(title=title, xaxis_title=xlabel, yaxis_title=ylabel, bargap=0)
+        return fig
+
+    fig, ax = _new_axes(figsize)
+    ax.stairs(counts, edges, fill=True, color=color, edgecolor="black")
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    return fig
+
+
+def draw_growth(values, backend, title, value_label, growth_label, value_color, growth_color,
+                kind="bar", rotation=0, figsize=(8, 4), max_points=MAX_POINTS):
+    """
+    Draw values (bars or a line) with their percentage growth on a second axis.
+
+    Lines over a DatetimeIndex are drawn on a time axis, downsampled to
+    `max_points` after the growth is computed; bars use the index as labels.
+    """
+    growth = values.pct_change() * 100
+    if kind == "line" and isinstance(values.index, pd.DatetimeIndex):
+        values = downsample_series(values, max_points)
+        growth = downsample_series(growth, max_points)
+        x, growth_x = values.index, growth.index
+    else:
+        x = growth_x = values.index.astype(str)
+    if backend == 'plotly':
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+        fig = make_subplots(specs=[[{"secondary_y": True}]])
+        trace = go.Bar if kind == "bar" else go.Scatter
+        fig.add_trace(trace(x=x, y=values.values, name=value_label, marker_color=value_color),
+                      secondary_y=False)
+        fig.add_trace(go.Scatter(x=growth_x, y=growth.values, name=growth_label,
+                                 line_color=growth_color), secondary_y=True)
+        fig.update_layout(title=title)
+        fig.update_yaxes(title_text=value_label, secondary_y=False)
+        fig.update_yaxes(title_text=growth_label, secondary_y=True)
+        return fig
+
+    fig, ax = _new_axes(figsize)
+    if kind == "bar":
+        ax.bar(x, values.values, color=value_color, alpha=0.7, label=value_label)
+    else:
+        ax.plot(x, values.values, color=value_color, label=value_label)
+    ax.set_ylabel(value_label)
+    ax.set_title(title)
+    ax.legend(loc="upper left")
+    ax.tick_params(axis='x', labelrotation=rotation)
+    ax_growth = ax.twinx()
+    ax_growth.plot(growth_x, growth.values, color=growth_color, marker="o" if kind == "bar" else None,
+                   alpha=1.0 if kind == "bar" else 0.5, label=growth_label)
+    ax_growth.set_ylabel(growth_label)
+    ax_growth.legend(loc="upper right")
+    return fig
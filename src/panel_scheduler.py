@@ -0,0 +1,129 @@
+"""
+Panel Scheduler Utilities
+
+Functions to compute independent dashboard panels concurrently and to warm
+the result cache in the background.
+
+Panels run in a thread pool shared by every session of the process: the
+heavy work is pandas/numpy (which releases the GIL) or DuckDB, and threads
+share the in-process result cache and the memory-mapped dataset, which a
+process pool would have to copy. Results are yielded as each panel
+completes, so the caller can place it on the page right away; Streamlit
+calls stay on the caller's thread.
+
+The warm-up thread computes the panels of the default filter state once at
+startup and again whenever the source dataset changes (e.g. after ingest),
+so the first visitor after either finds them cached.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .data_loader import _file_signature
+from .instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+
+# Threads computing panels, shared by every session of the process
+PANEL_WORKERS = min(8, os.cpu_count() or 1)
+
+# Seconds between checks of a warmed source for a new version
+WARM_UP_POLL_SECONDS = float(os.environ.get('WARM_UP_POLL_SECONDS', 30))
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=PANEL_WORKERS, thread_name_prefix='panel')
+# Source path -> warm-up thread
+_WARMERS = {}
+_WARMERS_LOCK = threading.Lock()
+
+
+def _run_panel(panel_id, compute, rows_in):
+    """
+    Compute one panel as a 'panel:<id>' stage.
+    """
+    with stage(f"panel:{panel_id}", rows_in=rows_in):
+        return compute()
+
+
+def run_panels(tasks, rows_in=None):
+    """
+    Compute panels concurrently, yielding each result as it completes.
+
+    Parameters:
+    -----------
+    tasks : dict
+        Panel id -> compute() callable; the callables must not call
+        Streamlit and must not depend on each other's results
+    rows_in : int, optional
+        Input rows recorded with every panel stage
+
+    Yields:
+    -------
+    tuple
+        (panel_id, result) in completion order; an exception raised by a
+        panel is raised here when that panel completes
+    """
+    futures = {_EXECUTOR.submit(_run_panel, panel_id, compute, rows_in): panel_id
+               for panel_id, compute in tasks.items()}
+    try:
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # A rerun abandoning the page should not keep computing its panels
+        for future in futures:
+            future.cancel()
+
+
+def _warm_loop(source, build_tasks, poll_seconds):
+    """
+    Compute the warm-up panels whenever the source has a new version.
+    """
+    warmed = None
+    while True:
+        try:
+            signature = _file_signature(source)
+            if signature != warmed:
+                tasks = build_tasks()
+                with stage("warm_up", rows_in=len(tasks)):
+                    for _ in run_panels(tasks):
+                        pass
+                warmed = signature
+                logger.info(f"✓ Warmed {len(tasks)} panel results for {source}")
+        except Exception as e:
+            # Retried on the next poll
+            logger.error(f"✗ Cache warm-up failed: {e}")
+        time.sleep(poll_seconds)
+
+
+def start_warm_up(source, build_tasks, poll_seconds=WARM_UP_POLL_SECONDS):
+    """
+    Start warming the result cache for a source in a background thread.
+
+    Only one warm-up thread runs per source; later calls are no-ops.
+
+    Parameters:
+    -----------
+    source : str
+        Processed CSV or partitioned dataset directory
+    build_tasks : callable
+        build_tasks() returning the panel id -> compute() dict to warm,
+        rebuilt for every new version of the source
+    poll_seconds : float
+        Seconds between checks of the source for a new version
+
+    Returns:
+    --------
+    bool
+        True when a new warm-up thread was started
+    """
+    with _WARMERS_LOCK:
+        if source in _WARMERS and _WARMERS[source].is_alive():
+            return False
+        thread = threading.Thread(target=_warm_loop, args=(source, build_tasks, poll_seconds),
+                                  name=f"warm-up:{source}", daemon=True)
+        _WARMERS[source] = thread
+        thread.start()
+        return True
@@ -0,0 +1,318 @@
+"""
+Query Backend Utilities
+
+Run the dashboard's aggregate queries on interchangeable backends:
+  - 'pandas': groupbys over the in-memory processed dataset, as the
+    dashboard has always done.
+  - 'duckdb': the same queries as SQL run by the embedded DuckDB engine,
+    multi-threaded and directly over the Parquet files on disk, so the
+    dataset does not have to fit in memory. DuckDB is an optional
+    dependency, imported only when this backend is used.
+
+Both backends return the same canonical result for a query: a DataFrame
+sorted by its key column(s), with plain (non-categorical) key values.
+Values are equal up to floating-point summation order.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .data_loader import (
+    _columnar_path,
+    _encode_signature,
+    _file_signature,
+    _read_parquet_signature,
+    convert_to_columnar,
+    get_processed_data_path,
+    load_processed_data,
+    return_flags,
+)
+from .date_features import calendar_features
+from .filter_index import load_filter_index, select_rows
+
+
+BACKENDS = ('pandas', 'duckdb')
+
+QUERIES = (
+    'revenue_by_month',
+    'revenue_by_product',
+    'revenue_by_country',
+    'revenue_by_customer',
+    'revenue_by_hour',
+    'aov_by_month',
+    'return_rate',
+    'order_sizes',
+)
+
+# Bins of the order size histogram
+ORDER_SIZE_BINS = 30
+
+
+def _revenue_by(df, keys):
+    return df.groupby(keys, observed=True)['TotalPrice'].sum().rename('Revenue').reset_index()
+
+
+def _pandas_month(df):
+    months = calendar_features(df['InvoiceDate'], ['YearMonth'])['YearMonth']
+    return months.rename('YearMonth')
+
+
+def _pandas_aov_by_month(df):
+    grouped = df.groupby(_pandas_month(df), observed=True)
+    result = pd.DataFrame({
+        'Revenue': grouped['TotalPrice'].sum(),
+        'Orders': grouped['Invoice'].nunique(),
+    })
+    result['AOV'] = result['Revenue'] / result['Orders']
+    return result.reset_index()
+
+
+def _pandas_return_rate(df):
+    is_return = pd.Series(return_flags(df), index=df.index)
+    rate = is_return.groupby(df['Description'], observed=True).mean()
+    return rate.rename('ReturnRate').reset_index()
+
+
+def _pandas_order_sizes(df):
+    return df.groupby('Invoice', observed=True)['Quantity'].sum().reset_index()
+
+
+# pandas implementation of every query: line-item frame -> result
+_PANDAS_QUERIES = {
+    'revenue_by_month': lambda df: _revenue_by(df, _pandas_month(df)),
+    'revenue_by_product': lambda df: _revenue_by(df, df['Description']),
+    'revenue_by_country': lambda df: _revenue_by(df, df['Country']),
+    'revenue_by_customer': lambda df: _revenue_by(df, df['Customer ID']),
+    'revenue_by_hour': lambda df: _revenue_by(df, df['InvoiceDate'].dt.hour.rename('Hour')),
+    'aov_by_month': _pandas_aov_by_month,
+    'return_rate': _pandas_return_rate,
+    'order_sizes': _pandas_order_sizes,
+}
+
+# DuckDB implementation of every query over the `items` view; {where} is filled in
+_DUCKDB_QUERIES = {
+    'revenue_by_month': """
+        SELECT strftime(InvoiceDate, '%Y-%m') AS YearMonth, sum(TotalPrice) AS Revenue
+        FROM items {where} GROUP BY 1""",
+    'revenue_by_product': """
+        SELECT Description, sum(TotalPrice) AS Revenue
+        FROM items {where} AND Description IS NOT NULL GROUP BY 1""",
+    'revenue_by_country': """
+        SELECT Country, sum(TotalPrice) AS Revenue
+        FROM items {where} AND Country IS NOT NULL GROUP BY 1""",
+    'revenue_by_customer': """
+        SELECT "Customer ID", sum(TotalPrice) AS Revenue
+        FROM items {where} AND "Customer ID" IS NOT NULL GROUP BY 1""",
+    'revenue_by_hour': """
+        SELECT hour(InvoiceDate) AS Hour, sum(TotalPrice) AS Revenue
+        FROM items {where} GROUP BY 1""",
+    'aov_by_month': """
+        SELECT strftime(InvoiceDate, '%Y-%m') AS YearMonth, sum(TotalPrice) AS Revenue,
+               count(DISTINCT Invoice) AS Orders, sum(TotalPrice) / count(DISTINCT Invoice) AS AOV
+        FROM items {where} GROUP BY 1""",
+    'return_rate': """
+        SELECT Description, avg(CASE WHEN starts_with(CAST(Invoice AS VARCHAR), 'C')
+                                     THEN 1.0 ELSE 0.0 END) AS ReturnRate
+        FROM items {where} AND Description IS NOT NULL GROUP BY 1""",
+    'order_sizes': """
+        SELECT Invoice, sum(Quantity) AS Quantity
+        FROM items {where} AND Invoice IS NOT NULL GROUP BY 1""",
+}
+
+# Result column dtypes shared by both backends
+_RESULT_DTYPES = {
+    'YearMonth': str,
+    'Description': str,
+    'Country': str,
+    'Invoice': str,
+    'Customer ID': 'float64',
+    'Hour': 'int64',
+    'Revenue': 'float64',
+    'Orders': 'int64',
+    'AOV': 'float64',
+    'ReturnRate': 'float64',
+    'Quantity': 'int64',
+}
+
+
+def _canonical(result):
+    """
+    Cast a query result to the shared dtypes and sort it by its key column.
+    """
+    result = result.astype({col: _RESULT_DTYPES[col] for col in result.columns})
+    return result.sort_values(result.columns[0], kind='mergesort').reset_index(drop=True)
+
+
+def _run_pandas(query, source, frame, start, end, countries, products):
+    """
+    Run a query with pandas over `frame` or the filtered processed dataset.
+    """
+    if frame is None:
+        index = load_filter_index(source)
+        rows = select_rows(index, {'Country': countries, 'Description': products}, start, end)
+        frame = load_processed_data(source).take(rows)
+    return _PANDAS_QUERIES[query](frame)
+
+
+def _parquet_source(connection, source):
+    """
+    Register the dataset's Parquet files as the `items` view of a DuckDB connection.
+
+    The path is passed to DuckDB as an argument rather than spliced into
+    the SQL, so quotes or other special characters in it are harmless.
+    Returns whether the dataset is partitioned by year/month.
+    """
+    if os.path.isdir(source):
+        pattern = os.path.join(source, '**', '*.parquet')
+        connection.read_parquet(pattern, hive_partitioning=True).create_view('items')
+        return True
+
+    columnar_path = _columnar_path(source)
+    if _read_parquet_signature(columnar_path) != _encode_signature(_file_signature(source)):
+        convert_to_columnar(source, columnar_path)
+    connection.read_parquet(columnar_path).create_view('items')
+    return False
+
+
+def _duckdb_where(start, end, countries, products, partitioned):
+    """
+    Build the WHERE clause and parameters for the dashboard filters.
+    """
+    clauses, params = ['TRUE'], []
+    if start is not None:
+        start = pd.Timestamp(start).normalize()
+        clauses.append("InvoiceDate >= ?")
+        params.append(start.to_pydatetime())
+        if partitioned:
+            # Lets DuckDB skip whole year/month partitions
+            clauses.append("year * 12 + month >= ?")
+            params.append(start.year * 12 + start.month)
+    if end is not None:
+        end = pd.Timestamp(end).normalize()
+        clauses.append("InvoiceDate < ?")
+        params.append((end + pd.Timedelta(days=1)).to_pydatetime())
+        if partitioned:
+            clauses.append("year * 12 + month <= ?")
+            params.append(end.year * 12 + end.month)
+    if countries:
+        clauses.append("Country IN (SELECT UNNEST(?))")
+        params.append([str(country) for country in countries])
+    if products:
+        clauses.append("Description IN (SELECT UNNEST(?))")
+        params.append([str(product) for product in products])
+    return "WHERE " + " AND ".join(clauses), params
+
+
+def _run_duckdb(query, source, start, end, countries, products, threads):
+    """
+    Run a query with DuckDB over the dataset's Parquet files.
+    """
+    import duckdb
+
+    connection = duckdb.connect()
+    try:
+        if threads:
+            connection.execute(f"SET threads TO {int(threads)}")
+        partitioned = _parquet_source(connection, source)
+        where, params = _duckdb_where(start, end, countries, products, partitioned)
+        sql = _DUCKDB_QUERIES[query].format(where=where)
+        return connection.execute(sql, params).df()
+    finally:
+        connection.close()
+
+
+def run_query(query, source=None, backend='pandas', start=None, end=None, countries=None,
+              products=None, frame=None, threads=None):
+    """
+    Run a dashboard aggregate query on the chosen backend.
+
+    Parameters:
+    -----------
+    query : str
+        One of QUERIES
+    source : str, optional
+        Processed CSV or partitioned dataset directory
+        (default: data/processed/ecommerce_cleaned.csv)
+    backend : str
+        'pandas' or 'duckdb'
+    start, end : date-like, optional
+        Inclusive date bounds; `end` covers the whole day
+    countries, products : list, optional
+        Countries / product descriptions to keep
+    frame : pd.DataFrame, optional
+        pandas backend only: an already filtered frame to query instead
+        of the source (the filters are then not applied again)
+    threads : int, optional
+        duckdb backend only: number of threads (default: all cores)
+
+    Returns:
+    --------
+    pd.DataFrame
+        Result sorted by its key column. For 'order_sizes' this is the
+        total quantity per invoice; see order_size_histogram.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if query not in QUERIES:
+        raise ValueError(f"Unknown query '{query}', expected one of {QUERIES}")
+    if source is None:
+        source = get_processed_data_path("ecommerce_cleaned.csv")
+    source = os.path.abspath(source)
+
+    if backend == 'pandas':
+        result = _run_pandas(query, source, frame, start, end, countries, products)
+    else:
+        result = _run_duckdb(query, source, start, end, countries, products, threads)
+    return _canonical(result)
+
+
+def order_size_histogram(order_sizes, bins=ORDER_SIZE_BINS):
+    """
+    Histogram of the per-invoice quantities returned by the 'order_sizes' query.
+
+    Parameters:
+    -----------
+    order_sizes : pd.DataFrame
+        Result of run_query('order_sizes', ...)
+    bins : int
+        Number of equal-width bins
+
+    Returns:
+    --------
+    tuple of np.ndarray
+        (counts, edges) as returned by np.histogram
+    """
+    return np.histogram(order_sizes['Quantity'].to_numpy(), bins=bins)
+
+
+def compare_backends(source=None, queries=None, **filters):
+    """
+    Run queries on every backend and check that the results agree.
+
+    Parameters:
+    -----------
+    source : str, optional
+        Processed CSV or partitioned dataset directory
+    queries : list, optional
+        Queries to compare (default: all QUERIES)
+    **filters
+        start, end, countries and products filters
+
+    Returns:
+    --------
+    dict
+        Query name -> None when the results agree, else the mismatch message
+    """
+    mismatches = {}
+    for query in queries or QUERIES:
+        expected = run_query(query, source, 'pandas', **filters)
+        mismatches[query] = None
+        for backend in BACKENDS[1:]:
+            try:
+                pd.testing.assert_frame_equal(run_query(query, source, backend, **filters),
+                                              expected, check_exact=False, rtol=1e-9)
+            except AssertionError as e:
+                mismatches[query] = f"{backend}: {e}"
+    return mismatches
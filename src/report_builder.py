@@ -0,0 +1,276 @@
+"""
+Report Builder
+
+Render a declarative list of src.visualizations chart specs to files in
+parallel worker processes on the Agg backend.
+
+Each chart's input is first reduced in the parent process to the small
+aggregate its plot function actually draws. Only that aggregate is sent to
+a worker, and a chart is skipped when the hash of its aggregate, options,
+DPI and format matches the previous build. Usage from the project root:
+
+    python -m src.report_builder --format webp --dpi 150 --country France
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .binning import bin_2d, grid_frame
+from .data_loader import load_processed_data
+from .date_features import add_date_features
+from .downsample import MAX_POINTS, aggregate_series, choose_grain
+
+logger = logging.getLogger(__name__)
+
+
+FORMATS = ('png', 'svg', 'webp')
+MANIFEST_FILENAME = ".report_manifest.json"
+
+# The charts the notebook exports to reports/visualizations
+DEFAULT_REPORT_SPECS = [
+    {
+        'name': 'top_10_products_by_revenue',
+        'plot': 'plot_top_products',
+        'kwargs': {'product_column': 'Description', 'value_column': 'TotalPrice', 'top_n': 10,
+                   'title': 'Top 10 Products by Revenue'},
+    },
+    {
+        'name': 'monthly_sales_trends',
+        'plot': 'plot_monthly_trends',
+        'kwargs': {'date_column': 'InvoiceDate', 'value_column': 'TotalPrice',
+                   'title': 'Monthly Sales Trends'},
+    },
+    {
+        'name': 'sales_heatmap',
+        'plot': 'plot_heatmap',
+        'kwargs': {'pivot_columns': ['Month', 'DayOfWeek'], 'value_column': 'TotalPrice',
+                   'title': 'Sales Heatmap: Month vs. Day of Week'},
+    },
+    {
+        'name': 'revenue_distribution_by_product',
+        'plot': 'plot_category_distribution',
+        'kwargs': {'category_column': 'Description', 'value_column': 'TotalPrice',
+                   'title': 'Revenue Distribution by Product Description'},
+        'query': 'TotalPrice > 0',
+    },
+]
+
+
+def _aggregate_top_products(df, product_column, value_column, top_n=10, **_):
+    """Input of plot_top_products: the top_n product totals."""
+    totals = df.groupby(product_column, observed=True)[value_column].sum().nlargest(top_n)
+    return totals.reset_index()
+
+
+def _aggregate_category_distribution(df, category_column, value_column, **_):
+    """Input of plot_category_distribution: totals per category."""
+    return df.groupby(category_column, observed=True)[value_column].sum().reset_index()
+
+
+def _aggregate_monthly_trends(df, date_column, value_column, **_):
+    """Input of plot_monthly_trends: daily totals, which regroup to the same months."""
+    days = pd.to_datetime(df[date_column]).dt.normalize()
+    return df.groupby(days)[value_column].sum().rename_axis(date_column).reset_index()
+
+
+def _aggregate_heatmap(df, pivot_columns, value_column, **_):
+    """Input of plot_heatmap: totals per (row, column) cell, binned without grouping strings."""
+    table = grid_frame(bin_2d(df, pivot_columns[0], pivot_columns[1], value_column))
+    return table.stack().rename(value_column).reset_index()
+
+
+def _sales_over_time_grain(df, date_column, grain='auto', max_points=MAX_POINTS, **_):
+    """Grain plot_sales_over_time aggregates to (None: rows drawn as they are) and the dates."""
+    dates = df[date_column]
+    if isinstance(dates.dtype, pd.PeriodDtype):
+        dates = dates.dt.to_timestamp()
+    if grain is None or not pd.api.types.is_datetime64_any_dtype(dates):
+        return None, dates
+    if grain == 'auto':
+        grain = choose_grain(dates.min(), dates.max(), max_points)
+    return grain, dates
+
+
+def _aggregate_sales_over_time(df, date_column, value_column, how='sum', **kwargs):
+    """Input of plot_sales_over_time: one value per period of the grain it draws."""
+    grain, dates = _sales_over_time_grain(df, date_column, **kwargs)
+    if grain is None:
+        return df[[date_column, value_column]]
+    series = aggregate_series(dates, df[value_column], grain, how)
+    return series.rename(value_column).rename_axis(date_column).reset_index()
+
+
+def _render_sales_over_time(df, date_column, **kwargs):
+    """Options drawing the per-period aggregate as the rows would have been drawn."""
+    grain, _ = _sales_over_time_grain(df, date_column, **kwargs)
+    # One value per period, so 'first' keeps each as it is
+    return {} if grain is None else {'grain': grain, 'how': 'first'}
+
+
+# How each plot function's input is reduced before it is hashed and rendered
+_AGGREGATORS = {
+    'plot_top_products': _aggregate_top_products,
+    'plot_category_distribution': _aggregate_category_distribution,
+    'plot_monthly_trends': _aggregate_monthly_trends,
+    'plot_heatmap': _aggregate_heatmap,
+    'plot_sales_over_time': _aggregate_sales_over_time,
+}
+
+# Plot options overridden when rendering an aggregate, computed from the unreduced input
+_RENDER_OPTIONS = {
+    'plot_sales_over_time': _render_sales_over_time,
+}
+
+
+def _spec_hash(aggregate, spec, dpi, fmt):
+    """
+    Hash everything that determines a chart file's contents.
+    """
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(aggregate, index=False).to_numpy().tobytes())
+    digest.update(json.dumps([list(aggregate.columns), spec['plot'], spec.get('kwargs', {}),
+                              dpi, fmt], sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _init_worker():
+    """
+    Switch worker processes to the non-interactive Agg backend.
+    """
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+
+def _render_chart(task):
+    """
+    Render one chart to a file; runs inside a worker process.
+    """
+    import matplotlib.pyplot as plt
+    from . import visualizations
+
+    plot_name, aggregate, kwargs, output_dir, filename, dpi = task
+    plot = getattr(visualizations, plot_name)
+    fig, _ = plot(aggregate, **kwargs)
+    visualizations.save_figure(fig, filename, directory=output_dir, dpi=dpi)
+    plt.close(fig)
+    return filename
+
+
+def build_report(df, specs=None, output_dir='reports/visualizations', dpi=300, fmt='png',
+                 max_workers=None, force=False):
+    """
+    Render chart specs to files, skipping charts whose input is unchanged.
+
+    A spec is a dict with:
+      - name: output file name without extension
+      - plot: name of a src.visualizations plot function
+      - kwargs: keyword arguments for the plot function
+      - query (optional): DataFrame.query expression applied first
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Processed sales data
+    specs : list of dict, optional
+        Chart specs (default DEFAULT_REPORT_SPECS)
+    output_dir : str
+        Directory the charts are written to
+    dpi : int
+        Resolution for raster formats
+    fmt : str
+        Output format: 'png', 'svg' or 'webp'
+    max_workers : int, optional
+        Number of worker processes (default: number of CPUs)
+    force : bool
+        Re-render every chart even when its input is unchanged
+
+    Returns:
+    --------
+    list
+        File names that were rendered
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+    if specs is None:
+        specs = DEFAULT_REPORT_SPECS
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    tasks, hashes = [], {}
+    for spec in specs:
+        kwargs = spec.get('kwargs', {})
+        data = df.query(spec['query']) if spec.get('query') else df
+        aggregate = _AGGREGATORS[spec['plot']](data, **kwargs)
+        # Plain labels, so the plot functions never see unobserved categories
+        for col in aggregate.columns:
+            if isinstance(aggregate[col].dtype, pd.CategoricalDtype):
+                aggregate[col] = aggregate[col].astype(aggregate[col].cat.categories.dtype)
+
+        filename = f"{spec['name']}.{fmt}"
+        spec_hash = _spec_hash(aggregate, spec, dpi, fmt)
+        hashes[filename] = spec_hash
+        up_to_date = (manifest.get(filename) == spec_hash
+                      and os.path.exists(os.path.join(output_dir, filename)))
+        if up_to_date and not force:
+            logger.info(f"  {filename}: unchanged, skipped")
+            continue
+        render_options = _RENDER_OPTIONS.get(spec['plot'])
+        if render_options is not None:
+            kwargs = {**kwargs, **render_options(data, **kwargs)}
+        tasks.append((spec['plot'], aggregate, kwargs, output_dir, filename, dpi))
+
+    rendered = []
+    if tasks:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+            rendered = list(executor.map(_render_chart, tasks))
+
+    manifest.update(hashes)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    logger.info(f"✓ Rendered {len(rendered)} chart(s), "
+                f"skipped {len(specs) - len(rendered)} unchanged")
+    return rendered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the report charts.")
+    parser.add_argument('--data', default=None, help="Processed CSV or partitioned dataset")
+    parser.add_argument('--specs', default=None, help="JSON file with a list of chart specs")
+    parser.add_argument('--output-dir', default='reports/visualizations')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--format', dest='fmt', choices=FORMATS, default='png')
+    parser.add_argument('--country', action='append', help="Limit to a country (repeatable)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true')
+    args = parser.parse_args()
+
+    specs = None
+    if args.specs:
+        with open(args.specs) as f:
+            specs = json.load(f)
+
+    df = load_processed_data(args.data)
+    if args.country:
+        df = df[df['Country'].isin(args.country)]
+    if 'DayOfWeek' not in df.columns:
+        df = add_date_features(df, 'InvoiceDate', ['Month', 'DayOfWeek'])
+
+    build_report(df, specs, output_dir=args.output_dir, dpi=args.dpi, fmt=args.fmt,
+                 max_workers=args.workers, force=args.force)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    main()
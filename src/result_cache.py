@@ -0,0 +1,267 @@
+"""
+Result Cache Utilities
+
+Cache dashboard panel results keyed by a canonical hash of the dataset
+version, the filter state (date range, product set, country set) and the
+panel id, so repeated filter combinations are served without recomputing.
+
+The cache has two tiers:
+  - a bounded in-memory LRU shared by every session of the process
+  - an optional on-disk tier (set_cache_dir or the RESULT_CACHE_DIR
+    environment variable) shared by all processes and kept across restarts
+
+Concurrent requests for a result that is being computed wait for it
+instead of computing it again. Entries are tied to the version (mtime and
+size) of their source dataset.
+When a source changes, its entries of older versions are dropped from
+both tiers on the next lookup.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from .data_loader import _encode_signature, _file_signature
+
+
+# Maximum number of results kept in memory
+MAX_CACHED_RESULTS = 256
+
+_RESULT_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+# Latest version seen per source path
+_SOURCE_VERSIONS = {}
+# Keys being computed right now -> event set when done, so concurrent
+# requests for the same result wait instead of computing it again
+_PENDING = {}
+_STATS = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+_cache_dir = os.environ.get('RESULT_CACHE_DIR')
+
+
+def set_cache_dir(path):
+    """
+    Keep results in an on-disk tier below this directory as well.
+
+    Parameters:
+    -----------
+    path : str or None
+        Cache directory, or None to use the in-memory tier only
+    """
+    global _cache_dir
+    _cache_dir = path
+
+
+def _canonical(value):
+    """
+    JSON-serializable canonical form of a filter or option value.
+
+    Lists and sets are treated as sets (sorted), dates as ISO strings.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple, set, frozenset, pd.Index)):
+        return sorted((_canonical(item) for item in value), key=repr)
+    if hasattr(value, 'isoformat'):
+        return pd.Timestamp(value).isoformat()
+    return repr(value)
+
+
+def result_key(panel_id, source, version, start=None, end=None, products=None,
+               countries=None, **options):
+    """
+    Canonical hash of a panel request.
+
+    Parameters:
+    -----------
+    panel_id : str
+        Stable identifier of the panel
+    source : str
+        Source dataset path
+    version : str
+        Source dataset version
+    start, end : date-like, optional
+        Date bounds
+    products, countries : list, optional
+        Selected products / countries; order does not matter
+    **options
+        Any other settings the result depends on (e.g. the query engine)
+
+    Returns:
+    --------
+    str
+        Hex digest
+    """
+    state = {
+        'panel': panel_id,
+        'source': os.path.abspath(source),
+        'version': version,
+        'start': _canonical(start),
+        'end': _canonical(end),
+        'products': _canonical(products or []),
+        'countries': _canonical(countries or []),
+        'options': {name: _canonical(value) for name, value in options.items()},
+    }
+    return hashlib.sha1(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+
+def _source_dir(source):
+    """
+    On-disk directory holding the cached results of one source dataset.
+    """
+    name = hashlib.sha1(os.path.abspath(source).encode()).hexdigest()[:16]
+    return os.path.join(_cache_dir, name)
+
+
+def _invalidate(source, version):
+    """
+    Drop cached results of older versions of a source from both tiers.
+    """
+    source = os.path.abspath(source)
+    with _CACHE_LOCK:
+        if _SOURCE_VERSIONS.get(source) == version:
+            return
+        stale = [key for key, (entry_source, entry_version, _) in _RESULT_CACHE.items()
+                 if entry_source == source and entry_version != version]
+        for key in stale:
+            del _RESULT_CACHE[key]
+        _STATS['invalidations'] += len(stale)
+        _SOURCE_VERSIONS[source] = version
+
+    if _cache_dir and os.path.isdir(_source_dir(source)):
+        for name in os.listdir(_source_dir(source)):
+            if name != version:
+                shutil.rmtree(os.path.join(_source_dir(source), name), ignore_errors=True)
+
+
+def _read_disk(source, version, key):
+    """
+    Load a result from the disk tier, or return None when absent.
+    """
+    if not _cache_dir:
+        return None
+    path = os.path.join(_source_dir(source), version, key + ".pkl")
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def _write_disk(source, version, key, value):
+    """
+    Atomically store a result in the disk tier.
+    """
+    if not _cache_dir:
+        return
+    version_dir = os.path.join(_source_dir(source), version)
+    os.makedirs(version_dir, exist_ok=True)
+    path = os.path.join(version_dir, key + ".pkl")
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _remember(key, source, version, value):
+    """
+    Add a result to the in-memory LRU, evicting the least recently used.
+    """
+    with _CACHE_LOCK:
+        _RESULT_CACHE[key] = (os.path.abspath(source), version, value)
+        _RESULT_CACHE.move_to_end(key)
+        while len(_RESULT_CACHE) > MAX_CACHED_RESULTS:
+            _RESULT_CACHE.popitem(last=False)
+            _STATS['evictions'] += 1
+
+
+def cached_result(panel_id, source, compute, start=None, end=None, products=None,
+                  countries=None, **options):
+    """
+    Return a panel result from the cache, computing and storing it on a miss.
+
+    Parameters:
+    -----------
+    panel_id : str
+        Stable identifier of the panel
+    source : str
+        Processed CSV or partitioned dataset directory the result is
+        computed from; its version is part of the key
+    compute : callable
+        compute() returning the result (anything picklable)
+    start, end : date-like, optional
+        Date bounds of the filter state
+    products, countries : list, optional
+        Selected products / countries of the filter state
+    **options
+        Any other settings the result depends on
+
+    Returns:
+    --------
+    object
+        The cached or freshly computed result; treat it as read-only, it
+        is shared with other sessions
+    """
+    version = _encode_signature(_file_signature(source)).decode().replace(':', '-')
+    _invalidate(source, version)
+    key = result_key(panel_id, source, version, start, end, products, countries, **options)
+
+    while True:
+        with _CACHE_LOCK:
+            entry = _RESULT_CACHE.get(key)
+            if entry is not None:
+                _RESULT_CACHE.move_to_end(key)
+                _STATS['hits'] += 1
+                return entry[2]
+            pending = _PENDING.get(key)
+            if pending is None:
+                _PENDING[key] = threading.Event()
+                break
+        # Another thread is computing this result; look again once it is done
+        pending.wait()
+
+    try:
+        value = _read_disk(source, version, key)
+        if value is not None:
+            with _CACHE_LOCK:
+                _STATS['disk_hits'] += 1
+        else:
+            value = compute()
+            with _CACHE_LOCK:
+                _STATS['misses'] += 1
+            _write_disk(source, version, key, value)
+        _remember(key, source, version, value)
+    finally:
+        with _CACHE_LOCK:
+            _PENDING.pop(key).set()
+    return value
+
+
+def cache_stats():
+    """
+    Return the cache counters.
+
+    Returns:
+    --------
+    dict
+        hits (memory), disk_hits, misses, evictions, invalidations and the
+        current number of in-memory entries
+    """
+    with _CACHE_LOCK:
+        return {**_STATS, 'entries': len(_RESULT_CACHE)}
+
+
+def clear_result_cache(disk=False):
+    """
+    Drop every in-memory result, and the disk tier too when `disk` is True.
+    """
+    with _CACHE_LOCK:
+        _RESULT_CACHE.clear()
+        _SOURCE_VERSIONS.clear()
+    if disk and _cache_dir and os.path.isdir(_cache_dir):
+        shutil.rmtree(_cache_dir, ignore_errors=True)
@@ -0,0 +1,308 @@
+"""
+Returns Utilities
+
+Functions to match cancellation lines to the sales they reverse and to
+summarise net revenue and return rates per product, customer or period.
+
+A cancellation ("C" invoice) is matched to the latest sale of the same
+customer and stock code made at or before it, first requiring the same
+quantity and then accepting any quantity. Matching is a sorted as-of join
+(pd.merge_asof) of the cancellations against the sales, so its cost grows
+with n log n instead of with the number of sale pairs per (customer, item)
+that a self-join would produce. Sales are not consumed by a match: two
+cancellations of the same item may point at the same sale.
+
+The index is built once per dataset version, at ingest or on first use,
+and persisted next to the processed dataset with its source signature,
+like the daily cube.
+"""
+
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from .data_loader import (
+    _encode_signature,
+    _file_signature,
+    _read_parquet_signature,
+    _write_parquet_with_signature,
+    get_processed_data_path,
+    load_processed_data,
+    return_flags,
+)
+from .metrics import period_start
+
+logger = logging.getLogger(__name__)
+
+
+# How a cancellation was matched: same quantity, same item only, or not at all
+MATCH_TYPES = ['quantity', 'item', 'unmatched']
+
+# Columns of the line-item frame copied into the index for every cancellation
+INDEX_COLUMNS = ['Invoice', 'InvoiceDate', 'Customer ID', 'StockCode', 'Description',
+                 'Country', 'Quantity', 'TotalPrice']
+
+
+def _codes(values):
+    """
+    Integer code per value (categorical codes or factorized), -1 for missing values.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.int64)
+    return pd.factorize(values)[0].astype(np.int64)
+
+
+def _asof_match(returns, sales, by, tolerance):
+    """
+    Position of the latest sale at or before each return with equal `by` keys, -1 if none.
+    """
+    candidates = sales[['Date', 'Line'] + by].rename(columns={'Line': 'SaleLine'})
+    matched = pd.merge_asof(
+        returns[['Date'] + by], candidates, on='Date', by=by,
+        direction='backward', allow_exact_matches=True, tolerance=tolerance,
+    )
+    return matched['SaleLine'].fillna(-1).to_numpy(dtype=np.int64)
+
+
+def build_returns_index(df, max_days=None):
+    """
+    Match every cancellation line to the sale it most likely reverses.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Processed line items (Invoice, InvoiceDate, Customer ID, StockCode,
+        Description, Country, Quantity, TotalPrice; IsReturn when present)
+    max_days : float, optional
+        Only match sales at most this many days before the cancellation
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per cancellation line in dataset order: its Line position in
+        `df`, INDEX_COLUMNS, the OriginalLine (-1 when unmatched),
+        OriginalInvoice, OriginalDate and OriginalQuantity of the matched
+        sale, DaysToReturn and MatchType (one of MATCH_TYPES)
+    """
+    is_return = return_flags(df)
+    dates = df['InvoiceDate'].to_numpy(dtype='datetime64[ns]')
+    quantity = df['Quantity'].to_numpy(dtype=np.float64, na_value=np.nan)
+    customers = _codes(df['Customer ID'])
+    items = _codes(df['StockCode'])
+
+    # Customer and item combined into one key; both codes are below len(df)
+    pair = customers * (int(items.max(initial=0)) + 1) + items
+    matchable = (customers >= 0) & (items >= 0) & ~np.isnat(dates) & ~np.isnan(quantity)
+
+    def side(lines):
+        # merge_asof needs both sides sorted by the 'on' key
+        lines = lines[np.argsort(dates[lines], kind='stable')]
+        return pd.DataFrame({
+            'Date': dates[lines],
+            'Pair': pair[lines],
+            'Units': np.abs(quantity[lines]).astype(np.int64),
+            'Line': lines,
+        })
+
+    sale_lines = np.flatnonzero(~is_return & (quantity > 0) & matchable)
+    return_lines = np.flatnonzero(is_return & matchable)
+    # Only sales of a (customer, item) that was ever cancelled can match; dropping
+    # the rest first keeps the join proportional to the returns
+    sale_lines = sale_lines[pd.Index(pair[sale_lines]).isin(pair[return_lines])]
+    sales, returns = side(sale_lines), side(return_lines)
+    tolerance = pd.Timedelta(days=max_days) if max_days is not None else None
+
+    original = _asof_match(returns, sales, ['Pair', 'Units'], tolerance)
+    match_type = np.where(original >= 0, 0, 2)
+    unmatched = np.flatnonzero(original < 0)
+    if len(unmatched):
+        # Partial cancellations and quantity corrections: same item, any quantity
+        fallback = _asof_match(returns.iloc[unmatched], sales, ['Pair'], tolerance)
+        original[unmatched] = fallback
+        match_type[unmatched[fallback >= 0]] = 1
+
+    lines = np.flatnonzero(is_return)
+    line_original = np.full(len(lines), -1, dtype=np.int64)
+    line_type = np.full(len(lines), 2, dtype=np.int64)
+    at = np.searchsorted(lines, returns['Line'].to_numpy())
+    line_original[at], line_type[at] = original, match_type
+
+    index = df[INDEX_COLUMNS].take(lines).reset_index(drop=True)
+    index.insert(0, 'Line', lines)
+    has_original = line_original >= 0
+    original_dates = np.where(has_original, dates[np.maximum(line_original, 0)],
+                              np.datetime64('NaT', 'ns'))
+    index['OriginalLine'] = line_original
+    index['OriginalInvoice'] = pd.api.extensions.take(df['Invoice'].array, line_original,
+                                                      allow_fill=True)
+    index['OriginalDate'] = original_dates
+    index['OriginalQuantity'] = np.where(has_original, quantity[np.maximum(line_original, 0)],
+                                         np.nan)
+    index['DaysToReturn'] = (dates[lines] - original_dates) / np.timedelta64(1, 'D')
+    index['MatchType'] = pd.Categorical.from_codes(line_type, MATCH_TYPES)
+
+    counts = index['MatchType'].value_counts()
+    logger.info(f"✓ Matched {has_original.sum()} of {len(index)} cancellation lines to their sale "
+                f"({counts['quantity']} by quantity, {counts['item']} by item)")
+    return index
+
+
+def return_rates(frame):
+    """
+    Add gross revenue and return rates to a table of additive return measures.
+
+    Parameters:
+    -----------
+    frame : pd.DataFrame
+        Table with Revenue (net of cancellations), Lines, ReturnLines and
+        ReturnRevenue, e.g. from aggregates.rollup_cube
+
+    Returns:
+    --------
+    pd.DataFrame
+        Copy with GrossRevenue, NetRevenue, ReturnRate (share of lines) and
+        ValueReturnRate (share of gross revenue) added
+    """
+    gross = frame['Revenue'] + frame['ReturnRevenue']
+    return frame.assign(
+        GrossRevenue=gross,
+        NetRevenue=frame['Revenue'],
+        ReturnRate=frame['ReturnLines'] / frame['Lines'].where(frame['Lines'] > 0),
+        ValueReturnRate=frame['ReturnRevenue'] / gross.where(gross > 0),
+    )
+
+
+def returns_summary(df, by=None, grain=None, returns_index=None, attribute='return'):
+    """
+    Net revenue and return rates per group of line items.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Processed line items the returns index was built from
+    by : list of str, optional
+        Grouping columns, e.g. ['Description'] or ['Customer ID']
+    grain : str, optional
+        Also group by period (see metrics.GRAINS)
+    returns_index : pd.DataFrame, optional
+        Index from build_returns_index, needed for attribute='sale'
+    attribute : str
+        'return' counts a cancellation in the period it happened, 'sale'
+        in the period of the sale it reverses (unmatched ones stay put)
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per group with Revenue, Lines, ReturnLines, ReturnRevenue
+        and the columns added by return_rates
+    """
+    by = list(by or [])
+    if not by and grain is None:
+        raise ValueError("Group by at least one column or a grain")
+    if attribute not in ('return', 'sale'):
+        raise ValueError(f"Unknown attribution '{attribute}', expected 'return' or 'sale'")
+
+    is_return = return_flags(df)
+    totals = df['TotalPrice'].to_numpy(dtype=np.float64)
+    keys = {column: df[column].reset_index(drop=True) for column in by}
+    if grain is not None:
+        dates = df['InvoiceDate'].to_numpy(dtype='datetime64[ns]')
+        if attribute == 'sale':
+            if returns_index is None:
+                raise ValueError("attribute='sale' needs the returns index")
+            matched = returns_index[returns_index['OriginalLine'] >= 0]
+            dates = dates.copy()
+            dates[matched['Line'].to_numpy()] = matched['OriginalDate'].to_numpy(
+                dtype='datetime64[ns]')
+        keys['Period'] = period_start(dates, grain)
+
+    items = pd.DataFrame({
+        'Revenue': totals,
+        'Return': is_return,
+        'ReturnValue': np.where(is_return, -totals, 0.0),
+    })
+    for column, values in keys.items():
+        items[column] = values
+    summary = items.groupby(list(keys), observed=True).agg(
+        Revenue=('Revenue', 'sum'),
+        Lines=('Revenue', 'size'),
+        ReturnLines=('Return', 'sum'),
+        ReturnRevenue=('ReturnValue', 'sum'),
+    ).reset_index()
+    return return_rates(summary)
+
+
+def customer_returns(df, returns_index):
+    """
+    Per-customer net revenue, return rates and match statistics.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Processed line items the returns index was built from
+    returns_index : pd.DataFrame
+        Index from build_returns_index
+
+    Returns:
+    --------
+    pd.DataFrame
+        returns_summary by Customer ID with MatchedReturnLines and
+        MedianDaysToReturn added
+    """
+    summary = returns_summary(df, by=['Customer ID'])
+    matched = returns_index[returns_index['OriginalLine'] >= 0].groupby('Customer ID')
+    stats = pd.DataFrame({
+        'MatchedReturnLines': matched.size(),
+        'MedianDaysToReturn': matched['DaysToReturn'].median(),
+    })
+    summary = summary.merge(stats, left_on='Customer ID', right_index=True, how='left')
+    summary['MatchedReturnLines'] = summary['MatchedReturnLines'].fillna(0).astype('int64')
+    return summary
+
+
+def _returns_paths(file_path):
+    """
+    Return the persisted returns index and customer summary paths next to a processed dataset.
+    """
+    base = os.path.splitext(file_path)[0]
+    return base + "_returns.parquet", base + "_customer_returns.parquet"
+
+
+def load_returns_index(file_path=None):
+    """
+    Load the persisted returns index, rebuilding it when the source changed.
+
+    Parameters:
+    -----------
+    file_path : str, optional
+        Path to the processed CSV or partitioned dataset directory
+        (default: data/processed/ecommerce_cleaned.csv)
+
+    Returns:
+    --------
+    tuple of pd.DataFrame
+        (returns index, customer summary); Line positions refer to
+        load_processed_data(file_path) of the same version
+    """
+    if file_path is None:
+        file_path = get_processed_data_path("ecommerce_cleaned.csv")
+    file_path = os.path.abspath(file_path)
+
+    signature = _file_signature(file_path)
+    encoded = _encode_signature(signature)
+    index_path, customers_path = _returns_paths(file_path)
+
+    if (_read_parquet_signature(index_path) == encoded
+            and _read_parquet_signature(customers_path) == encoded):
+        return pd.read_parquet(index_path), pd.read_parquet(customers_path)
+
+    df = load_processed_data(file_path)
+    index = build_returns_index(df)
+    customers = customer_returns(df, index)
+
+    _write_parquet_with_signature(index, index_path, signature)
+    _write_parquet_with_signature(customers, customers_path, signature)
+    logger.info(f"✓ Saved returns index to {index_path}")
+    return index, customers
@@ -0,0 +1,361 @@
+"""
+Sketch Utilities
+
+Functions to build per-day, per-country summaries that answer KPI and
+top-N questions over any date range and country subset by merging the
+summaries instead of scanning line items.
+
+Two kinds of summary are kept for every (Date, Country) partition:
+  - HyperLogLog register tables for distinct invoices and customers,
+    merged by taking the max rank per register (~1.6% standard error at
+    the default precision).
+  - Space-Saving summaries of gross sales per product and per customer.
+    A summary monitors at most `capacity` items, each with an upper-bound
+    Count and the Error by which it may overestimate, plus a Floor that
+    bounds any unmonitored item. Summaries merge into a summary of the
+    same capacity (counts add, an item a summary does not monitor counts
+    that summary's Floor), so the guarantees hold for any union of
+    partitions: true total in [Count - Error, Count], and every item whose
+    total exceeds the Floor is monitored.
+
+The bounds need non-negative weights, so the heavy-hitter summaries count
+sales lines only, not the negative totals of cancellations.
+"""
+
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import HLL_PRECISION, _filter_cells, _has_columns, hll_estimate, hll_registers
+from .data_loader import (
+    _encode_signature,
+    _file_signature,
+    _read_parquet_signature,
+    _write_parquet_with_signature,
+    get_processed_data_path,
+    load_processed_data,
+    return_flags,
+)
+
+logger = logging.getLogger(__name__)
+
+
+SKETCH_KEYS = ['Date', 'Country']
+
+# Distinct counts kept as HyperLogLog tables: sketch name -> counted column
+DISTINCT_SKETCHES = {
+    'orders': 'Invoice',
+    'customers': 'Customer ID',
+}
+
+# Heavy hitters kept as Space-Saving summaries: sketch name -> item column
+TOP_K_SKETCHES = {
+    'top_products': 'Description',
+    'top_customers': 'Customer ID',
+}
+
+# Items monitored per (Date, Country) partition and per merged summary
+TOP_K_CAPACITY = 100
+
+
+def _partitioned(df):
+    """
+    Line items with the Date partition key derived from InvoiceDate.
+    """
+    return df.assign(Date=df['InvoiceDate'].dt.normalize())
+
+
+def build_hll_table(df, column, keys=None, precision=HLL_PRECISION):
+    """
+    Build a sparse HyperLogLog table counting the distinct values of a column.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Line items with the key columns
+    column : str
+        Column whose distinct values are counted; missing values are ignored
+    keys : list, optional
+        Partition columns (default SKETCH_KEYS)
+    precision : int
+        Number of index bits (2**precision registers)
+
+    Returns:
+    --------
+    pd.DataFrame
+        Max Rank per partition and Register
+    """
+    if keys is None:
+        keys = SKETCH_KEYS
+    values = df.loc[df[column].notna(), keys + [column]]
+    registers, ranks = hll_registers(values[column], precision)
+    table = values[keys].assign(Register=registers, Rank=ranks)
+    return table.groupby(keys + ['Register'], observed=True)['Rank'].max().reset_index()
+
+
+def merge_hll(table, precision=HLL_PRECISION, start=None, end=None, countries=None):
+    """
+    Estimate the distinct count over the partitions matching the filters.
+
+    Parameters:
+    -----------
+    table : pd.DataFrame
+        Table from build_hll_table
+    precision : int
+        Precision the table was built with
+    start, end : date-like, optional
+        Inclusive date bounds
+    countries : list, optional
+        Countries to keep
+
+    Returns:
+    --------
+    int
+        Estimated number of distinct values
+    """
+    cells = _filter_cells(table, start=start, end=end, countries=countries)
+    if cells.empty:
+        return 0
+    ranks = cells.groupby('Register')['Rank'].max()
+    rank_sum = np.exp2(-ranks.to_numpy(dtype=np.float64)).sum()
+    return int(round(float(hll_estimate(rank_sum, len(ranks), precision))))
+
+
+def build_top_k_table(df, item_column, value_column='TotalPrice', keys=None,
+                      capacity=TOP_K_CAPACITY):
+    """
+    Build a Space-Saving summary of an item column's value totals per partition.
+
+    Every partition is summarised from its exact totals: its `capacity`
+    largest items with no error, and the largest total it dropped as Floor.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Line items with the key columns; values must be non-negative
+    item_column : str
+        Column identifying the items, e.g. 'Description'
+    value_column : str
+        Column summed per item
+    keys : list, optional
+        Partition columns (default SKETCH_KEYS)
+    capacity : int
+        Number of items monitored per partition
+
+    Returns:
+    --------
+    pd.DataFrame
+        Partition keys, item, its Count and Error, and the partition's Floor
+    """
+    if keys is None:
+        keys = SKETCH_KEYS
+    totals = (
+        df.groupby(keys + [item_column], observed=True)[value_column]
+        .sum()
+        .rename('Count')
+        .reset_index()
+        .sort_values(keys + ['Count'], ascending=[True] * len(keys) + [False], kind='mergesort')
+    )
+    rank = totals.groupby(keys, observed=True).cumcount().to_numpy()
+
+    floors = totals.loc[rank == capacity, keys + ['Count']].rename(columns={'Count': 'Floor'})
+    kept = totals[rank < capacity].merge(floors, on=keys, how='left')
+    kept['Floor'] = kept['Floor'].fillna(0.0)
+    kept.insert(len(keys) + 2, 'Error', 0.0)
+    return kept
+
+
+def merge_top_k(table, item_column, capacity=TOP_K_CAPACITY, keys=None, start=None, end=None,
+                countries=None):
+    """
+    Merge the Space-Saving summaries of the partitions matching the filters.
+
+    An item's Count adds its Count in every summary monitoring it and the
+    Floor of every summary that does not; the Floors it was charged are
+    added to its Error. The merged summary keeps the `capacity` items with
+    the largest Count, and its Floor is the larger of the summed Floors and
+    the largest Count it dropped, so it can be merged again.
+
+    Parameters:
+    -----------
+    table : pd.DataFrame
+        Table from build_top_k_table (or merged summaries with their own keys)
+    item_column : str
+        Item column of the table
+    capacity : int
+        Number of items the merged summary monitors
+    keys : list, optional
+        Columns identifying the summaries in `table` (default SKETCH_KEYS)
+    start, end : date-like, optional
+        Inclusive date bounds
+    countries : list, optional
+        Countries to keep
+
+    Returns:
+    --------
+    pd.DataFrame
+        Count, Error and Floor per item, largest Count first; the true
+        total of an item lies in [Count - Error, Count]
+    """
+    if keys is None:
+        keys = SKETCH_KEYS
+    cells = _filter_cells(table, start=start, end=end, countries=countries)
+    total_floor = float(cells.drop_duplicates(keys)['Floor'].sum())
+
+    items = cells.groupby(item_column, observed=True).agg(
+        Count=('Count', 'sum'),
+        Error=('Error', 'sum'),
+        KeptFloor=('Floor', 'sum'),
+    )
+    charged = total_floor - items.pop('KeptFloor')
+    items['Count'] += charged
+    items['Error'] += charged
+    items = items.sort_values('Count', ascending=False, kind='mergesort')
+
+    merged = items.head(capacity).copy()
+    dropped = items['Count'].iloc[capacity] if len(items) > capacity else 0.0
+    merged['Floor'] = max(total_floor, float(dropped))
+    return merged
+
+
+def build_daily_sketches(df, precision=HLL_PRECISION, capacity=TOP_K_CAPACITY):
+    """
+    Build every distinct-count and top-k table from line items.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Processed line items (InvoiceDate, Country, Invoice, Customer ID,
+        Description, TotalPrice; IsReturn when present)
+    precision : int
+        HyperLogLog precision
+    capacity : int
+        Items monitored per partition in the Space-Saving summaries
+
+    Returns:
+    --------
+    dict
+        Sketch name -> table, for DISTINCT_SKETCHES and TOP_K_SKETCHES
+    """
+    items = _partitioned(df)
+    sketches = {name: build_hll_table(items, column, precision=precision)
+                for name, column in DISTINCT_SKETCHES.items()}
+    # Space-Saving bounds need non-negative weights: sales lines only
+    sales = items[~return_flags(items) & (items['TotalPrice'] > 0)]
+    sketches.update({name: build_top_k_table(sales, column, capacity=capacity)
+                     for name, column in TOP_K_SKETCHES.items()})
+
+    rows = sum(len(table) for table in sketches.values())
+    logger.info(f"✓ Built daily sketches: {len(df)} line items -> {rows} sketch rows")
+    return sketches
+
+
+def _sketch_path(file_path, name):
+    """
+    Return the persisted path of one sketch table next to a processed dataset.
+    """
+    return os.path.splitext(file_path)[0] + f"_sketches_{name}.parquet"
+
+
+def _sketch_columns(name):
+    """
+    Columns of a persisted sketch table.
+    """
+    if name in DISTINCT_SKETCHES:
+        return SKETCH_KEYS + ['Register', 'Rank']
+    return SKETCH_KEYS + [TOP_K_SKETCHES[name], 'Count', 'Error', 'Floor']
+
+
+def load_daily_sketches(file_path=None):
+    """
+    Load the persisted daily sketches, rebuilding them when the source changed.
+
+    Parameters:
+    -----------
+    file_path : str, optional
+        Path to the processed CSV or partitioned dataset directory
+        (default: data/processed/ecommerce_cleaned.csv)
+
+    Returns:
+    --------
+    dict
+        Sketch name -> table (see build_daily_sketches)
+    """
+    if file_path is None:
+        file_path = get_processed_data_path("ecommerce_cleaned.csv")
+    file_path = os.path.abspath(file_path)
+
+    signature = _file_signature(file_path)
+    encoded = _encode_signature(signature)
+    names = list(DISTINCT_SKETCHES) + list(TOP_K_SKETCHES)
+    paths = {name: _sketch_path(file_path, name) for name in names}
+
+    # Tables written in an older layout are rebuilt too
+    if all(_read_parquet_signature(path) == encoded and _has_columns(path, _sketch_columns(name))
+           for name, path in paths.items()):
+        return {name: pd.read_parquet(path) for name, path in paths.items()}
+
+    sketches = build_daily_sketches(load_processed_data(file_path))
+    for name, path in paths.items():
+        _write_parquet_with_signature(sketches[name], path, signature)
+    logger.info(f"✓ Saved daily sketches next to {file_path}")
+    return sketches
+
+
+def approximate_kpis(sketches, start=None, end=None, countries=None, precision=HLL_PRECISION):
+    """
+    Estimate distinct orders and customers from the daily sketches.
+
+    Parameters:
+    -----------
+    sketches : dict
+        Tables from build_daily_sketches / load_daily_sketches
+    start, end : date-like, optional
+        Inclusive date bounds
+    countries : list, optional
+        Countries to keep
+    precision : int
+        HyperLogLog precision the sketches were built with
+
+    Returns:
+    --------
+    dict
+        Estimated 'orders' and 'customers', and their 'relative_error'
+        (one standard error)
+    """
+    filters = dict(start=start, end=end, countries=countries)
+    estimates = {name: merge_hll(sketches[name], precision, **filters)
+                 for name in DISTINCT_SKETCHES}
+    estimates['relative_error'] = 1.04 / np.sqrt(1 << precision)
+    return estimates
+
+
+def approximate_top_k(sketches, name, n=10, start=None, end=None, countries=None):
+    """
+    Return the approximate top-n items by gross sales of a Space-Saving sketch.
+
+    Parameters:
+    -----------
+    sketches : dict
+        Tables from build_daily_sketches / load_daily_sketches
+    name : str
+        A TOP_K_SKETCHES name, e.g. 'top_customers'
+    n : int
+        Number of items to return
+    start, end : date-like, optional
+        Inclusive date bounds
+    countries : list, optional
+        Countries to keep
+
+    Returns:
+    --------
+    pd.DataFrame
+        Per item, Value (the guaranteed part of its gross sales, Count -
+        Error) and MaxError (how much higher its true total can be)
+    """
+    merged = merge_top_k(sketches[name], TOP_K_SKETCHES[name], start=start, end=end,
+                         countries=countries)
+    top = merged.head(n)
+    return pd.DataFrame({'Value': top['Count'] - top['Error'], 'MaxError': top['Error']})
@@ -4,19 +4,41 @@ Visualization Utilities
 Functions to create common plots for e-commerce sales analysis.
 """
 
+import logging
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 import numpy as np
 
+# Also imported as a top-level module by the notebooks (src on sys.path)
+try:
+    from .binning import bin_2d, grid_frame
+    from .date_features import calendar_features
+    from .downsample import MAX_POINTS, aggregate_series, choose_grain, downsample_series
+except ImportError:
+    from binning import bin_2d, grid_frame
+    from date_features import calendar_features
+    from downsample import MAX_POINTS, aggregate_series, choose_grain, downsample_series
+
+logger = logging.getLogger(__name__)
+
+# Heatmaps with more cells than this are drawn without value annotations
+MAX_ANNOTATED_CELLS = 400
+
 # Set style
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (12, 6)
 
 
-def plot_sales_over_time(df, date_column, value_column, title="Sales Over Time"):
+def plot_sales_over_time(df, date_column, value_column, title="Sales Over Time", grain='auto',
+                         how='sum', max_points=MAX_POINTS, method='lttb'):
     """
     Create a line plot showing sales over time.
+
+    Date values are first aggregated to a time grain, by default the finest
+    one that keeps at most `max_points` periods over the plotted range, and
+    series still longer than `max_points` are downsampled, so drawing time
+    does not depend on the number of rows (e.g. raw line items).
     
     Parameters:
     -----------
@@ -28,16 +50,39 @@ def plot_sales_over_time(df, date_column, value_column, title="Sales Over Time")
         Name of the value column to plot
     title : str
         Plot title
+    grain : str or None
+        'auto', 'hour', 'day', 'week', 'month' or 'year'; None plots the
+        rows as they are
+    how : str
+        Aggregation of the values within a period, e.g. 'sum' or 'mean'
+    max_points : int
+        Maximum number of points drawn
+    method : str or None
+        'lttb' or 'minmax' downsampling of series longer than `max_points`;
+        None draws every point
     
     Returns:
     --------
     fig, ax : matplotlib objects
     """
     fig, ax = plt.subplots(figsize=(14, 6))
-    df_sorted = df.sort_values(date_column)
-    ax.plot(df_sorted[date_column], df_sorted[value_column], linewidth=2)
+    dates = df[date_column]
+    if isinstance(dates.dtype, pd.PeriodDtype):
+        dates = dates.dt.to_timestamp()
+    xlabel = date_column
+    if grain is not None and pd.api.types.is_datetime64_any_dtype(dates):
+        if grain == 'auto':
+            grain = choose_grain(dates.min(), dates.max(), max_points)
+        series = aggregate_series(dates, df[value_column], grain, how)
+        xlabel = f"{date_column} (per {grain})"
+    else:
+        order = np.argsort(dates.to_numpy(), kind='stable')
+        series = pd.Series(df[value_column].to_numpy()[order], index=dates.to_numpy()[order])
+    if method is not None and len(series) > max_points:
+        series = downsample_series(series, max_points, method)
+    ax.plot(series.index, series.to_numpy(), linewidth=2)
     ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
-    ax.set_xlabel(date_column)
+    ax.set_xlabel(xlabel)
     ax.set_ylabel(value_column)
     ax.grid(True, alpha=0.3)
     plt.xticks(rotation=45)
@@ -136,8 +181,8 @@ def plot_monthly_trends(df, date_column, value_column, title="Monthly Sales Tren
     """
     fig, ax = plt.subplots(figsize=(14, 6))
     
-    df['Month'] = pd.to_datetime(df[date_column]).dt.month
-    monthly_sales = df.groupby('Month')[value_column].sum()
+    months = calendar_features(df[date_column], ['Month'])['Month'].rename('Month')
+    monthly_sales = df[value_column].groupby(months).sum()
     
     bars = ax.bar(monthly_sales.index, monthly_sales.values, color='coral')
     ax.set_xlabel('Month')
@@ -154,41 +199,53 @@ def plot_monthly_trends(df, date_column, value_column, title="Monthly Sales Tren
     return fig, ax
 
 
-def plot_heatmap(df, pivot_columns, value_column, title="Sales Heatmap"):
+def plot_heatmap(df, pivot_columns, value_column, title="Sales Heatmap", agg='sum', date_column=None,
+                 annot='auto'):
     """
     Create a heatmap of sales data.
+
+    The cells are accumulated with src.binning rather than pivot_table;
+    weekday names are ordered Monday to Sunday.
     
     Parameters:
     -----------
-    df : pd.DataFrame
-        Input DataFrame
+    df : pd.DataFrame or dict
+        Input DataFrame, or a grid from binning.bin_2d / merge_grids
+        (e.g. merged over partitions)
     pivot_columns : tuple
-        (row_column, col_column) for pivot table
+        (row_column, col_column); calendar features and 'Hour' may be
+        derived from `date_column`
     value_column : str
         Name of the value column
     title : str
         Plot title
+    agg : str
+        'sum', 'count' or 'mean' per cell
+    date_column : str, optional
+        Datetime column derived dimensions come from
+    annot : bool or 'auto'
+        Write the value in every cell; 'auto' does so up to
+        MAX_ANNOTATED_CELLS cells
     
     Returns:
     --------
     fig, ax : matplotlib objects
     """
-    pivot_df = df.pivot_table(
-        values=value_column,
-        index=pivot_columns[0],
-        columns=pivot_columns[1],
-        aggfunc='sum',
-        fill_value=0
-    )
+    grid = df if isinstance(df, dict) else bin_2d(df, pivot_columns[0], pivot_columns[1],
+                                                  value_column, date_column)
+    pivot_df = grid_frame(grid, agg)
+    if annot == 'auto':
+        annot = pivot_df.size <= MAX_ANNOTATED_CELLS
     
     fig, ax = plt.subplots(figsize=(12, 8))
-    sns.heatmap(pivot_df, annot=True, fmt='.0f', cmap='YlOrRd', ax=ax, cbar_kws={'label': value_column})
+    sns.heatmap(pivot_df, annot=annot, fmt='.2f' if agg == 'mean' else '.0f', cmap='YlOrRd', ax=ax,
+                cbar_kws={'label': value_column})
     ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
     plt.tight_layout()
     return fig, ax
 
 
-def save_figure(fig, filename, directory='reports/visualizations'):
+def save_figure(fig, filename, directory='reports/visualizations', dpi=300):
     """
     Save a matplotlib figure to a file.
     
@@ -197,13 +254,15 @@ def save_figure(fig, filename, directory='reports/visualizations'):
     fig : matplotlib figure
         Figure to save
     filename : str
-        Name of the file
+        Name of the file; the extension selects the format (png, svg, webp, ...)
     directory : str
         Directory to save the figure
+    dpi : int
+        Resolution for raster formats
     """
     import os
     os.makedirs(directory, exist_ok=True)
     filepath = os.path.join(directory, filename)
-    fig.savefig(filepath, dpi=300, bbox_inches='tight')
-    print(f"✓ Saved figure to {filepath}")
+    fig.savefig(filepath, dpi=dpi, bbox_inches='tight')
+    logger.info(f"✓ Saved figure to {filepath}")
 
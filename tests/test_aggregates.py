@@ -0,0 +1,87 @@
+"""
+Tests for the pre-aggregated daily cube.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_sales_data
+from src.aggregates import CUBE_MEASURES, build_daily_cube, rollup_cube, update_daily_cube
+
+
+@pytest.fixture
+def lines():
+    """
+    Synthetic line items over 60 days, every 25th invoice a cancellation.
+    """
+    df = generate_sales_data(3000, n_products=50, days=60)
+    cancelled = df['Invoice'].astype(int) % 25 == 0
+    df.loc[cancelled, 'Invoice'] = 'C' + df.loc[cancelled, 'Invoice']
+    df.loc[cancelled, ['Quantity', 'TotalPrice']] *= -1
+    return df
+
+
+def exact_rollup(df, by):
+    """
+    The cube measures grouped straight from the line items.
+    """
+    is_return = df['Invoice'].str.startswith('C')
+    items = df.assign(
+        Date=df['InvoiceDate'].dt.normalize(),
+        Hour=df['InvoiceDate'].dt.hour,
+        Return=is_return,
+        ReturnValue=np.where(is_return, -df['TotalPrice'], 0.0),
+    )
+    return items.groupby(by).agg(
+        Revenue=('TotalPrice', 'sum'),
+        Quantity=('Quantity', 'sum'),
+        Lines=('TotalPrice', 'size'),
+        ReturnLines=('Return', 'sum'),
+        ReturnRevenue=('ReturnValue', 'sum'),
+    )
+
+
+def assert_rollup_equal(cube, df, by, **filters):
+    result = rollup_cube(cube, by, **filters).set_index(by)[CUBE_MEASURES]
+    expected = exact_rollup(df, by)
+    np.testing.assert_allclose(result.sort_index().to_numpy(dtype=float),
+                               expected.sort_index().to_numpy(dtype=float))
+
+
+@pytest.mark.parametrize('by', [['Country'], ['Hour'], ['Description'], ['Date', 'Country']])
+def test_rollup_matches_line_items(lines, by):
+    assert_rollup_equal(build_daily_cube(lines), lines, by)
+
+
+def test_rollup_applies_filters(lines):
+    cube = build_daily_cube(lines)
+    start, end = lines['InvoiceDate'].min() + pd.Timedelta(days=10), pd.Timestamp('2010-01-05')
+    kept = lines[(lines['InvoiceDate'].dt.normalize() >= start.normalize())
+                 & (lines['InvoiceDate'].dt.normalize() <= end)
+                 & lines['Description'].isin(['PRODUCT 1', 'PRODUCT 2'])]
+
+    assert_rollup_equal(cube, kept, ['Description'], start=start, end=end,
+                        descriptions=['PRODUCT 1', 'PRODUCT 2'])
+
+
+def test_update_rebuilds_a_day_whose_totals_did_not_change(lines):
+    cube = build_daily_cube(lines)
+    edited = lines.copy()
+    edited.loc[edited.index[100], 'Country'] = 'ZZLand'
+
+    updated = update_daily_cube(cube, edited)
+
+    assert 'ZZLand' in set(rollup_cube(updated, ['Country'])['Country'])
+    assert_rollup_equal(updated, edited, ['Date', 'Hour', 'Country'])
+
+
+def test_update_matches_a_full_build_after_adding_and_removing_days(lines):
+    cube = build_daily_cube(lines[lines['InvoiceDate'] < '2010-01-15'])
+    current = lines[lines['InvoiceDate'] >= '2009-12-05']
+
+    updated = update_daily_cube(cube, current)
+
+    assert_rollup_equal(updated, current, ['Date', 'Country'])
+    assert_rollup_equal(updated, current, ['Description'])
+    assert update_daily_cube(updated, current) is updated
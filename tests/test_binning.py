@@ -0,0 +1,32 @@
+"""
+Tests for the 2-D binning utilities.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.binning import axis_codes, bin_2d
+
+
+def test_axis_codes_skips_missing_values_of_nullable_integers():
+    codes, labels = axis_codes(pd.Series([3, pd.NA, 1, 3], dtype='Int64'))
+
+    assert codes.tolist() == [2, -1, 0, 2]
+    assert labels.tolist() == [1, 2, 3]
+
+    codes, labels = axis_codes(pd.Series([pd.NA, pd.NA], dtype='Int64'))
+    assert codes.tolist() == [-1, -1]
+    assert len(labels) == 0
+
+
+def test_bin_2d_skips_rows_with_a_missing_nullable_axis():
+    df = pd.DataFrame({
+        'Hour': pd.Series([9, 10, pd.NA, 10], dtype='Int64'),
+        'Country': ['France', 'France', 'France', 'Germany'],
+        'TotalPrice': [1.0, 2.0, 4.0, 8.0],
+    })
+
+    grid = bin_2d(df, 'Hour', 'Country', 'TotalPrice')
+
+    assert grid['rows'].tolist() == [9, 10]
+    np.testing.assert_array_equal(grid['sum'], [[1.0, 0.0], [2.0, 8.0]])
@@ -0,0 +1,55 @@
+"""
+Tests for the data loading utilities.
+"""
+
+import itertools
+
+import pandas as pd
+
+from src import data_loader
+from src.data_loader import load_processed_data, optimize_dtypes
+
+
+def test_optimize_dtypes_keeps_measures_wide():
+    df = pd.DataFrame({
+        'Quantity': [1, 5, 100],
+        'Price': [0.1, 2.55, 3.0],
+        'Month': [1, 2, 12],
+        'Customer ID': [15821.0, None, 12346.0],
+    })
+
+    optimized = optimize_dtypes(df)
+
+    assert optimized['Quantity'].dtype == 'int32'
+    assert (optimized['Quantity'] * 2).tolist() == [2, 10, 200]
+    assert optimized['Price'].dtype == 'float64'
+    assert optimized['Month'].dtype == 'int8'
+    assert optimized['Customer ID'].dtype == 'Int32'
+
+
+def test_optimize_dtypes_downcasts_floats_on_request():
+    df = pd.DataFrame({'Price': [0.1, 2.55, 3.0]})
+
+    assert optimize_dtypes(df, downcast_floats=True)['Price'].dtype == 'float32'
+
+
+def test_load_processed_data_survives_source_change_while_publishing(tmp_path, monkeypatch):
+    path = tmp_path / 'ecommerce_cleaned.csv'
+    pd.DataFrame({
+        'Invoice': ['489000', 'C489001'],
+        'StockCode': ['85001', '85002'],
+        'Description': ['MUG', 'LAMP'],
+        'Quantity': [2, -1],
+        'InvoiceDate': ['2010-01-04 09:15:00', '2010-01-05 14:30:00'],
+        'Price': [2.5, 10.0],
+        'Customer ID': [15821.0, 12346.0],
+        'Country': ['United Kingdom', 'France'],
+        'TotalPrice': [5.0, -10.0],
+    }).to_csv(path, index=False)
+    # Every look at the source sees a new version, as if it kept being rewritten
+    versions = itertools.count()
+    monkeypatch.setattr(data_loader, '_file_signature', lambda file_path: (next(versions), 0))
+
+    for _ in range(2):
+        df = load_processed_data(str(path))
+        assert df['IsReturn'].tolist() == [False, True]
@@ -0,0 +1,52 @@
+"""
+Tests for cross-chunk deduplication of invoice lines.
+"""
+
+import numpy as np
+import pytest
+
+from src.dedup import close_seen_set, create_seen_set, first_occurrences, mark_seen
+
+
+def fingerprint_chunks(n_chunks, chunk_rows, seed=0):
+    """
+    Random fingerprint chunks where a tenth of each chunk repeats earlier values.
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 2 ** 63, n_chunks * chunk_rows, dtype=np.uint64)
+    repeats = rng.random(len(values)) < 0.1
+    values[repeats] = values[rng.integers(0, len(values), repeats.sum())]
+    return np.split(values, n_chunks)
+
+
+@pytest.mark.parametrize('memory_budget_mb', [256, 0.002], ids=['in_memory', 'spilled'])
+def test_mark_seen_matches_whole_stream(tmp_path, memory_budget_mb):
+    chunks = fingerprint_chunks(40, 500)
+    seen = create_seen_set(memory_budget_mb, spill_dir=str(tmp_path))
+    try:
+        keep = np.concatenate([mark_seen(seen, chunk) for chunk in chunks])
+        spilled = len(seen['runs'])
+    finally:
+        close_seen_set(seen)
+
+    expected = first_occurrences(np.concatenate(chunks))
+    assert (keep == expected).all()
+    assert seen['count'] == expected.sum()
+    assert (spilled > 0) == (memory_budget_mb < 1)
+
+
+def test_mark_seen_only_merges_a_full_buffer():
+    chunks = fingerprint_chunks(64, 1000)
+    seen = create_seen_set(1)
+    merges = 0
+    for chunk in chunks:
+        memory = seen['memory']
+        mark_seen(seen, chunk)
+        if seen['memory'] is not memory:
+            merges += 1
+            assert len(seen['buffer']) == 0
+        assert len(seen['buffer']) < seen['buffer_capacity']
+    close_seen_set(seen)
+
+    # The sorted array is rebuilt once per full buffer of new fingerprints, not per chunk
+    assert 0 < merges <= seen['count'] // seen['buffer_capacity'] < len(chunks)
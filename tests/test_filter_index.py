@@ -0,0 +1,78 @@
+"""
+Tests that filter index lookups select the same rows as boolean masks.
+"""
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import generate_sales_data
+from src.filter_index import build_filter_index, index_values, select_rows
+
+
+@pytest.fixture(scope='module')
+def lines():
+    """
+    Synthetic line items with missing customers and descriptions.
+    """
+    df = generate_sales_data(5000, n_products=30, n_customers=200, days=90)
+    df.loc[df.index % 11 == 0, 'Description'] = None
+    return df
+
+
+@pytest.fixture(scope='module')
+def index(lines):
+    return build_filter_index(lines)
+
+
+def expected_rows(df, filters=None, start=None, end=None):
+    """
+    Row positions kept by the same filters as Series.isin masks.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in (filters or {}).items():
+        if values:
+            mask &= df[col].isin(values).to_numpy()
+    dates = df['InvoiceDate'].dt.normalize()
+    if start is not None:
+        mask &= (dates >= start).to_numpy()
+    if end is not None:
+        mask &= (dates <= end).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def test_every_value_selected_drops_missing_values(lines, index):
+    customers = lines['Customer ID'].dropna().unique().tolist()
+    assert lines['Customer ID'].isna().any()
+
+    rows = select_rows(index, {'Customer ID': customers})
+
+    np.testing.assert_array_equal(rows, expected_rows(lines, {'Customer ID': customers}))
+
+
+def test_every_value_of_a_complete_column_keeps_every_row(lines, index):
+    countries = lines['Country'].unique().tolist()
+
+    np.testing.assert_array_equal(select_rows(index, {'Country': countries}),
+                                  np.arange(len(lines)))
+
+
+@pytest.mark.parametrize('filters, start, end', [
+    ({}, None, None),
+    ({'Country': ['United Kingdom', 'France']}, None, None),
+    ({'Description': ['PRODUCT 1', 'PRODUCT 2', 'NO SUCH PRODUCT']}, '2010-01-01', None),
+    ({'Country': ['Germany'], 'Description': ['PRODUCT 3', 'PRODUCT 4']},
+     '2009-12-10', '2010-01-31'),
+    ({'Description': ['NO SUCH PRODUCT']}, None, None),
+    ({'Country': ['EIRE'], 'Customer ID': []}, None, '2009-12-31'),
+])
+def test_select_rows_matches_isin(lines, index, filters, start, end):
+    rows = select_rows(index, filters, start=start, end=end)
+
+    np.testing.assert_array_equal(rows, expected_rows(lines, filters, start, end))
+
+
+def test_index_values_of_selected_rows(lines, index):
+    rows = select_rows(index, {'Country': ['France']})
+
+    assert set(index_values(index, 'Description', rows)) == set(
+        lines['Description'].take(rows).dropna())
@@ -0,0 +1,128 @@
+"""
+Tests for incremental ingestion of raw invoice files.
+"""
+
+import pandas as pd
+import pytest
+
+from src import ingest
+from src.data_loader import load_sales_data
+
+
+def write_raw(path, quantities):
+    """
+    Write a raw invoice file with one line per quantity.
+    """
+    pd.DataFrame({
+        'Invoice': ['489000'] * len(quantities),
+        'StockCode': [f'8500{i}' for i in range(len(quantities))],
+        'Description': [f'PRODUCT {i}' for i in range(len(quantities))],
+        'Quantity': quantities,
+        'InvoiceDate': ['2010-03-01 10:00:00'] * len(quantities),
+        'Price': [2.5] * len(quantities),
+        'Customer ID': [15821.0] * len(quantities),
+        'Country': ['United Kingdom'] * len(quantities),
+    }).to_csv(path, index=False, encoding='ISO-8859-1')
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """
+    Raw directory, store and manifest paths of an empty store under tmp_path.
+    """
+    raw_dir = tmp_path / 'raw'
+    raw_dir.mkdir()
+    monkeypatch.setattr(ingest, 'get_raw_data_path', lambda name: str(raw_dir / name))
+    return {
+        'raw': raw_dir,
+        'store_path': str(tmp_path / 'sales'),
+        'manifest_path': str(tmp_path / 'manifest.json'),
+    }
+
+
+def run_ingest(store):
+    return ingest.ingest_new_files(store_path=store['store_path'],
+                                   manifest_path=store['manifest_path'])
+
+
+def stored_quantities(store):
+    return sorted(load_sales_data(store_path=store['store_path'])['Quantity'].tolist())
+
+
+def test_unchanged_file_is_skipped(store):
+    write_raw(store['raw'] / 'day1.csv', [12, 3])
+
+    assert run_ingest(store) == ['day1.csv']
+    assert run_ingest(store) == []
+    assert stored_quantities(store) == [3, 12]
+
+
+def test_reingesting_edited_file_replaces_its_lines(store):
+    write_raw(store['raw'] / 'day1.csv', [12, 3])
+    run_ingest(store)
+
+    write_raw(store['raw'] / 'day1.csv', [10, 3])
+    assert run_ingest(store) == ['day1.csv']
+
+    assert stored_quantities(store) == [3, 10]
+    manifest = ingest.load_manifest(store['manifest_path'])
+    assert manifest['day1.csv']['part_name'] == manifest['day1.csv']['sha256'][:16]
+
+
+def test_lines_removed_from_a_file_leave_the_store(store):
+    write_raw(store['raw'] / 'day1.csv', [12, 3])
+    write_raw(store['raw'] / 'day2.csv', [7])
+    run_ingest(store)
+
+    write_raw(store['raw'] / 'day1.csv', [12])
+    run_ingest(store)
+
+    # day2.csv holds the same invoice but was not touched
+    assert stored_quantities(store) == [7, 12]
+
+
+def test_removed_file_leaves_the_store_and_manifest(store):
+    write_raw(store['raw'] / 'day1.csv', [12, 3])
+    write_raw(store['raw'] / 'day2.csv', [7])
+    run_ingest(store)
+
+    (store['raw'] / 'day1.csv').unlink()
+    assert run_ingest(store) == []
+
+    assert stored_quantities(store) == [7]
+    assert set(ingest.load_manifest(store['manifest_path'])) == {'day2.csv'}
+
+
+def test_line_deduplicated_against_a_replaced_file_is_kept(store):
+    write_raw(store['raw'] / 'day1.csv', [12, 3])
+    # The same line as day1.csv's first, so only day1.csv stores it
+    write_raw(store['raw'] / 'day2.csv', [12])
+    run_ingest(store)
+    assert stored_quantities(store) == [3, 12]
+
+    write_raw(store['raw'] / 'day1.csv', [10, 3])
+    assert run_ingest(store) == ['day1.csv', 'day2.csv']
+    assert stored_quantities(store) == [3, 10, 12]
+
+    # Still a single copy once day1.csv holds the line again, now stored by
+    # day2.csv, which day1.csv's removal therefore leaves in place
+    write_raw(store['raw'] / 'day1.csv', [12, 3])
+    assert run_ingest(store) == ['day1.csv']
+    assert stored_quantities(store) == [3, 12]
+
+    (store['raw'] / 'day1.csv').unlink()
+    assert run_ingest(store) == []
+    assert stored_quantities(store) == [12]
+
+
+def test_dependents_of_a_removed_file_are_reingested(store):
+    write_raw(store['raw'] / 'day1.csv', [12, 3])
+    write_raw(store['raw'] / 'day2.csv', [12])
+    run_ingest(store)
+
+    (store['raw'] / 'day1.csv').unlink()
+    assert run_ingest(store) == ['day2.csv']
+
+    assert stored_quantities(store) == [12]
+    manifest = ingest.load_manifest(store['manifest_path'])
+    assert manifest['day2.csv']['deduplicated_against'] == []
@@ -0,0 +1,98 @@
+"""
+Tests for the mergeable quantile sketches behind the outlier bounds.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_sales_data
+from src.outliers import (
+    QUANTILE_ACCURACY,
+    apply_outlier_bounds,
+    build_quantile_sketch,
+    merge_quantile_sketches,
+    outlier_bounds,
+    sketch_chunks,
+    sketch_quantiles,
+)
+
+
+QUANTILES = [0.0, 0.01, 0.25, 0.5, 0.75, 0.99, 1.0]
+
+
+@pytest.fixture(scope='module')
+def lines():
+    """
+    Synthetic line items with returns, zero prices and a few huge orders.
+    """
+    df = generate_sales_data(20000, days=60)
+    rng = np.random.default_rng(1)
+    returned = rng.random(len(df)) < 0.05
+    df.loc[returned, 'Quantity'] *= -1
+    df.loc[rng.random(len(df)) < 0.01, 'Price'] = 0.0
+    df.loc[rng.random(len(df)) < 0.002, 'Quantity'] = 80995
+    df['TotalPrice'] = df['Quantity'] * df['Price']
+    return df
+
+
+def exact_quantile(values, q):
+    """
+    The value of 0-based rank q * (n - 1), the rank the sketch estimates.
+    """
+    ordered = np.sort(np.asarray(values, dtype=float))
+    return ordered[int(np.floor(q * (len(ordered) - 1)))]
+
+
+def assert_within_accuracy(estimate, exact):
+    assert abs(estimate - exact) <= QUANTILE_ACCURACY * abs(exact) + 1e-9
+
+
+@pytest.mark.parametrize('column', ['Quantity', 'Price', 'TotalPrice'])
+def test_quantiles_are_within_the_relative_accuracy(lines, column):
+    estimates = sketch_quantiles(build_quantile_sketch(lines, [column]), QUANTILES)
+
+    for q in QUANTILES:
+        assert_within_accuracy(estimates.loc[column, q], exact_quantile(lines[column], q))
+
+
+def test_group_quantiles_are_within_the_relative_accuracy(lines):
+    estimates = sketch_quantiles(build_quantile_sketch(lines, ['TotalPrice'], by=['Country']),
+                                 QUANTILES)
+
+    for country, values in lines.groupby('Country')['TotalPrice']:
+        for q in QUANTILES:
+            assert_within_accuracy(estimates.loc[(country, 'TotalPrice'), q],
+                                   exact_quantile(values, q))
+
+
+def test_merged_chunk_sketches_equal_the_whole_sketch(lines):
+    chunks = [lines.iloc[i:i + 3000] for i in range(0, len(lines), 3000)]
+    whole = build_quantile_sketch(lines, by=['Country'])
+
+    merged = merge_quantile_sketches([build_quantile_sketch(chunk, by=['Country'])
+                                      for chunk in chunks])
+    streamed = sketch_chunks(iter(chunks), by=['Country'])
+
+    keys = ['Country', 'Column', 'Bucket']
+    expected = whole.sort_values(keys, ignore_index=True)
+    pd.testing.assert_frame_equal(merged.sort_values(keys, ignore_index=True), expected)
+    pd.testing.assert_frame_equal(streamed.sort_values(keys, ignore_index=True), expected)
+
+
+def test_iqr_bounds_drop_the_rows_outside_them(lines):
+    bounds = outlier_bounds(build_quantile_sketch(lines, ['Quantity']), method='iqr')
+    q1, q3 = exact_quantile(lines['Quantity'], 0.25), exact_quantile(lines['Quantity'], 0.75)
+    lower, upper = bounds.loc['Quantity', ['Lower', 'Upper']]
+
+    # Each quartile is off by at most the accuracy; a bound weighs them 2.5 and 1.5 times
+    slack = QUANTILE_ACCURACY * (abs(q1) + abs(q3)) * 2.5 + 1e-9
+    assert lower == pytest.approx(q1 - 1.5 * (q3 - q1), abs=slack)
+    assert upper == pytest.approx(q3 + 1.5 * (q3 - q1), abs=slack)
+
+    flagged = apply_outlier_bounds(lines, bounds, mode='flag')
+    kept = apply_outlier_bounds(lines, bounds)
+    outside = (lines['Quantity'] < lower) | (lines['Quantity'] > upper)
+    np.testing.assert_array_equal(flagged['IsOutlier'].to_numpy(), outside.to_numpy())
+    assert len(kept) == len(lines) - outside.sum()
+    assert (lines['Quantity'] == 80995).any() and not (kept['Quantity'] == 80995).any()
@@ -0,0 +1,76 @@
+"""
+Tests that the pandas and DuckDB query backends agree.
+"""
+
+import pandas as pd
+import pytest
+
+from src.data_cleaner import write_partitions
+from src.query_backend import BACKENDS, QUERIES, run_query
+
+
+def synthetic_lines():
+    """
+    Small processed line-item frame spanning two months, three countries and a return.
+    """
+    dates = pd.to_datetime([
+        '2010-01-04 09:15', '2010-01-04 09:15', '2010-01-05 14:30', '2010-01-20 11:00',
+        '2010-02-01 10:45', '2010-02-01 10:45', '2010-02-03 16:05', '2010-02-03 16:20',
+    ])
+    df = pd.DataFrame({
+        'Invoice': ['489000', '489000', '489001', '489002',
+                    '489003', '489003', 'C489004', '489005'],
+        'StockCode': ['85001', '85002', '85001', '85003', '85002', '85003', '85002', '85001'],
+        'Description': ['MUG', 'LAMP', 'MUG', 'VASE', 'LAMP', 'VASE', 'LAMP', 'MUG'],
+        'Quantity': [2, 1, 6, 3, 4, 2, -1, 12],
+        'InvoiceDate': dates,
+        'Price': [2.5, 10.0, 2.5, 4.25, 9.5, 4.25, 9.5, 2.0],
+        'Customer ID': [15821.0, 15821.0, 12346.0, None, 17850.0, 17850.0, 17850.0, 12346.0],
+        'Country': ['United Kingdom', 'United Kingdom', 'France', 'United Kingdom',
+                    'Germany', 'Germany', 'Germany', 'France'],
+    })
+    df['TotalPrice'] = df['Quantity'] * df['Price']
+    df['Year'] = dates.year
+    df['Month'] = dates.month
+    df['Day'] = dates.day
+    df['Week'] = dates.isocalendar().week.to_numpy()
+    return df
+
+
+@pytest.fixture(params=['csv', 'partitioned'])
+def source(request, tmp_path):
+    """
+    The synthetic lines as a processed CSV or a partitioned dataset, under a quoted path.
+    """
+    root = tmp_path / "o'brien"
+    root.mkdir()
+    df = synthetic_lines()
+    if request.param == 'csv':
+        path = root / 'ecommerce_cleaned.csv'
+        df.to_csv(path, index=False)
+    else:
+        path = root / 'sales'
+        write_partitions(df, str(path), 'part-0')
+    return str(path)
+
+
+FILTERS = {
+    'unfiltered': {},
+    'filtered': dict(start='2010-01-05', end='2010-02-03', countries=['Germany', 'France'],
+                     products=['MUG', 'LAMP']),
+    'empty': dict(start='2011-01-01', end='2011-01-31'),
+}
+
+
+@pytest.mark.parametrize('filters', FILTERS.values(), ids=FILTERS.keys())
+@pytest.mark.parametrize('query', QUERIES)
+def test_backends_agree(source, query, filters):
+    expected = run_query(query, source, 'pandas', **filters)
+    for backend in BACKENDS[1:]:
+        result = run_query(query, source, backend, **filters)
+        pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-9)
+
+    if filters is FILTERS['empty']:
+        assert expected.empty
+    else:
+        assert not expected.empty
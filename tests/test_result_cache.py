@@ -0,0 +1,127 @@
+"""
+Tests for the two-tier panel result cache.
+"""
+
+import os
+import threading
+
+import pytest
+
+from src import result_cache
+from src.result_cache import cache_stats, cached_result, clear_result_cache, set_cache_dir
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """
+    A small source file, with an empty in-memory cache holding two results.
+    """
+    monkeypatch.setattr(result_cache, 'MAX_CACHED_RESULTS', 2)
+    monkeypatch.setattr(result_cache, '_cache_dir', None)
+    clear_result_cache()
+    path = tmp_path / 'sales.csv'
+    path.write_text("Invoice,TotalPrice\n489000,2.5\n")
+    yield str(path)
+    clear_result_cache()
+
+
+class Counter:
+    """
+    compute() callable counting its calls.
+    """
+
+    def __init__(self, value='result'):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def change(path):
+    with open(path, 'a') as f:
+        f.write("489001,10.0\n")
+    # A different size alone changes the version; move the mtime on as well
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_filter_order_does_not_change_the_key(source):
+    compute = Counter()
+
+    cached_result('panel', source, compute, products=['MUG', 'LAMP'], countries={'France'})
+    cached_result('panel', source, compute, products=['LAMP', 'MUG'], countries=['France'])
+    cached_result('panel', source, compute, products=['LAMP'], countries=['France'])
+
+    assert compute.calls == 2
+
+
+def test_least_recently_used_result_is_evicted(source):
+    first, second, third = Counter('a'), Counter('b'), Counter('c')
+    evictions = cache_stats()['evictions']
+
+    cached_result('first', source, first)
+    cached_result('second', source, second)
+    assert cached_result('first', source, first) == 'a'
+    cached_result('third', source, third)
+
+    assert cache_stats()['entries'] == 2
+    assert cache_stats()['evictions'] == evictions + 1
+    # 'second' was the least recently used
+    cached_result('first', source, first)
+    cached_result('second', source, second)
+    assert (first.calls, second.calls, third.calls) == (1, 2, 1)
+
+
+def test_new_source_version_invalidates_both_tiers(source, tmp_path):
+    set_cache_dir(str(tmp_path / 'cache'))
+    compute = Counter()
+    cached_result('panel', source, compute)
+    version_dirs = os.listdir(result_cache._source_dir(source))
+    invalidations = cache_stats()['invalidations']
+
+    change(source)
+    cached_result('panel', source, compute)
+
+    assert compute.calls == 2
+    assert cache_stats()['invalidations'] == invalidations + 1
+    new_version_dirs = os.listdir(result_cache._source_dir(source))
+    assert len(new_version_dirs) == 1 and new_version_dirs != version_dirs
+
+
+def test_disk_tier_survives_clearing_memory(source, tmp_path):
+    set_cache_dir(str(tmp_path / 'cache'))
+    compute = Counter({'rows': [1, 2, 3]})
+    cached_result('panel', source, compute, start='2010-01-01')
+    disk_hits = cache_stats()['disk_hits']
+
+    clear_result_cache()
+
+    assert cached_result('panel', source, compute, start='2010-01-01') == {'rows': [1, 2, 3]}
+    assert compute.calls == 1
+    assert cache_stats()['disk_hits'] == disk_hits + 1
+
+
+def test_concurrent_requests_compute_once(source):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        cached_result('panel', source, compute))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == ['result'] * 4
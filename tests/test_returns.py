@@ -0,0 +1,107 @@
+"""
+Tests that the as-of join matches cancellations like a search over every sale.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_sales_data
+from src.returns import build_returns_index, returns_summary
+
+
+@pytest.fixture(scope='module')
+def lines():
+    """
+    Synthetic sales of few products and customers, with cancellations of
+    earlier sales (whole or partial), of items never bought and of sales
+    made at the same time as the cancellation.
+    """
+    sales = generate_sales_data(6000, n_products=20, n_customers=60, days=120)
+    rng = np.random.default_rng(3)
+    picked = sales.sample(600, random_state=3)
+    cancels = picked.assign(
+        Invoice='C' + picked['Invoice'],
+        InvoiceDate=picked['InvoiceDate'] + pd.to_timedelta(rng.integers(0, 40, len(picked)),
+                                                            unit='D'),
+        Quantity=-np.where(rng.random(len(picked)) < 0.3,
+                           np.maximum(picked['Quantity'] // 2, 1), picked['Quantity']),
+    )
+    # Cancellations of items the customer never bought and without a customer
+    cancels.loc[cancels.index[:20], 'StockCode'] = 'NEVER SOLD'
+    cancels.loc[cancels.index[20:40], 'Customer ID'] = np.nan
+    df = pd.concat([sales, cancels], ignore_index=True)
+    df['TotalPrice'] = df['Quantity'] * df['Price']
+    return df
+
+
+def reference_match(df, max_days=None):
+    """
+    Latest earlier sale of the same customer and item, same quantity first;
+    among sales at the same time the last in dataset order.
+    """
+    is_return = df['Invoice'].str.startswith('C').to_numpy()
+    sales = df[~is_return & (df['Quantity'] > 0)]
+    by_pair = {pair: group for pair, group in sales.groupby(['Customer ID', 'StockCode'])}
+    original, match_type = [], []
+    for line in np.flatnonzero(is_return):
+        row = df.iloc[line]
+        candidates = by_pair.get((row['Customer ID'], row['StockCode']))
+        found = -1, 'unmatched'
+        if candidates is not None:
+            earlier = candidates[candidates['InvoiceDate'] <= row['InvoiceDate']]
+            if max_days is not None:
+                earlier = earlier[row['InvoiceDate'] - earlier['InvoiceDate']
+                                  <= pd.Timedelta(days=max_days)]
+            for match, kept in [('quantity', earlier['Quantity'] == -row['Quantity']),
+                                ('item', np.ones(len(earlier), dtype=bool))]:
+                chosen = earlier[kept]
+                if len(chosen):
+                    latest = chosen[chosen['InvoiceDate'] == chosen['InvoiceDate'].max()]
+                    found = latest.index.max(), match
+                    break
+        original.append(found[0])
+        match_type.append(found[1])
+    return np.array(original), np.array(match_type)
+
+
+@pytest.mark.parametrize('max_days', [None, 10])
+def test_matches_equal_a_search_over_every_sale(lines, max_days):
+    index = build_returns_index(lines, max_days=max_days)
+    original, match_type = reference_match(lines, max_days)
+
+    np.testing.assert_array_equal(index['OriginalLine'].to_numpy(), original)
+    np.testing.assert_array_equal(index['MatchType'].astype(str).to_numpy(), match_type)
+    assert set(match_type) == {'quantity', 'item', 'unmatched'}
+
+
+def test_index_describes_the_matched_sale(lines):
+    index = build_returns_index(lines)
+    matched = index[index['OriginalLine'] >= 0]
+    sales = lines.take(matched['OriginalLine'].to_numpy())
+
+    cancellations = np.flatnonzero(lines['Invoice'].str.startswith('C'))
+    np.testing.assert_array_equal(index['Line'], cancellations)
+    np.testing.assert_array_equal(matched['OriginalInvoice'], sales['Invoice'])
+    np.testing.assert_array_equal(matched['OriginalQuantity'], sales['Quantity'])
+    elapsed = matched['InvoiceDate'].to_numpy() - sales['InvoiceDate'].to_numpy()
+    np.testing.assert_allclose(matched['DaysToReturn'], elapsed / np.timedelta64(1, 'D'))
+    assert (matched['DaysToReturn'] >= 0).all()
+    assert index.loc[index['OriginalLine'] < 0, 'OriginalDate'].isna().all()
+
+
+def test_sale_attribution_moves_returns_to_the_period_of_the_sale(lines):
+    index = build_returns_index(lines)
+    by_return = returns_summary(lines, grain='month').set_index('Period')
+    by_sale = returns_summary(lines, grain='month', returns_index=index,
+                              attribute='sale').set_index('Period')
+
+    # Totals are only moved between periods
+    for column in ['Revenue', 'Lines', 'ReturnLines', 'ReturnRevenue']:
+        assert by_sale[column].sum() == pytest.approx(by_return[column].sum())
+    attributed = index['OriginalDate'].fillna(index['InvoiceDate'])
+    assert (attributed.dt.month != index['InvoiceDate'].dt.month).any()
+    expected = attributed.dt.to_period('M').dt.start_time.value_counts()
+    returned = by_sale.loc[by_sale['ReturnLines'] > 0, 'ReturnLines']
+    np.testing.assert_array_equal(returned.to_numpy(),
+                                  expected.reindex(returned.index).to_numpy())
@@ -0,0 +1,104 @@
+"""
+Tests for the mergeable distinct-count and heavy-hitter sketches.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_sales_data
+from src.sketches import (
+    approximate_kpis,
+    approximate_top_k,
+    build_daily_sketches,
+    build_top_k_table,
+    merge_top_k,
+)
+
+
+@pytest.fixture(scope='module')
+def lines():
+    """
+    Synthetic sales over 90 days with a few products far ahead of the rest.
+    """
+    df = generate_sales_data(20000, n_products=400, n_customers=1500, days=90)
+    popular = np.arange(len(df)) % 7 == 0
+    df.loc[popular, 'Description'] = 'PRODUCT ' + (np.arange(popular.sum()) % 5).astype(str)
+    return df
+
+
+def selected(df, start, end, countries):
+    dates = df['InvoiceDate'].dt.normalize()
+    return df[(dates >= start) & (dates <= end) & df['Country'].isin(countries)]
+
+
+FILTERS = [
+    (pd.Timestamp('2009-12-01'), pd.Timestamp('2010-02-28'), ['United Kingdom', 'Germany',
+                                                              'France', 'EIRE', 'Netherlands',
+                                                              'Spain']),
+    (pd.Timestamp('2009-12-10'), pd.Timestamp('2010-01-20'), ['United Kingdom']),
+    (pd.Timestamp('2010-01-01'), pd.Timestamp('2010-02-15'), ['Germany', 'France']),
+]
+
+
+@pytest.mark.parametrize('start, end, countries', FILTERS)
+def test_distinct_counts_are_within_the_error_bound(lines, start, end, countries):
+    estimates = approximate_kpis(build_daily_sketches(lines), start, end, countries)
+    kept = selected(lines, start, end, countries)
+
+    # Four standard errors, far outside what HyperLogLog misses by in practice
+    tolerance = 4 * estimates['relative_error']
+    assert estimates['orders'] == pytest.approx(kept['Invoice'].nunique(), rel=tolerance)
+    assert estimates['customers'] == pytest.approx(kept['Customer ID'].nunique(), rel=tolerance)
+
+
+def assert_bounds_hold(merged, true_totals):
+    totals = true_totals.reindex(merged.index, fill_value=0.0)
+    assert (merged['Count'] - merged['Error'] <= totals + 1e-6).all()
+    assert (totals <= merged['Count'] + 1e-6).all()
+    # Every item above the floor is monitored
+    missing = true_totals[~true_totals.index.isin(merged.index)]
+    assert (missing <= merged['Floor'].iloc[0] + 1e-6).all()
+
+
+@pytest.mark.parametrize('start, end, countries', FILTERS)
+@pytest.mark.parametrize('column', ['Description', 'Customer ID'])
+def test_top_k_bounds_hold_for_any_merge(lines, column, start, end, countries):
+    sales = lines.assign(Date=lines['InvoiceDate'].dt.normalize())
+    table = build_top_k_table(sales, column, capacity=5)
+    true_totals = selected(lines, start, end, countries).groupby(column)['TotalPrice'].sum()
+
+    merged = merge_top_k(table, column, capacity=20, start=start, end=end, countries=countries)
+
+    assert len(merged) <= 20
+    assert_bounds_hold(merged, true_totals)
+
+
+def test_merged_summaries_merge_again(lines):
+    sales = lines.assign(Date=lines['InvoiceDate'].dt.normalize())
+    table = build_top_k_table(sales, 'Description', capacity=5)
+    months = sales['Date'].dt.to_period('M').unique()
+    monthly = pd.concat([
+        merge_top_k(table, 'Description', capacity=20, start=month.start_time,
+                    end=month.end_time).reset_index().assign(Month=str(month))
+        for month in months
+    ], ignore_index=True)
+
+    merged = merge_top_k(monthly, 'Description', capacity=20, keys=['Month'])
+
+    assert_bounds_hold(merged, lines.groupby('Description')['TotalPrice'].sum())
+    assert set(merged.index[:5]) == {f'PRODUCT {i}' for i in range(5)}
+
+
+def test_approximate_top_k_ignores_cancellations(lines):
+    df = lines.copy()
+    df.loc[df.index[:50], 'Invoice'] = 'C' + df.loc[df.index[:50], 'Invoice']
+    df.loc[df.index[:50], 'TotalPrice'] *= -1
+    sales = df[~df['Invoice'].str.startswith('C')]
+
+    top = approximate_top_k(build_daily_sketches(df), 'top_products', n=5)
+
+    assert set(top.index) == {f'PRODUCT {i}' for i in range(5)}
+    true_totals = sales.groupby('Description')['TotalPrice'].sum().reindex(top.index)
+    assert (top['Value'] <= true_totals + 1e-6).all()
+    assert (true_totals <= top['Value'] + top['MaxError'] + 1e-6).all()